@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, ProductImage, ProductProperty
+from .models import Category, Product, ProductImage, ProductProperty, Task
 
 
 class ProductPropertyInline(admin.TabularInline):
@@ -17,7 +17,7 @@ class ProductImageInline(admin.TabularInline):
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'created_at']
+    list_display = ['name', 'slug', 'published_products_count', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name', 'description']
     prepopulated_fields = {'slug': ('name',)}
@@ -50,3 +50,11 @@ class ProductImageAdmin(admin.ModelAdmin):
     list_filter = ['is_primary', 'created_at']
     search_fields = ['product__name', 'alt_text']
     readonly_fields = ['created_at']
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_after', 'updated_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'unique_key', 'last_error']
+    readonly_fields = ['created_at', 'updated_at']
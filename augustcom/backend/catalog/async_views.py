@@ -0,0 +1,159 @@
+"""
+Async read path for the busiest catalog endpoints, for ASGI deployments.
+
+These views answer exactly like ProductViewSet.list / retrieve and
+CategoryViewSet.products (same filters, pagination, serializers and response
+cache), but rows are fetched with the async ORM (`acount`, `aiterator`,
+`afirst`), so under an ASGI server one worker keeps many requests in flight
+while they wait on the database instead of being capped by its thread count.
+
+The viewsets themselves are reused for everything that does not touch the
+database: building the queryset, applying filters, choosing the paginator
+and serializing. Cache lookups run in a thread via sync_to_async.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+
+from .cache import get_cached_response, get_validators, is_enabled, set_validators, store_response
+from .filters import ProductFilter
+from .metrics import timed
+from .models import Category, Product
+from .pagination import KeysetPagination
+from .renderers import get_json_renderer
+from .serializers import ProductListSerializer
+from .views import CategoryViewSet, ProductViewSet
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(get_json_renderer().render(data), content_type='application/json', status=status_code)
+
+
+def error_response(exc):
+    # Same body shapes as rest_framework.views.exception_handler
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return json_response(data, exc.status_code)
+
+
+def lookup_response(request):
+    """Validators and cached body for `request`, in one trip to the cache"""
+    etag, last_modified = get_validators(request)
+    key, cached = get_cached_response(request) if is_enabled() else (None, None)
+    return etag, last_modified, key, cached
+
+
+def catalog_read(view_func):
+    """
+    Async counterpart of ConditionalGetMixin and CachedResponseMixin: answer
+    conditional GETs with 304, serve and fill the versioned response cache,
+    and render DRF exceptions as JSON.
+    """
+    @require_safe
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return await render_view(view_func, request, *args, **kwargs)
+
+        etag, last_modified, key, cached = await sync_to_async(lookup_response)(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified) if etag else None
+        if response is None and cached is not None:
+            response = cached
+        if response is None:
+            response = await render_view(view_func, request, *args, **kwargs)
+            if key is not None:
+                if response.status_code == 200:
+                    await sync_to_async(store_response)(key, response)
+                response['X-Cache'] = 'MISS'
+        return set_validators(response, etag, last_modified)
+    return wrapper
+
+
+async def render_view(view_func, request, *args, **kwargs):
+    try:
+        return json_response(await view_func(request, *args, **kwargs))
+    except APIException as exc:
+        return error_response(exc)
+
+
+def build_view(viewset_class, request, action, **kwargs):
+    """A viewset instance set up as the router would for `action`, without dispatching it"""
+    return viewset_class(
+        request=Request(request), args=(), kwargs=kwargs, format_kwarg=None, action=action,
+        action_map={'get': action}
+    )
+
+
+async def paginate(view, queryset):
+    """Async version of GenericAPIView.paginate_queryset for both catalog paginators"""
+    paginator = view.paginator
+    request = view.request
+    if isinstance(paginator, KeysetPagination):
+        page_queryset = paginator.get_page_queryset(queryset, request)
+        return paginator.set_page([obj async for obj in page_queryset.aiterator(chunk_size=paginator.page_size + 1)])
+
+    if not isinstance(paginator, PageNumberPagination) or paginator.get_page_size(request) is None:
+        return None
+    page_size = paginator.get_page_size(request)
+    django_paginator = paginator.django_paginator_class(queryset, page_size)
+    # Pre-fill Paginator.count so page() validates the number without a sync COUNT
+    django_paginator.count = await queryset.acount()
+    page_number = paginator.get_page_number(request, django_paginator)
+    try:
+        page = django_paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    page.object_list = [obj async for obj in page.object_list.aiterator(chunk_size=page_size)]
+    paginator.page = page
+    paginator.request = request
+    return list(page)
+
+
+async def serialize_list(view, queryset, serialize):
+    page = await paginate(view, queryset)
+    paginated = page is not None
+    if not paginated:
+        page = [obj async for obj in queryset.aiterator(chunk_size=2000)]
+    with timed('serialize'):
+        data = serialize(page)
+    return view.get_paginated_response(data).data if paginated else data
+
+
+@catalog_read
+async def product_list(request):
+    """GET /api/async/products/ - same response as /api/products/"""
+    view = build_view(ProductViewSet, request, 'list')
+    queryset = view.filter_queryset(view.get_queryset())
+    return await serialize_list(view, queryset, lambda page: view.get_serializer(page, many=True).data)
+
+
+@catalog_read
+async def product_detail(request, slug):
+    """GET /api/async/products/<slug>/ - same response as /api/products/<slug>/"""
+    view = build_view(ProductViewSet, request, 'retrieve', slug=slug)
+    queryset = view.filter_queryset(view.get_queryset())
+    product = await queryset.filter(slug=slug).afirst()
+    if product is None:
+        raise NotFound('No Product matches the given query.')
+    with timed('serialize'):
+        return view.get_serializer(product).data
+
+
+@catalog_read
+async def category_products(request, slug):
+    """GET /api/async/categories/<slug>/products/ - same response as /api/categories/<slug>/products/"""
+    view = build_view(CategoryViewSet, request, 'products', slug=slug)
+    category = await Category.objects.filter(slug=slug).afirst()
+    if category is None:
+        raise NotFound('No Category matches the given query.')
+    queryset = ProductFilter(
+        request.GET, queryset=Product.objects.published().for_api().filter(category=category)
+    ).qs
+    return await serialize_list(view, queryset, lambda page: ProductListSerializer(page, many=True).data)
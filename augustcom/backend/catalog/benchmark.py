@@ -0,0 +1,203 @@
+"""
+Synthetic catalogs and endpoint scenarios for `manage.py benchmark_api`.
+
+generate_catalog() bulk-inserts a reproducible catalog of any size (a seeded
+random generator picks prices, dates, properties and which products have
+images) and then builds the derived data the API reads: category counts,
+ProductListing rows, the search index and facets. Bulk inserts skip the model
+signals, so 1M products take minutes rather than hours.
+
+SCENARIOS covers every list endpoint and filter combination; the
+placeholders (`{product}`, `{products}`, `{category}`, `{term}`,
+`{deep_page}`) are filled from the catalog by scenario_context(). summarize()
+turns per-request samples into percentiles and compare() checks a run against
+a saved baseline.
+"""
+import random
+import statistics
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.settings import api_settings
+
+from .cache import bump_catalog_version
+from .models import Category, Product, ProductFacet, ProductImage, ProductListing, ProductProperty
+from .search import reindex_products
+
+PROPERTY_VALUES = {
+    'Color': ['Black', 'White', 'Silver', 'Red', 'Blue', 'Green'],
+    'Size': ['XS', 'S', 'M', 'L', 'XL'],
+    'Material': ['Cotton', 'Steel', 'Plastic', 'Wood', 'Glass'],
+    'Storage': ['64GB', '128GB', '256GB', '512GB'],
+    'Brand': ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark'],
+}
+WORDS = ['Classic', 'Smart', 'Ultra', 'Compact', 'Wireless', 'Premium', 'Eco', 'Pro', 'Mini', 'Max']
+NOUNS = ['Phone', 'Laptop', 'Jacket', 'Lamp', 'Chair', 'Watch', 'Speaker', 'Camera', 'Bottle', 'Backpack']
+
+# (name, path); every scenario runs with the response cache off
+SCENARIOS = [
+    ('products', '/api/products/'),
+    ('products deep page', '/api/products/?page={deep_page}'),
+    ('products by price', '/api/products/?ordering=price'),
+    ('products by name desc', '/api/products/?ordering=-name'),
+    ('products price range', '/api/products/?min_price=100&max_price=500'),
+    ('products in category', '/api/products/?category={category}'),
+    ('products with property', '/api/products/?prop=Color:Black'),
+    ('products two properties', '/api/products/?prop=Color:Black&prop=Size:M&prop=Size:L'),
+    ('products combined', '/api/products/?category={category}&min_price=50&prop=Brand:Acme&ordering=-price'),
+    ('products name contains', '/api/products/?name=smart'),
+    ('products cursor', '/api/products/?pagination=cursor&ordering=price'),
+    ('products sparse', '/api/products/?fields=id,name,price,category'),
+    ('category products', '/api/categories/{category}/products/'),
+    ('category products by price', '/api/categories/{category}/products/?ordering=price&min_price=10'),
+    ('category products cursor', '/api/categories/{category}/products/?pagination=cursor'),
+    ('product detail', '/api/products/{product}/'),
+    ('product batch', '/api/products/batch/?slugs={products}'),
+    ('search', '/api/products/search/?q={term}'),
+    ('search filtered', '/api/products/search/?q={term}&category={category}'),
+    ('facets', '/api/products/facets/?category={category}'),
+    ('async products', '/api/async/products/'),
+    ('async category products', '/api/async/categories/{category}/products/'),
+]
+
+
+def generate_product(rng, index, prefix, category_ids, image_ratio, now):
+    """A product with its (key, value) properties, primary image flag and creation time"""
+    product = Product(
+        name=f'{rng.choice(WORDS)} {rng.choice(NOUNS)} {index}',
+        slug=f'{prefix}-product-{index}',
+        description=f'Generated product {index} for benchmarks',
+        price=Decimal(rng.randint(100, 200000)) / 100,
+        category_id=rng.choice(category_ids),
+        is_published=rng.random() < 0.95,
+        stock_quantity=rng.randint(0, 500),
+    )
+    keys = rng.sample(sorted(PROPERTY_VALUES), rng.randint(1, 4))
+    properties = [(key, rng.choice(PROPERTY_VALUES[key])) for key in keys]
+    has_image = rng.random() < image_ratio
+    created_at = now - timedelta(seconds=rng.randint(0, 365 * 24 * 60 * 60))
+    return product, properties, has_image, created_at
+
+
+def generate_catalog(products, categories=20, seed=0, batch_size=5000, prefix='synthetic', image_ratio=0.8,
+                     log=None):
+    """
+    Insert `products` products (about 95% published) across `categories`
+    categories; returns the category ids. Each product is drawn from its own
+    seeded generator, so the catalog does not depend on the batch size.
+    """
+    now = timezone.now()
+    created = Category.objects.bulk_create([
+        Category(
+            name=f'{prefix.title()} Category {index}', slug=f'{prefix}-category-{index}',
+            description=f'Generated category {index}'
+        )
+        for index in range(categories)
+    ])
+    category_ids = [category.pk for category in created]
+
+    for start in range(0, products, batch_size):
+        generated = [
+            generate_product(random.Random(f'{seed}:{index}'), index, prefix, category_ids, image_ratio, now)
+            for index in range(start, min(start + batch_size, products))
+        ]
+        with transaction.atomic():
+            batch = Product.objects.bulk_create([product for product, _, _, _ in generated])
+            ProductProperty.objects.bulk_create([
+                ProductProperty(product=product, key=key, value=value, order=order)
+                for product, properties, _, _ in generated
+                for order, (key, value) in enumerate(properties, start=1)
+            ])
+            images = ProductImage.objects.bulk_create([
+                ProductImage(product=product, image=f'products/{prefix}/{product.slug}.jpg', alt_text=product.name,
+                             is_primary=True)
+                for product, _, has_image, _ in generated
+                if has_image
+            ])
+            primary_images = {image.product_id: image for image in images}
+            for product, _, _, created_at in generated:
+                # auto_now_add stamped every row with the same time; spread them out so ordering means something
+                product.created_at = created_at
+                product.primary_image = primary_images.get(product.pk)
+            Product.objects.bulk_update(batch, ['created_at', 'primary_image'], batch_size=1000)
+
+            product_ids = [product.pk for product in batch]
+            reindex_products(product_ids)
+            ProductListing.refresh(*product_ids)
+        if log:
+            log(f'Generated {start + len(batch)}/{products} products')
+
+    Category.refresh_products_count(*category_ids)
+    ProductFacet.refresh(*category_ids)
+    bump_catalog_version()
+    return category_ids
+
+
+def delete_catalog(prefix='synthetic'):
+    """
+    Remove a generated catalog; returns the number of deleted categories. Deletes
+    go through the model signals, so for very large catalogs a fresh database is
+    quicker.
+    """
+    categories = Category.objects.filter(slug__startswith=f'{prefix}-category-')
+    count = categories.count()
+    with transaction.atomic():
+        # Cascades to products, properties, images, listings and (via signals) search documents
+        categories.delete()
+    return count
+
+
+def scenario_context():
+    """Values for the scenario placeholders, taken from the largest category"""
+    category = Category.objects.filter(published_products_count__gt=0).order_by('-published_products_count').first()
+    if category is None:
+        return None
+    slugs = list(
+        Product.objects.published().filter(category=category).order_by('pk').values_list('slug', flat=True)[:20]
+    )
+    name = Product.objects.published().filter(category=category).values_list('name', flat=True).first()
+    pages = -(-Product.objects.published().count() // api_settings.PAGE_SIZE)
+    return {
+        'deep_page': min(50, pages),
+        'category': category.slug,
+        'product': slugs[0],
+        'products': ','.join(slugs),
+        'term': name.split()[0].lower(),
+    }
+
+
+def summarize(samples):
+    """Latency percentiles (ms) and queries per request from [(seconds, queries, status), ...]"""
+    latencies = sorted(latency * 1000 for latency, _, _ in samples)
+    queries = [count for _, count, _ in samples if count is not None]
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(samples),
+        'p50_ms': round(quantiles[49], 2),
+        'p95_ms': round(quantiles[94], 2),
+        'p99_ms': round(quantiles[98], 2),
+        'queries': max(queries) if queries else None,
+        'errors': sum(1 for _, _, status in samples if status != 200),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of `results` against `baseline` (both {scenario: summary}): p95
+    latency more than `tolerance` (a fraction) above the baseline, more queries
+    per request, or new errors.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {result["p95_ms"]:.1f} ms vs {previous["p95_ms"]:.1f} ms')
+        if None not in (result['queries'], previous['queries']) and result['queries'] > previous['queries']:
+            regressions.append(f'{name}: {result["queries"]} queries per request vs {previous["queries"]}')
+        if result['errors'] > previous['errors']:
+            regressions.append(f'{name}: {result["errors"]} errors vs {previous["errors"]}')
+    return regressions
@@ -0,0 +1,233 @@
+"""
+Versioned response cache and conditional GET support for the read-only catalog endpoints.
+
+Rendered responses are stored under a key built from the catalog version, the
+scheme and host (pagination links are absolute), the route and the normalized
+query string. Any write to a catalog model bumps the
+version (see catalog.signals), which orphans every cached response at once
+instead of tracking which pages a change affects. Orphaned entries simply
+expire.
+
+The version only invalidates what every process reads it from: with a
+per-process backend (locmem) a bump made by one gunicorn worker or by the task
+worker never reaches the others, which keep serving their old pages. Set
+CATALOG_CACHE_SHARED = False for such backends (both settings modules derive it
+from the configured backend) and the response cache stays off.
+
+The same version, together with the time of the last bump, also yields strong
+ETags and Last-Modified dates, so unchanged resources are answered with a 304
+before any query or serialization runs. A process that missed a bump would keep
+confirming stale copies for as long as it lives, so validators are only sent
+when the cache is shared.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .routers import replicas_may_lag
+
+VERSION_KEY = 'catalog:version'
+MODIFIED_KEY = 'catalog:modified'
+HITS_KEY = 'catalog:stats:hits'
+MISSES_KEY = 'catalog:stats:misses'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def is_shared():
+    """Whether every web and task process reads the catalog version from the same cache"""
+    return getattr(settings, 'CATALOG_CACHE_SHARED', True)
+
+
+def is_enabled():
+    return getattr(settings, 'CATALOG_CACHE_ENABLED', True) and is_shared()
+
+
+def incr(cache, key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The key is missing or was evicted; add() keeps a racing writer's value
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def get_catalog_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    cache = get_cache()
+    cache.set(MODIFIED_KEY, int(time.time()), timeout=None)
+    return incr(cache, VERSION_KEY)
+
+
+def get_catalog_modified():
+    """Unix time of the last catalog write, seeded from the models' max timestamps"""
+    cache = get_cache()
+    modified = cache.get(MODIFIED_KEY)
+    if modified is None:
+        from .models import Category, Product, ProductImage, ProductProperty
+
+        timestamps = [
+            Product.objects.aggregate(latest=Max('updated_at'))['latest'],
+            Category.objects.aggregate(latest=Max('updated_at'))['latest'],
+            ProductImage.objects.aggregate(latest=Max('created_at'))['latest'],
+            ProductProperty.objects.aggregate(latest=Max('created_at'))['latest'],
+        ]
+        latest = max((ts for ts in timestamps if ts is not None), default=None)
+        modified = int(latest.timestamp()) if latest else int(time.time())
+        cache.add(MODIFIED_KEY, modified, timeout=None)
+        modified = cache.get(MODIFIED_KEY, modified)
+    return modified
+
+
+def get_cache_stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'version': get_catalog_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+    }
+
+
+def reset_cache_stats():
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+def get_catalog_stats():
+    """Catalog totals, recomputed at most once per catalog version"""
+    from .models import Category, Product
+
+    cache = get_cache()
+    key = f'catalog:totals:{get_catalog_version()}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = {
+            'total_products': Product.objects.published().count(),
+            'total_categories': Category.objects.count(),
+        }
+        cache.set(key, stats, get_timeout())
+    return stats
+
+
+def build_request_digest(request, version):
+    params = sorted(
+        (key, sorted(values)) for key, values in request.GET.lists()
+    )
+    raw = '|'.join([
+        str(version),
+        request.scheme,
+        request.get_host(),
+        request.path,
+        repr(params),
+        request.META.get('HTTP_ACCEPT', ''),
+    ])
+    return hashlib.md5(raw.encode('utf-8'), usedforsecurity=False).hexdigest()
+
+
+def build_cache_key(request):
+    return f'catalog:response:{build_request_digest(request, get_catalog_version())}'
+
+
+def get_validators(request):
+    """Strong ETag and Last-Modified time for a catalog GET, or (None, None) when the cache is not shared"""
+    if not is_shared():
+        return None, None
+    return f'"{build_request_digest(request, get_catalog_version())}"', get_catalog_modified()
+
+
+def get_cached_response(request):
+    """Look up `request` in the response cache, counting the hit or miss; returns (key, response or None)"""
+    cache = get_cache()
+    key = build_cache_key(request)
+    cached = cache.get(key)
+    if cached is None:
+        incr(cache, MISSES_KEY)
+        return key, None
+    incr(cache, HITS_KEY)
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    patch_vary_headers(response, ['Accept'])
+    response['X-Cache'] = 'HIT'
+    return key, response
+
+
+def store_response(key, response):
+    # Right after a write the read replicas may still return the old rows; don't keep those for the full timeout
+    if replicas_may_lag(get_catalog_modified()):
+        return
+    get_cache().set(key, (response.content, response['Content-Type']), get_timeout())
+
+
+def set_validators(response, etag, last_modified):
+    if etag is not None and response.status_code in (200, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def is_cacheable(view, request):
+    action = view.action_map.get(request.method.lower()) if hasattr(view, 'action_map') else None
+    return request.method == 'GET' and action not in view.uncached_actions
+
+
+class ConditionalGetMixin:
+    """Answer If-None-Match / If-Modified-Since from the catalog version, without touching the view"""
+    uncached_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_cacheable(self, request):
+            return super().dispatch(request, *args, **kwargs)
+
+        etag, last_modified = get_validators(request)
+        if etag is None:
+            return super().dispatch(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+
+class CachedResponseMixin:
+    """Serve GET requests on a viewset from the versioned catalog cache"""
+    uncached_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_cacheable(self, request) or not is_enabled():
+            return super().dispatch(request, *args, **kwargs)
+
+        key, cached = get_cached_response(request)
+        if cached is not None:
+            return cached
+
+        response = super().dispatch(request, *args, **kwargs)
+        # Only JSON is cached: the browsable API renders per-user HTML
+        media_type = getattr(response, 'accepted_media_type', '') or ''
+        if response.status_code == 200 and media_type.startswith('application/json'):
+            response.render()
+            store_response(key, response)
+        response['X-Cache'] = 'MISS'
+        return response
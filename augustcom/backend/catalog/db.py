@@ -0,0 +1,44 @@
+"""
+Connection settings and pool utilization for the configured databases.
+
+PostgreSQL connections configured with OPTIONS['pool'] (Django 5.1+, psycopg 3)
+expose a psycopg_pool.ConnectionPool as `connection.pool`; every other backend
+reports `pool: None`. Nothing here runs a query.
+"""
+from django.db import connections
+
+
+def get_pool_stats(connection):
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    size = stats.get('pool_size', 0)
+    available = stats.get('pool_available', 0)
+    max_size = stats.get('pool_max', getattr(pool, 'max_size', 0))
+    in_use = size - available
+    return {
+        'min_size': stats.get('pool_min', getattr(pool, 'min_size', 0)),
+        'max_size': max_size,
+        'size': size,
+        'available': available,
+        'in_use': in_use,
+        'utilization': round(in_use / max_size, 4) if max_size else 0.0,
+        'waiting': stats.get('requests_waiting', 0),
+        'requests': stats.get('requests_num', 0),
+        'requests_queued': stats.get('requests_queued', 0),
+        'requests_wait_ms': stats.get('requests_wait_ms', 0),
+        'requests_errors': stats.get('requests_errors', 0),
+        'connections_opened': stats.get('connections_num', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+    }
+
+
+def get_database_stats(alias):
+    connection = connections[alias]
+    return {
+        'vendor': connection.vendor,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'conn_health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+        'pool': get_pool_stats(connection),
+    }
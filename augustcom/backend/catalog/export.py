@@ -0,0 +1,89 @@
+"""
+Streaming export of the published catalog as NDJSON or CSV.
+
+Products are walked with `.iterator(chunk_size=...)`, which fetches properties
+and images for each chunk with one prefetch query apiece, so memory stays
+bounded by the chunk size however large the catalog is. Both formats use the
+same shape `import_catalog` reads, so an export can be re-imported elsewhere.
+"""
+import csv
+import json
+
+from .models import Product, ProductProperty
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+DEFAULT_CHUNK_SIZE = 1000
+CSV_COLUMNS = [
+    'id', 'slug', 'name', 'description', 'price', 'category', 'is_published',
+    'stock_quantity', 'image', 'additional_images', 'updated_at',
+]
+PROPERTY_COLUMN_PREFIX = 'property.'
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def iter_products(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    if queryset is None:
+        queryset = Product.objects.published()
+    return queryset.for_api(with_images=True).order_by('pk').iterator(chunk_size=chunk_size)
+
+
+def product_to_record(product, build_url=None):
+    def image_url(image):
+        url = image.image.url if image.image else ''
+        return build_url(url) if build_url and url else url
+
+    images = [image_url(image) for image in product.images.all()]
+    primary = image_url(product.primary_image) if product.primary_image_id else (images[0] if images else '')
+    return {
+        'id': product.pk,
+        'slug': product.slug,
+        'name': product.name,
+        'description': product.description,
+        'price': str(product.price),
+        'category': product.category.name,
+        'is_published': product.is_published,
+        'stock_quantity': product.stock_quantity,
+        'image': primary,
+        'additional_images': [url for url in images if url and url != primary],
+        'properties': {prop.key: prop.value for prop in product.properties.all()},
+        'updated_at': product.updated_at.isoformat(),
+    }
+
+
+def iter_ndjson(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE, build_url=None):
+    for product in iter_products(queryset, chunk_size):
+        yield json.dumps(product_to_record(product, build_url)) + '\n'
+
+
+def iter_csv(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE, build_url=None):
+    if queryset is None:
+        queryset = Product.objects.published()
+    # Property columns must be known up front; one DISTINCT over the (key, value, product) index
+    keys = sorted(set(
+        ProductProperty.objects.filter(product__in=queryset.order_by().values('pk'))
+        .order_by().values_list('key', flat=True).distinct()
+    ))
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS + [f'{PROPERTY_COLUMN_PREFIX}{key}' for key in keys])
+    for product in iter_products(queryset, chunk_size):
+        record = product_to_record(product, build_url)
+        record['additional_images'] = ' '.join(record['additional_images'])
+        yield writer.writerow(
+            [record[column] for column in CSV_COLUMNS]
+            + [record['properties'].get(key, '') for key in keys]
+        )
+
+
+def iter_export(export_format, queryset=None, chunk_size=DEFAULT_CHUNK_SIZE, build_url=None):
+    if export_format == 'csv':
+        return iter_csv(queryset, chunk_size, build_url)
+    return iter_ndjson(queryset, chunk_size, build_url)
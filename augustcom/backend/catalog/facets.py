@@ -0,0 +1,61 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Sum
+
+from .models import ProductFacet, ProductListing
+
+# Filters the precomputed ProductFacet rows can answer on their own
+PRECOMPUTED_FILTERS = {'category', 'category_id', 'ordering'}
+
+
+def get_max_products():
+    return getattr(settings, 'CATALOG_FACETS_MAX_PRODUCTS', 10000)
+
+
+def get_precomputed_counts(data):
+    """(key, value, count) rows of the ProductFacet table for the filter's category, or the whole catalog"""
+    rows = ProductFacet.objects.all()
+    if data.get('category'):
+        rows = rows.filter(category__slug=data['category'])
+    if data.get('category_id') is not None:
+        rows = rows.filter(category_id=data['category_id'])
+    rows = rows.values('key', 'value').annotate(count=Sum('product_count')).order_by()
+    return [(row['key'], row['value'], row['count']) for row in rows]
+
+
+def get_facet_counts(filterset):
+    """
+    Return `(facets, approximate)` for the filterset's result set, where facets
+    is `{key: [{'value': ..., 'count': ...}, ...]}`, most common values first.
+
+    Unfiltered and category-scoped listings read the precomputed ProductFacet
+    table. Narrower result sets (price, search, property filters) are counted
+    from the precomputed per-product properties of their ProductListing rows,
+    without touching ProductProperty. That count is bounded: past
+    CATALOG_FACETS_MAX_PRODUCTS matching products the precomputed counts of the
+    category (or catalog) are returned instead, as upper bounds, with
+    `approximate` set.
+    """
+    data = filterset.form.cleaned_data
+    active = {name for name, value in data.items() if value not in (None, '', [])}
+    approximate = False
+    if active <= PRECOMPUTED_FILTERS:
+        counts = get_precomputed_counts(data)
+    else:
+        limit = get_max_products()
+        listed = list(
+            ProductListing.objects.filter(pk__in=filterset.qs.order_by().values('pk'))
+            .values_list('properties', flat=True)[:limit + 1]
+        )
+        if len(listed) > limit:
+            counts, approximate = get_precomputed_counts(data), True
+        else:
+            # Listing properties are [id, key, value, order]
+            counter = Counter((key, value) for properties in listed for _, key, value, _ in properties)
+            counts = [(key, value, count) for (key, value), count in counter.items()]
+
+    facets = {}
+    for key, value, count in sorted(counts, key=lambda row: (row[0], -row[2], row[1])):
+        facets.setdefault(key, []).append({'value': value, 'count': count})
+    return facets, approximate
@@ -0,0 +1,182 @@
+"""
+Fast serialization path for product list responses.
+
+ProductListSerializer builds a tree of DRF field objects for every product on
+the page (plus nested category, property and image serializers), which
+dominates CPU time on large pages. The functions here build the same dicts
+straight from `.values()` rows: one joined query for products, categories and
+primary images, and one query for the page's properties, grouped in Python.
+
+Leaf values go through the same DRF fields the serializers use, so the
+rendered JSON is byte-identical (see FastSerializerParityTest). Disable with
+CATALOG_FAST_SERIALIZERS = False.
+
+The list endpoints go one step further and read the ProductListing table,
+which stores the serialized values: listing_values() turns a serialized
+product into a row, serialize_listing_rows() turns rows back into the same
+dicts. Disable with CATALOG_LISTING_READS = False.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+from .images import build_srcsets
+from .models import Product, ProductProperty
+
+CATEGORY_FIELDS = ('id', 'name', 'slug', 'description', 'published_products_count', 'created_at')
+IMAGE_FIELDS = ('id', 'image', 'variants', 'alt_text', 'is_primary')
+PRODUCT_LIST_VALUES = (
+    ('id', 'name', 'slug', 'price', 'created_at', 'category_id', 'primary_image_id')
+    + tuple(f'category__{field}' for field in CATEGORY_FIELDS[1:])
+    + tuple(f'primary_image__{field}' for field in IMAGE_FIELDS[1:])
+)
+
+_price_field = Product._meta.get_field('price')
+PRICE = serializers.DecimalField(max_digits=_price_field.max_digits, decimal_places=_price_field.decimal_places)
+DATETIME = serializers.DateTimeField()
+
+
+LISTING_VALUES = (
+    'id', 'name', 'slug', 'price', 'created_at', 'category_id', 'category_name', 'category_slug',
+    'category_description', 'category_products_count', 'category_created_at', 'primary_image', 'properties',
+)
+
+
+def is_enabled():
+    return getattr(settings, 'CATALOG_FAST_SERIALIZERS', True)
+
+
+def listing_reads_enabled():
+    return getattr(settings, 'CATALOG_LISTING_READS', True)
+
+
+def product_list_rows(queryset):
+    """`queryset` (e.g. from ProductQuerySet.for_api()) as rows carrying every field the list response needs"""
+    return queryset.prefetch_related(None).values(*PRODUCT_LIST_VALUES)
+
+
+def get_properties(product_ids):
+    """{product id: [property dicts]} for the given products, in ProductPropertySerializer shape"""
+    properties = {pk: [] for pk in product_ids}
+    rows = ProductProperty.objects.filter(product_id__in=product_ids).order_by(
+        *ProductProperty._meta.ordering
+    ).values_list('product_id', 'id', 'key', 'value', 'order')
+    for product_id, pk, key, value, order in rows:
+        properties[product_id].append({'id': pk, 'key': key, 'value': value, 'order': order})
+    return properties
+
+
+def serialize_category(row):
+    """CategorySerializer output from the category__* columns of a product row"""
+    return {
+        'id': row['category_id'],
+        'name': row['category__name'],
+        'slug': row['category__slug'],
+        'description': row['category__description'],
+        'products_count': row['category__published_products_count'],
+        'created_at': DATETIME.to_representation(row['category__created_at']),
+    }
+
+
+def serialize_primary_image(row):
+    """ProductImageSerializer output (without a request, as ProductListSerializer uses it)"""
+    if not row['primary_image_id']:
+        return None
+    name = row['primary_image__image']
+    return {
+        'id': row['primary_image_id'],
+        'image': default_storage.url(name) if name else None,
+        'variants': build_srcsets(row['primary_image__variants']),
+        'alt_text': row['primary_image__alt_text'],
+        'is_primary': row['primary_image__is_primary'],
+    }
+
+
+def serialize_product_rows(rows, properties=None):
+    """
+    ProductListSerializer(many=True).data equivalent for rows from
+    product_list_rows(). `properties` defaults to get_properties() for the rows.
+    """
+    rows = list(rows)
+    if properties is None:
+        properties = get_properties([row['id'] for row in rows])
+    # Pages usually repeat a handful of categories; build each one once
+    categories = {}
+    data = []
+    for row in rows:
+        category = categories.get(row['category_id'])
+        if category is None:
+            category = categories[row['category_id']] = serialize_category(row)
+        data.append({
+            'id': row['id'],
+            'name': row['name'],
+            'slug': row['slug'],
+            'price': PRICE.to_representation(row['price']),
+            'category': category,
+            'properties': properties[row['id']],
+            'primary_image': serialize_primary_image(row),
+            'created_at': DATETIME.to_representation(row['created_at']),
+        })
+    return data
+
+
+def listing_values(row, item):
+    """ProductListing field values for a product_list_rows() row and its serialized dict"""
+    image = item['primary_image']
+    if image is not None:
+        image = [image['id'], image['image'], list(image['variants'].items()), image['alt_text'], image['is_primary']]
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'slug': row['slug'],
+        'price': row['price'],
+        'created_at': row['created_at'],
+        'category_id': row['category_id'],
+        'category_name': row['category__name'],
+        'category_slug': row['category__slug'],
+        'category_description': row['category__description'],
+        'category_products_count': row['category__published_products_count'],
+        'category_created_at': row['category__created_at'],
+        'primary_image': image,
+        'properties': [[prop['id'], prop['key'], prop['value'], prop['order']] for prop in item['properties']],
+    }
+
+
+def listing_rows(queryset):
+    """A ProductListing queryset as rows for serialize_listing_rows()"""
+    return queryset.values(*LISTING_VALUES)
+
+
+def serialize_listing_rows(rows):
+    """ProductListSerializer(many=True).data equivalent for rows from listing_rows()"""
+    categories = {}
+    data = []
+    for row in rows:
+        category = categories.get(row['category_id'])
+        if category is None:
+            category = categories[row['category_id']] = {
+                'id': row['category_id'],
+                'name': row['category_name'],
+                'slug': row['category_slug'],
+                'description': row['category_description'],
+                'products_count': row['category_products_count'],
+                'created_at': DATETIME.to_representation(row['category_created_at']),
+            }
+        image = row['primary_image']
+        if image is not None:
+            pk, url, variants, alt_text, is_primary = image
+            image = {'id': pk, 'image': url, 'variants': dict(variants), 'alt_text': alt_text, 'is_primary': is_primary}
+        data.append({
+            'id': row['id'],
+            'name': row['name'],
+            'slug': row['slug'],
+            'price': PRICE.to_representation(row['price']),
+            'category': category,
+            'properties': [
+                {'id': pk, 'key': key, 'value': value, 'order': order}
+                for pk, key, value, order in row['properties']
+            ],
+            'primary_image': image,
+            'created_at': DATETIME.to_representation(row['created_at']),
+        })
+    return data
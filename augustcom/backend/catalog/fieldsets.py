@@ -0,0 +1,78 @@
+"""
+Sparse fieldsets for the product list endpoints.
+
+`?fields=id,name,price,category` keeps only the listed fields of each product.
+In such a compact page the category is a reference (its id) and each category
+on the page is sent once, in a top-level `categories` object keyed by id;
+`?expand=category` inlines the full category again. Without `fields` the
+response is unchanged.
+"""
+from functools import cached_property
+
+from rest_framework.exceptions import ValidationError
+
+from .serializers import ProductListSerializer
+
+PRODUCT_FIELDS = tuple(ProductListSerializer.Meta.fields)
+EXPANDABLE_FIELDS = ('category',)
+
+
+def parse_fields(request, param, choices):
+    """The comma-separated values of `param` in serializer order, or None when it is absent or empty"""
+    raw = request.query_params.get(param, '')
+    values = {value.strip() for value in raw.split(',') if value.strip()}
+    if not values:
+        return None
+    unknown = values.difference(choices)
+    if unknown:
+        raise ValidationError({
+            param: f'Unknown field(s): {", ".join(sorted(unknown))}. Choose from: {", ".join(choices)}'
+        })
+    return [field for field in choices if field in values]
+
+
+def slim_products(items, fields, expand=()):
+    """
+    Keep `fields` of each serialized product; returns (items, categories), where
+    categories is the side table of referenced categories, or None when the
+    category is inlined or not requested.
+    """
+    categories = {} if 'category' in fields and 'category' not in expand else None
+    slimmed = []
+    for item in items:
+        data = {field: item[field] for field in fields}
+        if categories is not None:
+            category = item['category']
+            # JSON object keys are strings; orjson rejects anything else
+            categories.setdefault(str(category['id']), category)
+            data['category'] = category['id']
+        slimmed.append(data)
+    return slimmed, categories
+
+
+class SparseFieldsetsMixin:
+    """Apply ?fields= and ?expand= to the paginated responses of `sparse_actions`"""
+    sparse_actions = ('list',)
+
+    @cached_property
+    def fieldsets(self):
+        """(fields, expand) for this request, or None for the full representation"""
+        if self.action not in self.sparse_actions:
+            return None
+        fields = parse_fields(self.request, 'fields', PRODUCT_FIELDS)
+        expand = parse_fields(self.request, 'expand', EXPANDABLE_FIELDS) or []
+        return None if fields is None else (fields, expand)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Reject unknown fields before running any query
+        self.fieldsets
+
+    def get_paginated_response(self, data):
+        if self.fieldsets is None:
+            return super().get_paginated_response(data)
+        data, categories = slim_products(data, *self.fieldsets)
+        response = super().get_paginated_response(data)
+        if categories is not None:
+            response.data['categories'] = categories
+        return response
@@ -1,5 +1,6 @@
 import django_filters
-from .models import Product
+from .models import Product, ProductListing, ProductProperty
+from .search import filter_product_names, filter_products
 
 
 class ProductFilter(django_filters.FilterSet):
@@ -7,7 +8,9 @@ class ProductFilter(django_filters.FilterSet):
     category_id = django_filters.NumberFilter(field_name='category__id', lookup_expr='exact')
     min_price = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
-    name = django_filters.CharFilter(field_name='name', lookup_expr='icontains')
+    name = django_filters.CharFilter(method='filter_name', label='Name')
+    q = django_filters.CharFilter(method='filter_search', label='Search')
+    prop = django_filters.CharFilter(method='filter_properties', label='Property (Key:Value)')
     ordering = django_filters.OrderingFilter(
         fields=(
             ('price', 'price'),
@@ -27,9 +30,46 @@ class ProductFilter(django_filters.FilterSet):
         }
     )
 
+    def filter_search(self, queryset, name, value):
+        """Match against the full-text index instead of LIKE scans"""
+        return filter_products(queryset, value)
+
+    def filter_name(self, queryset, name, value):
+        """Words of the name, by prefix, from the full-text index; `q` also searches descriptions and properties"""
+        return filter_product_names(queryset, value)
+
+    def filter_properties(self, queryset, name, value):
+        """
+        Filter on repeated `prop=Key:Value` parameters. Values of the same key are
+        OR-ed together, different keys are AND-ed.
+        """
+        for key, values in self.selected_properties().items():
+            # One subquery per key, served by the (key, value, product) index
+            queryset = queryset.filter(
+                pk__in=ProductProperty.objects.filter(key=key, value__in=values).values('product_id')
+            )
+        return queryset
+
+    def selected_properties(self):
+        raw_values = self.data.getlist('prop') if hasattr(self.data, 'getlist') else [self.data.get('prop', '')]
+        selected = {}
+        for raw in raw_values:
+            key, sep, value = raw.partition(':')
+            if sep and key.strip() and value.strip():
+                selected.setdefault(key.strip(), []).append(value.strip())
+        return selected
+
     class Meta:
         model = Product
-        fields = {
-            'category': ['exact'],
-            'name': ['icontains'],
-        }
+        # Only the declared filters; a generated name__icontains would bring back the LIKE scan
+        fields = []
+
+
+class ProductListingFilter(ProductFilter):
+    """ProductFilter for the ProductListing read model, whose category columns are copied in"""
+    category = django_filters.CharFilter(field_name='category_slug', lookup_expr='exact')
+    category_id = django_filters.NumberFilter(field_name='category_id', lookup_expr='exact')
+
+    class Meta:
+        model = ProductListing
+        fields = []
@@ -0,0 +1,90 @@
+"""
+Responsive image variants for ProductImage.
+
+Each uploaded image is resized to a fixed set of widths in WebP and JPEG and
+the variants are stored next to the original (`products/shoe.jpg` gets
+`products/shoe.320w.webp`, `products/shoe.320w.jpg`, ...). The generated names
+are recorded on ProductImage.variants so serializers can build `srcset`
+strings without touching storage.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+
+def get_variant_widths():
+    return tuple(getattr(settings, 'CATALOG_IMAGE_WIDTHS', (320, 640, 1024)))
+
+
+def get_variant_quality():
+    return getattr(settings, 'CATALOG_IMAGE_QUALITY', 80)
+
+
+def variant_name(name, width, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}.{width}w.{extension}'
+
+
+def generate_variants(name, storage=None):
+    """
+    Write every variant of the stored image `name` and return
+    `{format: {width: variant name}}`. Widths wider than the original are
+    skipped rather than upscaled. Touches storage only, never the database,
+    so it is safe to run in worker processes.
+    """
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as original:
+        source = ImageOps.exif_transpose(Image.open(original))
+        source.load()
+
+    variants = {}
+    for variant_format, (pil_format, extension) in VARIANT_FORMATS.items():
+        for width in get_variant_widths():
+            if width >= source.width:
+                continue
+            height = round(source.height * width / source.width)
+            resized = source.resize((width, height), Image.Resampling.LANCZOS)
+            if pil_format == 'JPEG' and resized.mode not in ('RGB', 'L'):
+                resized = resized.convert('RGB')
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, quality=get_variant_quality(), optimize=True)
+
+            target = variant_name(name, width, extension)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+            variants.setdefault(variant_format, {})[str(width)] = target
+    return variants
+
+
+def generate_variants_for(item):
+    """
+    ProcessPoolExecutor entry point for the backfill command: (pk, name) ->
+    (pk, variants, or None for unreadable images so the batch carries on)
+    """
+    pk, name = item
+    try:
+        return pk, generate_variants(name)
+    except (OSError, ValueError):
+        return pk, None
+
+
+def build_srcsets(variants, build_url=None):
+    """Turn stored variant names into `{format: "url 320w, url 640w"}`"""
+    srcsets = {}
+    for variant_format, by_width in (variants or {}).items():
+        entries = []
+        for width, name in sorted(by_width.items(), key=lambda item: int(item[0])):
+            url = default_storage.url(name)
+            entries.append(f'{build_url(url) if build_url else url} {width}w')
+        srcsets[variant_format] = ', '.join(entries)
+    return srcsets
@@ -0,0 +1,137 @@
+import json
+import re
+import time
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from catalog.benchmark import SCENARIOS, compare, scenario_context, summarize
+from catalog.models import Product
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+class Command(BaseCommand):
+    help = (
+        'Run every catalog endpoint scenario (catalog/benchmark.py) and report p50/p95/p99 latency and queries '
+        'per request. Requests go through the Django stack in-process, or to a running server with --base-url. '
+        'Save a run with --save-baseline and fail later runs that regress against it with --baseline. Generate '
+        'a large catalog first with `manage.py generate_catalog --products 1000000`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario first')
+        parser.add_argument('--only', help='Comma-separated substrings; run the scenarios whose name contains one')
+        parser.add_argument(
+            '--base-url',
+            help='Benchmark a running server instead (queries are read from its Server-Timing header, so enable '
+                 'CATALOG_SERVER_TIMING there)'
+        )
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout with --base-url')
+        parser.add_argument('--cache', action='store_true', help='Keep the response cache on (in-process only)')
+        parser.add_argument('--baseline', help='JSON file from --save-baseline to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p95 slowdown against the baseline')
+        parser.add_argument('--save-baseline', help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['warmup'] < 0:
+            raise CommandError('--requests must be positive and --warmup not negative')
+        context = scenario_context()
+        if context is None:
+            raise CommandError('No published products; run manage.py generate_catalog first')
+        scenarios = [(name, path.format(**context)) for name, path in SCENARIOS]
+        if options['only']:
+            filters = [part.strip() for part in options['only'].split(',') if part.strip()]
+            scenarios = [(name, path) for name, path in scenarios if any(part in name for part in filters)]
+            if not scenarios:
+                raise CommandError(f'No scenario matches {options["only"]!r}')
+
+        baseline = self.load_baseline(options['baseline']) if options['baseline'] else None
+        if options['base_url']:
+            fetch = self.http_fetcher(options['base_url'].rstrip('/'), options['timeout'])
+            results = self.run(scenarios, fetch, options)
+        else:
+            client = Client(HTTP_ACCEPT='application/json')
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                CATALOG_CACHE_ENABLED=options['cache'] and getattr(settings, 'CATALOG_CACHE_ENABLED', True),
+                CATALOG_SERVER_TIMING=True,
+            ):
+                results = self.run(scenarios, lambda path: self.client_fetch(client, path), options)
+
+        self.report(results, baseline)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump({
+                    'products': Product.objects.published().count(),
+                    'requests': options['requests'],
+                    'results': results,
+                }, f, indent=2)
+            self.stdout.write(f'Saved baseline to {options["save_baseline"]}')
+        if baseline is not None:
+            regressions = compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def run(self, scenarios, fetch, options):
+        results = {}
+        for name, path in scenarios:
+            for _ in range(options['warmup']):
+                fetch(path)
+            results[name] = summarize([fetch(path) for _ in range(options['requests'])])
+        return results
+
+    def client_fetch(self, client, path):
+        """(seconds, queries, status) for one in-process request"""
+        started = time.perf_counter()
+        response = client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = time.perf_counter() - started
+        return elapsed, self.parse_queries(response.get('Server-Timing')), response.status_code
+
+    def http_fetcher(self, base_url, timeout):
+        def fetch(path):
+            request = Request(base_url + path, headers={'Accept': 'application/json'})
+            started = time.perf_counter()
+            try:
+                with urlopen(request, timeout=timeout) as response:
+                    response.read()
+                    elapsed = time.perf_counter() - started
+                    return elapsed, self.parse_queries(response.headers.get('Server-Timing')), response.status
+            except HTTPError as exc:
+                return time.perf_counter() - started, None, exc.code
+            except (URLError, OSError):
+                return time.perf_counter() - started, None, 0
+        return fetch
+
+    def parse_queries(self, server_timing):
+        match = QUERIES_RE.search(server_timing or '')
+        return int(match.group(1)) if match else None
+
+    def load_baseline(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)['results']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f'{"scenario":<28} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8} {"errors":>7}'
+            + (f' {"p95 vs base":>12}' if baseline else '')
+        )
+        for name, result in results.items():
+            queries = '-' if result['queries'] is None else result['queries']
+            line = (
+                f'{name:<28} {result["p50_ms"]:>8.1f} {result["p95_ms"]:>8.1f} {result["p99_ms"]:>8.1f} '
+                f'{queries:>8} {result["errors"]:>7}'
+            )
+            previous = (baseline or {}).get(name)
+            if previous and previous['p95_ms']:
+                line += f' {(result["p95_ms"] / previous["p95_ms"] - 1) * 100:>+11.0f}%'
+            self.stdout.write(line)
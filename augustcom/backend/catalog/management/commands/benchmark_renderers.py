@@ -0,0 +1,87 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from catalog.renderers import FastJSONRenderer, orjson
+
+
+def build_payload(page_size, raw_values):
+    """
+    A product list page shaped like the API response. With `raw_values` prices
+    and timestamps are left as Decimal and datetime for the encoder to convert,
+    as in responses built without serializer fields.
+    """
+    now = timezone.now()
+    category = {
+        'id': 1, 'name': 'Phones', 'slug': 'phones', 'description': 'Smartphones and accessories',
+        'products_count': page_size, 'created_at': now if raw_values else now.isoformat(),
+    }
+    results = []
+    for i in range(page_size):
+        created_at = now - timedelta(minutes=i)
+        price = Decimal('199.99') + i
+        results.append({
+            'id': i,
+            'name': f'Product {i} – “Édition” ✓',
+            'slug': f'product-{i}',
+            'price': price if raw_values else str(price),
+            'category': category,
+            'properties': [
+                {'id': i * 3 + order, 'key': key, 'value': f'{key} {i % 5}', 'order': order}
+                for order, key in enumerate(('Color', 'Storage', 'Material'), start=1)
+            ],
+            'primary_image': {
+                'id': i, 'image': f'/media/products/product-{i}.jpg', 'alt_text': 'Front', 'is_primary': True,
+                'variants': {'webp': f'/media/products/product-{i}.320w.webp 320w'},
+            },
+            'created_at': created_at if raw_values else created_at.isoformat(),
+        })
+    return {'count': page_size * 10, 'next': 'http://example.com/api/products/?page=2', 'previous': None,
+            'results': results}
+
+
+class Command(BaseCommand):
+    help = 'Measure encode throughput of DRF\'s JSONRenderer against catalog.renderers.FastJSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', default='12,100,1000', help='Comma-separated list page sizes')
+        parser.add_argument('--repeat', type=int, default=200, help='Renders per renderer and payload')
+
+    def handle(self, *args, **options):
+        try:
+            page_sizes = [int(size) for size in options['page_sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--page-sizes must be comma-separated integers')
+        if orjson is None:
+            self.stderr.write('orjson is not installed; FastJSONRenderer falls back to the stdlib encoder')
+
+        self.stdout.write(
+            f'{"payload":<22} {"bytes":>9} {"json MB/s":>10} {"fast MB/s":>10} {"json ms":>8} {"fast ms":>8} '
+            f'{"speedup":>8}'
+        )
+        for page_size in page_sizes:
+            for raw_values in (False, True):
+                payload = build_payload(page_size, raw_values)
+                expected = JSONRenderer().render(payload)
+                if FastJSONRenderer().render(payload) != expected:
+                    raise CommandError(f'Renderers disagree on the {page_size}-item payload')
+                stdlib = self.best(JSONRenderer(), payload, options['repeat'])
+                fast = self.best(FastJSONRenderer(), payload, options['repeat'])
+                label = f'{page_size} items{" (raw values)" if raw_values else ""}'
+                megabytes = len(expected) / 1024 / 1024
+                self.stdout.write(
+                    f'{label:<22} {len(expected):>9} {megabytes / stdlib * 1000:>10.1f} '
+                    f'{megabytes / fast * 1000:>10.1f} {stdlib:>8.3f} {fast:>8.3f} {stdlib / fast:>7.1f}x'
+                )
+
+    def best(self, renderer, payload, repeat):
+        """Fastest render in milliseconds"""
+        timings = []
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            renderer.render(payload, 'application/json')
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
@@ -0,0 +1,95 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from catalog import fast_serializers
+from catalog.models import Category, Product, ProductProperty
+from catalog.serializers import ProductListSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare ProductListSerializer with the .values() fast path (catalog/fast_serializers.py) per page size. '
+        'Reports the time to fetch and serialize one page, and serialization alone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', default='12,50,200,1000', help='Comma-separated page sizes')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per page size; the best run is reported')
+        parser.add_argument(
+            '--synthetic', type=int, default=0,
+            help='Benchmark against this many generated products, rolled back afterwards'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            page_sizes = [int(size) for size in options['page_sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--page-sizes must be comma-separated integers')
+        if options['synthetic']:
+            try:
+                with transaction.atomic():
+                    self.create_products(options['synthetic'])
+                    self.benchmark(page_sizes, options['repeat'])
+                    raise Rollback
+            except Rollback:
+                pass
+        else:
+            self.benchmark(page_sizes, options['repeat'])
+
+    def create_products(self, count):
+        category = Category.objects.create(name='Benchmark Category', description='Generated by benchmark_serializers')
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Benchmark Product {i}', slug=f'benchmark-product-{i}', description='Generated',
+                price=Decimal('9.99') + i, category=category, is_published=True,
+            )
+            for i in range(count)
+        ])
+        ProductProperty.objects.bulk_create([
+            ProductProperty(product=product, key=key, value=f'{key} {product.pk % 5}', order=order)
+            for product in products
+            for order, key in enumerate(('Color', 'Size', 'Material'), start=1)
+        ])
+
+    def benchmark(self, page_sizes, repeat):
+        queryset = Product.objects.published().for_api()
+        available = queryset.count()
+        if not available:
+            raise CommandError('No published products; pass --synthetic N to generate some')
+
+        self.stdout.write(
+            f'{"page size":>9} {"drf total ms":>13} {"fast total ms":>14} {"drf ser ms":>11} '
+            f'{"fast ser ms":>12} {"speedup":>8} {"ser speedup":>12}'
+        )
+        for page_size in page_sizes:
+            page = queryset[:page_size]
+            rows = fast_serializers.product_list_rows(queryset)[:page_size]
+            drf_total = self.best(repeat, lambda: ProductListSerializer(list(page.all()), many=True).data)
+            fast_total = self.best(repeat, lambda: fast_serializers.serialize_product_rows(rows.all()))
+
+            # Serialization alone, from products, rows and properties loaded once up front
+            products = list(page.all())
+            fetched_rows = list(rows.all())
+            properties = fast_serializers.get_properties([row['id'] for row in fetched_rows])
+            drf_only = self.best(repeat, lambda: ProductListSerializer(products, many=True).data)
+            fast_only = self.best(
+                repeat, lambda: fast_serializers.serialize_product_rows(fetched_rows, properties)
+            )
+            self.stdout.write(
+                f'{min(page_size, available):>9} {drf_total:>13.2f} {fast_total:>14.2f} {drf_only:>11.2f} '
+                f'{fast_only:>12.2f} {drf_total / fast_total:>7.1f}x {drf_only / fast_only:>11.1f}x'
+            )
+
+    def best(self, repeat, func):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
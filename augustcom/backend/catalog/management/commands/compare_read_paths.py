@@ -0,0 +1,92 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from catalog.models import Category, Product
+
+# (label, sync path, async path); {product} and {category} are filled from the database
+SCENARIOS = [
+    ('product list', '/api/products/', '/api/async/products/'),
+    ('product list page 2', '/api/products/?page=2', '/api/async/products/?page=2'),
+    ('product detail', '/api/products/{product}/', '/api/async/products/{product}/'),
+    ('category products', '/api/categories/{category}/products/', '/api/async/categories/{category}/products/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the sync (WSGI) and async (ASGI) catalog read endpoints of a running server and '
+        'compare throughput and latency. Run it once against gunicorn with shopcore.wsgi and once '
+        'against gunicorn with the uvicorn worker and shopcore.asgi, or pass both base URLs. Start the '
+        'servers with CATALOG_CACHE_ENABLED=False so requests reach the database instead of the response cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server used for both paths')
+        parser.add_argument('--async-base-url', help='Separate server for the async path (e.g. the ASGI profile)')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and path')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive')
+        product = Product.objects.published().order_by('pk').values_list('slug', flat=True).first()
+        category = Category.objects.filter(published_products_count__gt=0).order_by('pk').values_list(
+            'slug', flat=True
+        ).first()
+        if product is None or category is None:
+            raise CommandError('Load some published products first (e.g. manage.py seed_demo)')
+
+        sync_base = options['base_url'].rstrip('/')
+        async_base = (options['async_base_url'] or sync_base).rstrip('/')
+        results = []
+        for label, sync_path, async_path in SCENARIOS:
+            for mode, base, path in (('sync', sync_base, sync_path), ('async', async_base, async_path)):
+                url = base + path.format(product=product, category=category)
+                results.append({'endpoint': label, 'path': mode, **self.run(url, options)})
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f'{"endpoint":<20} {"path":<6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}'
+        )
+        for result in results:
+            self.stdout.write(
+                f'{result["endpoint"]:<20} {result["path"]:<6} {result["rps"]:>8.1f} {result["p50_ms"]:>8.1f} '
+                f'{result["p95_ms"]:>8.1f} {result["p99_ms"]:>8.1f} {result["errors"]:>7}'
+            )
+
+    def run(self, url, options):
+        # No validators are sent, so the server never answers with a 304
+        def fetch(_):
+            request = Request(url, headers={'Accept': 'application/json'})
+            started = time.perf_counter()
+            try:
+                with urlopen(request, timeout=options['timeout']) as response:
+                    response.read()
+                    ok = response.status == 200
+            except (HTTPError, URLError, OSError):
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            samples = list(executor.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, _ in samples)
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return {
+            'rps': len(samples) / elapsed,
+            'p50_ms': quantiles[49],
+            'p95_ms': quantiles[94],
+            'p99_ms': quantiles[98],
+            'errors': sum(1 for _, ok in samples if not ok),
+        }
@@ -0,0 +1,121 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from catalog.fast_serializers import listing_rows
+from catalog.models import Category, Product, ProductListing
+
+
+# Postgres reports "Seq Scan on <table>"; SQLite reports "SCAN <table>" unless an index is used
+SEQ_SCAN_PATTERNS = [
+    re.compile(r'Seq Scan on (?P<table>\w+)'),
+    re.compile(r'\bSCAN (?P<table>\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the canonical catalog API queries and flag sequential scans'
+
+    # Tables the list endpoints must never scan in full
+    scanned_tables = (Product._meta.db_table, ProductListing._meta.db_table)
+    # Stand-in cursor values for keyset pages of an empty catalog
+    empty_cursor_values = {'created_at': timezone.now, 'price': lambda: 0, 'name': lambda: ''}
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Execute the queries (EXPLAIN ANALYZE) on backends that support it'
+        )
+        parser.add_argument(
+            '--fail-on-seq-scan', action='store_true',
+            help='Exit with an error if any canonical query scans the product or listing table sequentially'
+        )
+
+    def get_listing_queries(self, category_id, category_slug):
+        """
+        The ProductListing queries that serve /api/products/ (also filtered by
+        ?category=<slug>) and /api/categories/<slug>/products/, with page-number
+        and keyset (?pagination=cursor) pages for each ordering
+        """
+        anchor = ProductListing.objects.order_by('pk').first()
+        queries = [('listing count', ProductListing.objects.values('pk'))]
+        for ordering in ['-created_at', 'price', '-price', 'name', '-name']:
+            tiebreaker = '-id' if ordering.startswith('-') else 'id'
+            listings = ProductListing.objects.order_by(ordering, tiebreaker)
+            scopes = [
+                ('listing product list', listings),
+                ('listing product list ?category=', listings.filter(category_slug=category_slug)),
+                ('listing category products', listings.filter(category_id=category_id)),
+            ]
+            field = ordering.lstrip('-')
+            value = getattr(anchor, field) if anchor else self.empty_cursor_values[field]()
+            lookup = 'lt' if ordering.startswith('-') else 'gt'
+            # The predicate KeysetPagination adds for the page after `anchor`
+            after_cursor = (
+                Q(**{f'{field}__{lookup}': value})
+                | Q(**{field: value, f'id__{lookup}': anchor.pk if anchor else 0})
+            )
+            for label, queryset in scopes:
+                queries.append((f'{label} ordering={ordering}', listing_rows(queryset)[:12]))
+                queries.append((
+                    f'{label} cursor ordering={ordering}', listing_rows(queryset.filter(after_cursor))[:13]
+                ))
+        return queries
+
+    def get_canonical_queries(self):
+        """
+        The queries behind /api/products/ and /api/categories/<slug>/products/ for
+        each ordering, on the ProductListing read model and on the Product ORM
+        path used when CATALOG_LISTING_READS is off
+        """
+        category = Category.objects.order_by('pk').first()
+        category_id = category.pk if category else 0
+        product = Product.objects.published().order_by('pk').first()
+        queries = self.get_listing_queries(category_id, category.slug if category else '')
+        for ordering in ['-created_at', 'price', '-price', 'name', '-name']:
+            tiebreaker = '-id' if ordering.startswith('-') else 'id'
+            published = Product.objects.published().order_by(ordering, tiebreaker)
+            queries.append((f'product list ordering={ordering}', published.for_api()[:12]))
+            queries.append((
+                f'category products ordering={ordering}',
+                published.filter(category_id=category_id).for_api()[:12]
+            ))
+        queries.append(('product list count', Product.objects.published().values('pk')))
+        queries.append((
+            'product detail',
+            Product.objects.published().for_api(with_images=True).filter(slug=product.slug if product else '')
+        ))
+        queries.append(('category detail', Category.objects.filter(slug=category.slug if category else '')))
+        return queries
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+
+        flagged = []
+        for label, queryset in self.get_canonical_queries():
+            plan = queryset.explain(**explain_options)
+            tables = sorted({
+                match.group('table')
+                for pattern in SEQ_SCAN_PATTERNS
+                for match in pattern.finditer(plan)
+            })
+            seq_tables = [table for table in tables if table in self.scanned_tables]
+            if seq_tables:
+                flagged.append(label)
+                self.stdout.write(self.style.WARNING(f'[SEQ SCAN] {label}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'[ok] {label}'))
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if flagged:
+            message = f'{len(flagged)} catalog queries scan {" or ".join(self.scanned_tables)} sequentially'
+            if options['fail_on_seq_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No sequential scans on the product or listing tables'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from catalog.export import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream the published catalog as NDJSON or CSV with bounded memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson', help='Output format')
+        parser.add_argument('--output', default='-', help='Output file (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Products fetched per query')
+
+    def handle(self, *args, **options):
+        lines = iter_export(options['format'], chunk_size=options['chunk_size'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            output.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(f'Exported catalog to {options["output"]}'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from catalog.benchmark import delete_catalog, generate_catalog
+from catalog.models import Category
+from catalog.routers import pinned_scope
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a reproducible synthetic catalog (categories, products, properties, image rows) for '
+        'benchmarks, e.g. --products 1000000. Derived data (counts, listings, search index, facets) is built too.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help='Products to generate')
+        parser.add_argument('--categories', type=int, default=20, help='Categories to spread them over')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same catalog')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Products inserted per transaction')
+        parser.add_argument('--image-ratio', type=float, default=0.8, help='Share of products with a primary image')
+        parser.add_argument('--prefix', default='synthetic', help='Slug prefix of the generated rows')
+        parser.add_argument('--clear', action='store_true', help='Delete a catalog generated with --prefix first')
+
+    @pinned_scope()
+    def handle(self, *args, **options):
+        if options['products'] < 0 or options['categories'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--products must not be negative; --categories and --batch-size must be positive')
+        if options['clear']:
+            deleted = delete_catalog(options['prefix'])
+            self.stdout.write(f'Deleted {deleted} generated categories and their products')
+        elif options['products'] and self.exists(options['prefix']):
+            raise CommandError(f'A catalog with prefix "{options["prefix"]}" exists; pass --clear or another --prefix')
+        if not options['products']:
+            return
+
+        generate_catalog(
+            options['products'], categories=options['categories'], seed=options['seed'],
+            batch_size=options['batch_size'], prefix=options['prefix'], image_ratio=options['image_ratio'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {options["products"]} products in {options["categories"]} categories'
+        ))
+
+    def exists(self, prefix):
+        return Category.objects.filter(slug__startswith=f'{prefix}-category-').exists()
@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from catalog.cache import bump_catalog_version
+from catalog.images import generate_variants_for
+from catalog.models import ProductImage, ProductListing
+from catalog.routers import pinned_scope
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/JPEG variants for existing product images using a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count, 0 runs inline)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Images loaded and saved per batch')
+        parser.add_argument('--force', action='store_true', help='Regenerate images that already have variants')
+
+    @pinned_scope()
+    def handle(self, *args, **options):
+        queryset = ProductImage.objects.exclude(image='').order_by('pk')
+        if not options['force']:
+            queryset = queryset.filter(variants={})
+        image_ids = list(queryset.values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        started = time.monotonic()
+        done = failed = 0
+
+        executor = None
+        if options['workers'] != 0:
+            # Workers only read and write image files; all database access stays in this process
+            executor = ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup)
+        try:
+            for start in range(0, len(image_ids), batch_size):
+                rows = ProductImage.objects.filter(pk__in=image_ids[start:start + batch_size]).values_list(
+                    'pk', 'image', 'product_id'
+                )
+                batch = {pk: name for pk, name, _ in rows}
+                product_ids = {pk: product_id for pk, _, product_id in rows}
+                mapper = executor.map if executor else map
+                images = []
+                for pk, variants in mapper(generate_variants_for, batch.items()):
+                    if variants is None:
+                        failed += 1
+                        self.stderr.write(f'Could not process image {pk} ({batch[pk]})')
+                        continue
+                    images.append(ProductImage(pk=pk, variants=variants))
+                ProductImage.objects.bulk_update(images, ['variants'])
+                # bulk_update() sends no signals; the list endpoints read srcsets from the listing rows
+                ProductListing.refresh(*(product_ids[image.pk] for image in images))
+                done += len(images)
+                self.stdout.write(f'Processed {done}/{len(image_ids)} images')
+        finally:
+            if executor:
+                executor.shutdown()
+
+        if done:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants for {done} images in {time.monotonic() - started:.1f}s, {failed} failed'
+        ))
@@ -0,0 +1,227 @@
+import csv
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from itertools import islice
+from operator import or_
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+from catalog.cache import bump_catalog_version
+from catalog.models import Category, Product, ProductFacet, ProductListing, ProductProperty
+from catalog.routers import pinned_scope
+from catalog.search import reindex_products
+
+PRODUCT_UPDATE_FIELDS = ['name', 'description', 'price', 'category', 'is_published', 'stock_quantity', 'updated_at']
+PROPERTY_COLUMN_PREFIX = 'property.'
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a CSV or JSONL supplier feed and upsert categories, products and properties in batches. '
+        'JSONL records look like {"name", "slug", "description", "price", "category", "is_published", '
+        '"stock_quantity", "properties": {"Color": "Black"}}; CSV files use the same columns plus one '
+        '"property.<Key>" column per property.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the feed, or - for stdin (requires --format)')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Feed format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Records upserted and committed per batch')
+
+    @pinned_scope()
+    def handle(self, *args, **options):
+        path = options['path']
+        feed_format = options['format'] or self.detect_format(path)
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+
+        self.category_ids = {}
+        self.touched_category_ids = set()
+        self.skipped = 0
+        imported = 0
+        started = time.monotonic()
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            records = self.read_records(stream, feed_format)
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    break
+                imported += self.import_batch(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'Imported {imported} products ({imported / elapsed if elapsed else 0:.0f} rows/s)')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            # Denormalized aggregates are rebuilt once per touched category, not once per batch,
+            # and also when a later batch fails after earlier ones were committed
+            Category.refresh_products_count(*self.touched_category_ids)
+            ProductFacet.refresh(*self.touched_category_ids)
+            bump_catalog_version()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} products in {elapsed:.1f}s '
+            f'({imported / elapsed if elapsed else 0:.0f} rows/s), skipped {self.skipped} invalid rows'
+        ))
+
+    def detect_format(self, path):
+        if path.endswith('.csv'):
+            return 'csv'
+        if path.endswith(('.jsonl', '.ndjson')):
+            return 'jsonl'
+        raise CommandError('Cannot detect the feed format, pass --format')
+
+    def read_records(self, stream, feed_format):
+        """Lazily yield normalized records (None for invalid ones) without loading the whole feed"""
+        if feed_format == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                properties = {
+                    column[len(PROPERTY_COLUMN_PREFIX):]: value
+                    for column, value in row.items()
+                    if column and column.startswith(PROPERTY_COLUMN_PREFIX) and value
+                }
+                yield self.normalize(reader.line_num, row, properties)
+        else:
+            for line_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield self.invalid(line_number, exc)
+                    continue
+                yield self.normalize(line_number, row, row.get('properties') or {})
+
+    def normalize(self, line_number, row, properties):
+        try:
+            name = row['name'].strip()
+            category = row['category'].strip()
+            if not name or not category:
+                raise ValueError('name and category are required')
+            if isinstance(properties, list):
+                properties = {prop['key']: prop['value'] for prop in properties}
+            return {
+                'slug': (row.get('slug') or '').strip() or slugify(name),
+                'name': name,
+                'description': row.get('description') or '',
+                'price': Decimal(str(row['price'])),
+                'category': category,
+                'is_published': str(row.get('is_published', '')).strip().lower() in TRUE_VALUES,
+                'stock_quantity': int(row.get('stock_quantity') or 0),
+                'properties': [(str(key), str(value)) for key, value in properties.items()],
+            }
+        except (KeyError, TypeError, ValueError, AttributeError, InvalidOperation) as exc:
+            return self.invalid(line_number, exc)
+
+    def invalid(self, line_number, exc):
+        self.stderr.write(f'Skipping record {line_number}: {exc!r}')
+        return None
+
+    def import_batch(self, batch):
+        records = {}
+        for record in batch:
+            if record is None:
+                self.skipped += 1
+            else:
+                # A slug may only be upserted once per statement; the last occurrence wins
+                records[record['slug']] = record
+        if not records:
+            return 0
+
+        with transaction.atomic():
+            self.ensure_categories({record['category'] for record in records.values()})
+            for slug, record in list(records.items()):
+                if record['category'] not in self.category_ids:
+                    self.stderr.write(f'Skipping product {slug}: cannot create category {record["category"]!r}')
+                    self.skipped += 1
+                    del records[slug]
+            if not records:
+                return 0
+            # Products moving out of a category change that category's aggregates too
+            self.touched_category_ids.update(
+                Product.objects.filter(slug__in=records).values_list('category_id', flat=True).distinct()
+            )
+            Product.objects.bulk_create(
+                [
+                    Product(
+                        slug=slug,
+                        name=record['name'],
+                        description=record['description'],
+                        price=record['price'],
+                        category_id=self.category_ids[record['category']],
+                        is_published=record['is_published'],
+                        stock_quantity=record['stock_quantity'],
+                    )
+                    for slug, record in records.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['slug'],
+                update_fields=PRODUCT_UPDATE_FIELDS,
+            )
+            product_ids = dict(Product.objects.filter(slug__in=records).values_list('slug', 'id'))
+            # The record holds the product's full property set; drop keys the feed no longer sends
+            incoming = {(product_ids[slug], key) for slug, record in records.items() for key, _ in record['properties']}
+            stale_ids = [
+                pk for pk, product_id, key in ProductProperty.objects.filter(
+                    product_id__in=product_ids.values()
+                ).values_list('pk', 'product_id', 'key')
+                if (product_id, key) not in incoming
+            ]
+            if stale_ids:
+                ProductProperty.objects.filter(pk__in=stale_ids).delete()
+            ProductProperty.objects.bulk_create(
+                [
+                    ProductProperty(product_id=product_ids[slug], key=key, value=value, order=order)
+                    for slug, record in records.items()
+                    for order, (key, value) in enumerate(record['properties'], start=1)
+                ],
+                update_conflicts=True,
+                unique_fields=['product', 'key'],
+                update_fields=['value', 'order'],
+            )
+            reindex_products(product_ids.values())
+            ProductListing.refresh(*product_ids.values())
+
+        self.touched_category_ids.update(self.category_ids[record['category']] for record in records.values())
+        return len(records)
+
+    def ensure_categories(self, names):
+        """Resolve category names to ids, creating the missing ones; names that still fail stay unresolved"""
+        missing = [name for name in names if name not in self.category_ids]
+        if not missing:
+            return
+        self.category_ids.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+        missing = sorted(name for name in missing if name not in self.category_ids)
+        if not missing:
+            return
+        Category.objects.bulk_create(
+            [Category(name=name, slug=slug) for name, slug in self.unique_slugs(missing)],
+            ignore_conflicts=True,
+        )
+        self.category_ids.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+
+    def unique_slugs(self, names):
+        """
+        (name, slug) pairs for new categories. Names that slugify alike ("Phones &
+        Tablets" and "Phones Tablets") or to an existing slug get a numeric suffix.
+        """
+        bases = {name: slugify(name) or 'category' for name in names}
+        taken = set(Category.objects.filter(
+            reduce(or_, (Q(slug__startswith=base) for base in set(bases.values())))
+        ).values_list('slug', flat=True))
+        for name, base in bases.items():
+            slug, suffix = base, 2
+            while slug in taken:
+                slug, suffix = f'{base}-{suffix}', suffix + 1
+            taken.add(slug)
+            yield name, slug
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from catalog.models import ProductListing
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ProductListing read model behind the list endpoints from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Products rebuilt per batch')
+
+    def handle(self, *args, **options):
+        listed = ProductListing.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt listings for {listed} products'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from catalog.models import Product, ProductProperty
+from catalog.search import build_documents, get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Products indexed per batch')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            backend.clear()
+            product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+            for start in range(0, len(product_ids), batch_size):
+                batch = product_ids[start:start + batch_size]
+                backend.index(build_documents(
+                    Product.objects.filter(pk__in=batch),
+                    ProductProperty.objects.filter(product_id__in=batch)
+                ))
+        self.stdout.write(self.style.SUCCESS(f'Indexed {len(product_ids)} products'))
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from catalog.tasks import claim_next, execute, requeue_stale
+
+
+class Command(BaseCommand):
+    help = 'Run the catalog task queue worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=2,
+            help='Tasks run in parallel (worker threads; 0 runs them in this thread)'
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help='Requeue tasks left running longer than this many seconds by a crashed worker'
+        )
+        parser.add_argument('--once', action='store_true', help='Drain the due tasks and exit')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale tasks')
+
+        self.stop = threading.Event()
+        self.counts = {'succeeded': 0, 'failed': 0}
+        self.lock = threading.Lock()
+        if options['concurrency'] < 1:
+            self.work(options)
+            threads = []
+        else:
+            threads = [
+                threading.Thread(target=self.work, args=(options,), name=f'catalog-worker-{index}')
+                for index in range(options['concurrency'])
+            ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the running tasks finish...')
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Worker finished: {self.counts["succeeded"]} succeeded, {self.counts["failed"]} failed'
+        ))
+
+    def work(self, options):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                claimed = claim_next()
+                if claimed is None:
+                    if options['once']:
+                        return
+                    self.stop.wait(options['poll_interval'])
+                    continue
+                started = time.monotonic()
+                succeeded = execute(claimed)
+                with self.lock:
+                    self.counts['succeeded' if succeeded else 'failed'] += 1
+                self.stdout.write(
+                    f'{claimed.name} #{claimed.pk} {"ok" if succeeded else "failed"} '
+                    f'in {time.monotonic() - started:.2f}s'
+                )
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                close_old_connections()
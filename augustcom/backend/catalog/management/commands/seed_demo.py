@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.core.files.base import ContentFile
 from catalog.models import Category, Product, ProductImage, ProductProperty
+from catalog.routers import pinned_scope
 from decimal import Decimal
 import random
 
@@ -8,6 +9,7 @@ import random
 class Command(BaseCommand):
     help = 'Seed the database with demo categories and products'
 
+    @pinned_scope()
     def handle(self, *args, **options):
         self.stdout.write('Seeding demo data...')
 
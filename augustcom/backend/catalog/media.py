@@ -0,0 +1,126 @@
+"""
+Serving MEDIA_ROOT (product images and their variants) from the application.
+
+django.views.static.serve only answers If-Modified-Since and always sends the
+whole file. This view adds what browsers, CDNs and media players rely on:
+
+* ETag and Last-Modified validators, answering If-None-Match and
+  If-Modified-Since with 304 (and If-Match/If-Unmodified-Since with 412);
+* single byte ranges (`Range: bytes=0-1023`, `bytes=-500`) with 206 and
+  Content-Range, honouring If-Range, and 416 for ranges past the end;
+* a public Cache-Control max-age of MEDIA_MAX_AGE seconds.
+
+Uploaded names are not content-hashed and variants are regenerated in place,
+so the max-age is kept moderate; the validators make revalidation cheap.
+Enabled in shopcore/urls.py when SERVE_MEDIA is set.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def get_max_age():
+    return getattr(settings, 'MEDIA_MAX_AGE', 24 * 60 * 60)
+
+
+def parse_range(header, size):
+    """
+    The inclusive (start, end) of a single `bytes=` range, or None to send the
+    whole file (no header, several ranges or a malformed one). Raises ValueError
+    when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length or not size:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError('Range starts past the end of the file')
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def range_applies(request, etag, last_modified):
+    """If-Range: serve the range only if the client's copy is still current"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def iter_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def set_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    patch_cache_control(response, public=True, max_age=get_max_age())
+    return response
+
+
+@require_safe
+def serve(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Media file not found')
+    if not os.path.isfile(fullpath):
+        raise Http404('Media file not found')
+
+    stat = os.stat(fullpath)
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return set_headers(response, etag, last_modified)
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    try:
+        byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return set_headers(response, etag, last_modified)
+
+    if byte_range is not None and range_applies(request, etag, last_modified):
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_range(fullpath, start, end - start + 1), status=206, content_type=content_type
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    else:
+        response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return set_headers(response, etag, last_modified)
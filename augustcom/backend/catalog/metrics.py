@@ -0,0 +1,240 @@
+"""
+Per-request query and latency instrumentation.
+
+RequestMetricsMiddleware measures every request and reports, per route (the
+URL name, e.g. `catalog:product-list`):
+
+* the number of SQL queries and the time spent in the database, from an
+  execute wrapper installed on every connection;
+* the time spent serializing (views wrap it in `timed('serialize')`) and
+  rendering JSON (FastJSONRenderer);
+* the total time until the response leaves the middleware. Streamed bodies
+  (export) are produced later and are not included.
+
+The numbers go out three ways: a Server-Timing header (shown in the browser's
+network panel; off with CATALOG_SERVER_TIMING = False), one logfmt line per
+request on the `catalog.metrics` logger, and histograms in the Prometheus text
+format at /api/metrics/. The histograms (and /api/db/stats/) are only served
+to staff users and to the addresses in CATALOG_METRICS_ALLOWED_IPS (such as
+the Prometheus scraper), and settings_prod turns Server-Timing off unless
+enabled.
+
+Histograms live in process memory, as with prometheus_client's default
+registry: with several workers each scrape sees the worker that answered it,
+so scrape every worker or aggregate with the `instance` label.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework.permissions import BasePermission
+
+logger = logging.getLogger('catalog.metrics')
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Counters of the request being handled; sync_to_async threads share them
+# because asgiref runs them in a copy of the caller's context
+_request_stats = ContextVar('catalog_request_stats', default=None)
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # {label values: [per-bucket counts..., sum, count]}
+        self.series = {}
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = sorted((labels, list(values)) for labels, values in self.series.items())
+        for labels, values in series:
+            pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, labels)]
+            for bound, count in [*zip(self.buckets, values), ('+Inf', values[-1])]:
+                bucket_pairs = pairs + [f'le="{bound}"']
+                lines.append(f'{self.name}_bucket{format_labels(bucket_pairs)} {count}')
+            lines.append(f'{self.name}_sum{format_labels(pairs)} {values[-2]}')
+            lines.append(f'{self.name}_count{format_labels(pairs)} {values[-1]}')
+        return lines
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+
+REQUEST_DURATION = Histogram(
+    'catalog_request_duration_seconds', 'Time to produce the response.', ('route', 'method', 'status'),
+    SECONDS_BUCKETS,
+)
+DB_DURATION = Histogram('catalog_db_duration_seconds', 'Time spent in SQL queries per request.', ('route',),
+                        SECONDS_BUCKETS)
+DB_QUERIES = Histogram('catalog_db_queries', 'SQL queries per request.', ('route',), QUERY_BUCKETS)
+SERIALIZE_DURATION = Histogram('catalog_serialize_duration_seconds', 'Time spent serializing per request.',
+                               ('route',), SECONDS_BUCKETS)
+RENDER_DURATION = Histogram('catalog_render_duration_seconds', 'Time spent rendering JSON per request.',
+                            ('route',), SECONDS_BUCKETS)
+HISTOGRAMS = (REQUEST_DURATION, DB_DURATION, DB_QUERIES, SERIALIZE_DURATION, RENDER_DURATION)
+
+
+def format_labels(pairs):
+    return '{' + ','.join(pairs) + '}'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats['db'] += time.perf_counter() - started
+        stats['queries'] += 1
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # execute_wrappers outlives reconnects of the same DatabaseWrapper
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to `phase` ('serialize' or 'render') of the current request"""
+    stats = _request_stats.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats[phase] += time.perf_counter() - started
+
+
+def get_route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+def server_timing(stats, total):
+    return ', '.join([
+        f'db;dur={stats["db"] * 1000:.1f};desc="{stats["queries"]} queries"',
+        f'serialize;dur={stats["serialize"] * 1000:.1f}',
+        f'render;dur={stats["render"] * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ])
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    def start(self):
+        stats = {'queries': 0, 'db': 0.0, 'serialize': 0.0, 'render': 0.0}
+        return stats, _request_stats.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, total):
+        route = get_route(request)
+        REQUEST_DURATION.observe((route, request.method, str(response.status_code)), total)
+        DB_DURATION.observe((route,), stats['db'])
+        DB_QUERIES.observe((route,), stats['queries'])
+        SERIALIZE_DURATION.observe((route,), stats['serialize'])
+        RENDER_DURATION.observe((route,), stats['render'])
+
+        if getattr(settings, 'CATALOG_SERVER_TIMING', False):
+            response['Server-Timing'] = server_timing(stats, total)
+        fields = {
+            'method': request.method,
+            'route': route,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 1),
+            'queries': stats['queries'],
+            'db_ms': round(stats['db'] * 1000, 1),
+            'serialize_ms': round(stats['serialize'] * 1000, 1),
+            'render_ms': round(stats['render'] * 1000, 1),
+        }
+        logger.info(' '.join(f'{key}={value}' for key, value in fields.items()), extra={'metrics': fields})
+        return response
+
+
+def is_metrics_client(request):
+    """Staff users and the addresses in CATALOG_METRICS_ALLOWED_IPS"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'CATALOG_METRICS_ALLOWED_IPS', [])
+
+
+class IsMetricsClient(BasePermission):
+    """is_metrics_client() for DRF views such as /api/db/stats/"""
+
+    def has_permission(self, request, view):
+        return is_metrics_client(request)
+
+
+def metrics_view(request):
+    """Every histogram in the Prometheus text exposition format"""
+    if not is_metrics_client(request):
+        return HttpResponseForbidden()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    return HttpResponse('\n'.join(lines) + '\n', content_type=PROMETHEUS_CONTENT_TYPE)
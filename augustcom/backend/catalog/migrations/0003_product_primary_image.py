@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_primary_image(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    ProductImage = apps.get_model('catalog', 'ProductImage')
+    primary = ProductImage.objects.filter(
+        product=OuterRef('pk'), is_primary=True
+    ).order_by('-created_at').values('pk')[:1]
+    Product.objects.update(primary_image=Subquery(primary))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_productproperty'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='primary_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.productimage'),
+        ),
+        migrations.RunPython(backfill_primary_image, migrations.RunPython.noop),
+    ]
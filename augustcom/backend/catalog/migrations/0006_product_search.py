@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:51
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Historical copies of the index layout in catalog/search.py at the time of this migration
+POSTGRES_INDEX = 'productsearch_document_idx'
+SQLITE_TABLE = 'catalog_productsearch_fts'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        config = getattr(settings, 'CATALOG_SEARCH_CONFIG', 'english')
+        schema_editor.execute(f'CREATE INDEX {POSTGRES_INDEX} ON catalog_productsearch USING gin (document)')
+        schema_editor.execute(
+            'INSERT INTO catalog_productsearch (product_id, document) '
+            'SELECT p.id, '
+            "setweight(to_tsvector(%s::regconfig, p.name), 'A') || "
+            "setweight(to_tsvector(%s::regconfig, coalesce(props.value, '')), 'B') || "
+            "setweight(to_tsvector(%s::regconfig, p.description), 'C') "
+            'FROM catalog_product p LEFT JOIN ('
+            'SELECT product_id, string_agg(value, \' \' ORDER BY "order", key) AS value '
+            'FROM catalog_productproperty GROUP BY product_id'
+            ') props ON props.product_id = p.id',
+            [config, config, config]
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {SQLITE_TABLE} USING fts5('
+            "name, properties, description, tokenize = 'porter unicode61')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {SQLITE_TABLE} (rowid, name, properties, description) '
+            'SELECT p.id, p.name, coalesce(('
+            "SELECT group_concat(value, ' ') FROM ("
+            'SELECT value FROM catalog_productproperty WHERE product_id = p.id ORDER BY "order", key'
+            ")), ''), p.description FROM catalog_product p"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {POSTGRES_INDEX}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SQLITE_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearch',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='catalog.product')),
+                ('document', django.contrib.postgres.search.SearchVectorField()),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_facets(apps, schema_editor):
+    ProductFacet = apps.get_model('catalog', 'ProductFacet')
+    ProductProperty = apps.get_model('catalog', 'ProductProperty')
+    counts = ProductProperty.objects.filter(product__is_published=True).order_by().values(
+        'product__category_id', 'key', 'value'
+    ).annotate(total=Count('pk'))
+    ProductFacet.objects.bulk_create([
+        ProductFacet(category_id=row['product__category_id'], key=row['key'], value=row['value'],
+                     product_count=row['total'])
+        for row in counts
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('value', models.CharField(max_length=500)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['key', '-product_count', 'value'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='productproperty',
+            index=models.Index(fields=['key', 'value', 'product'], name='property_key_value_idx'),
+        ),
+        migrations.AddField(
+            model_name='productfacet',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='catalog.category'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='productfacet',
+            unique_together={('category', 'key', 'value')},
+        ),
+        migrations.RunPython(backfill_facets, migrations.RunPython.noop),
+    ]
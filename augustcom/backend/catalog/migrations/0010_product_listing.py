@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:17
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def build_srcsets(variants):
+    """`{format: "url 320w, url 640w"}` as [[format, srcset], ...], as catalog/images.py built it"""
+    return [
+        [variant_format, ', '.join(
+            f'{default_storage.url(name)} {width}w'
+            for width, name in sorted(by_width.items(), key=lambda item: int(item[0]))
+        )]
+        for variant_format, by_width in (variants or {}).items()
+    ]
+
+
+def fill_listings(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    ProductProperty = apps.get_model('catalog', 'ProductProperty')
+    ProductListing = apps.get_model('catalog', 'ProductListing')
+    product_ids = list(Product.objects.filter(is_published=True).order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(product_ids), 1000):
+        batch = product_ids[start:start + 1000]
+        properties = {pk: [] for pk in batch}
+        rows = ProductProperty.objects.filter(product_id__in=batch).order_by('order', 'key').values_list(
+            'product_id', 'id', 'key', 'value', 'order'
+        )
+        for product_id, pk, key, value, order in rows:
+            properties[product_id].append([pk, key, value, order])
+
+        listings = []
+        for product in Product.objects.filter(pk__in=batch).select_related('category', 'primary_image'):
+            image = product.primary_image
+            if image is not None:
+                url = default_storage.url(image.image.name) if image.image else None
+                image = [image.pk, url, build_srcsets(image.variants), image.alt_text, image.is_primary]
+            listings.append(ProductListing(
+                id=product.pk,
+                name=product.name,
+                slug=product.slug,
+                price=product.price,
+                created_at=product.created_at,
+                category_id=product.category_id,
+                category_name=product.category.name,
+                category_slug=product.category.slug,
+                category_description=product.category.description,
+                category_products_count=product.category.published_products_count,
+                category_created_at=product.category.created_at,
+                primary_image=image,
+                properties=properties[product.pk],
+            ))
+        ProductListing.objects.bulk_create(listings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('id', models.BigIntegerField(help_text='Product id', primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=200, unique=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField()),
+                ('category_name', models.CharField(max_length=200)),
+                ('category_slug', models.SlugField(db_index=False, max_length=200)),
+                ('category_description', models.TextField(blank=True)),
+                ('category_products_count', models.PositiveIntegerField(default=0)),
+                ('category_created_at', models.DateTimeField()),
+                ('primary_image', models.JSONField(blank=True, null=True)),
+                ('properties', models.JSONField(blank=True, default=list)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.category')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at', 'id'], name='listing_created_idx'), models.Index(fields=['price', 'id'], name='listing_price_idx'), models.Index(fields=['name', 'id'], name='listing_name_idx'), models.Index(fields=['category', 'created_at', 'id'], name='listing_cat_created_idx'), models.Index(fields=['category', 'price', 'id'], name='listing_cat_price_idx'), models.Index(fields=['category', 'name', 'id'], name='listing_cat_name_idx'), models.Index(fields=['category_slug', 'created_at', 'id'], name='listing_cat_slug_idx')],
+            },
+        ),
+        migrations.RunPython(fill_listings, migrations.RunPython.noop),
+    ]
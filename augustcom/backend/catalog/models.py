@@ -1,12 +1,39 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.text import slugify
 from django.urls import reverse
+from django.utils import timezone
+
+
+def is_plain_update(instance, save_kwargs):
+    """
+    True when save() will UPDATE the existing row with every field: not a new
+    instance, not one re-inserted after delete() (which clears the pk), and the
+    caller passed neither update_fields nor force_insert.
+    """
+    return (
+        not instance._state.adding and instance.pk is not None
+        and save_kwargs.get('update_fields') is None and not save_kwargs.get('force_insert')
+    )
+
+
+def fields_except(instance, *excluded):
+    """Concrete non-pk field names of `instance` without `excluded`, for save(update_fields=...)"""
+    return [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in excluded
+    ]
 
 
 class Category(models.Model):
     name = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(max_length=200, unique=True, blank=True)
     description = models.TextField(blank=True)
+    # Denormalized count of published products, maintained by Product.save and
+    # the post_delete handler in catalog.signals; Category.save never writes it
+    published_products_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -20,11 +47,44 @@ class Category(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        if is_plain_update(self, kwargs):
+            # The instance may predate the last recount (or come from a lagging replica)
+            kwargs['update_fields'] = fields_except(self, 'published_products_count')
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
         return reverse('api:category-detail', kwargs={'slug': self.slug})
 
+    @classmethod
+    def refresh_products_count(cls, *category_ids):
+        """Recompute published_products_count for the given categories in one UPDATE"""
+        category_ids = {pk for pk in category_ids if pk is not None}
+        if not category_ids:
+            return
+        published = Product.objects.filter(
+            category=OuterRef('pk'), is_published=True
+        ).order_by().values('category').annotate(total=Count('pk')).values('total')
+        cls.objects.filter(pk__in=category_ids).update(
+            published_products_count=Coalesce(Subquery(published), 0)
+        )
+        ProductListing.refresh_categories(*category_ids)
+
+
+class ProductQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(is_published=True)
+
+    def for_api(self, with_images=False):
+        """Attach every related row the catalog serializers read, in a fixed number of queries"""
+        queryset = self.select_related('category', 'primary_image').prefetch_related(
+            Prefetch('properties', queryset=ProductProperty.objects.order_by(*ProductProperty._meta.ordering))
+        )
+        if with_images:
+            queryset = queryset.prefetch_related(
+                Prefetch('images', queryset=ProductImage.objects.order_by(*ProductImage._meta.ordering))
+            )
+        return queryset
+
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
@@ -34,19 +94,68 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     is_published = models.BooleanField(default=False)
     stock_quantity = models.PositiveIntegerField(default=0)
+    # Denormalized pointer to the primary ProductImage, maintained by ProductImage.save
+    # and cleared via SET_NULL when that image is deleted; Product.save never writes it
+    # after the insert.
+    primary_image = models.ForeignKey(
+        'ProductImage', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='+'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        # Partial indexes over published products matching ProductFilter's orderings,
+        # globally and scoped to a category; id is the keyset pagination tiebreaker.
+        indexes = [
+            models.Index(fields=['created_at', 'id'], condition=Q(is_published=True), name='product_pub_created_idx'),
+            models.Index(fields=['price', 'id'], condition=Q(is_published=True), name='product_pub_price_idx'),
+            models.Index(fields=['name', 'id'], condition=Q(is_published=True), name='product_pub_name_idx'),
+            models.Index(
+                fields=['category', 'created_at', 'id'], condition=Q(is_published=True),
+                name='product_pub_cat_created_idx'
+            ),
+            models.Index(
+                fields=['category', 'price', 'id'], condition=Q(is_published=True),
+                name='product_pub_cat_price_idx'
+            ),
+            models.Index(
+                fields=['category', 'name', 'id'], condition=Q(is_published=True),
+                name='product_pub_cat_name_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored category so a move can refresh both counters
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        instance._loaded_is_published = instance.__dict__.get('is_published')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        loaded_category_id = getattr(self, '_loaded_category_id', None)
+        listing_changed = (
+            loaded_category_id != self.category_id
+            or getattr(self, '_loaded_is_published', None) != self.is_published
+        )
+        if is_plain_update(self, kwargs):
+            # A copy loaded before the primary image changed would point back at the old one
+            kwargs['update_fields'] = fields_except(self, 'primary_image')
         super().save(*args, **kwargs)
+        Category.refresh_products_count(self.category_id, loaded_category_id)
+        if listing_changed:
+            ProductFacet.schedule_refresh(self.category_id, loaded_category_id)
+        self._loaded_category_id = self.category_id
+        self._loaded_is_published = self.is_published
 
     def get_absolute_url(self):
         return reverse('api:product-detail', kwargs={'slug': self.slug})
@@ -63,16 +172,157 @@ class ProductProperty(models.Model):
         ordering = ['order', 'key']
         unique_together = ['product', 'key']
         verbose_name_plural = "Product Properties"
+        indexes = [
+            models.Index(fields=['key', 'value', 'product'], name='property_key_value_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.key}: {self.value}"
 
 
+class ProductFacet(models.Model):
+    """Precomputed count of published products per category and property key/value"""
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facets')
+    key = models.CharField(max_length=100)
+    value = models.CharField(max_length=500)
+    product_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['key', '-product_count', 'value']
+        unique_together = ['category', 'key', 'value']
+
+    def __str__(self):
+        return f"{self.category.name} - {self.key}: {self.value} ({self.product_count})"
+
+    @classmethod
+    def refresh(cls, *category_ids):
+        """Rebuild the facet rows of the given categories from their published products"""
+        category_ids = {pk for pk in category_ids if pk is not None}
+        if not category_ids:
+            return
+        counts = ProductProperty.objects.filter(
+            product__category_id__in=category_ids, product__is_published=True
+        ).order_by().values('product__category_id', 'key', 'value').annotate(total=Count('pk'))
+        cls.objects.filter(category_id__in=category_ids).delete()
+        cls.objects.bulk_create([
+            cls(category_id=row['product__category_id'], key=row['key'], value=row['value'],
+                product_count=row['total'])
+            for row in counts
+        ])
+
+    @classmethod
+    def schedule_refresh(cls, *category_ids):
+        """Queue refresh() per category; repeated edits to one category coalesce into one run"""
+        from .tasks import enqueue
+
+        for category_id in {pk for pk in category_ids if pk is not None}:
+            enqueue('catalog.refresh_facets', unique_key=f'facets:{category_id}', category_id=category_id)
+
+
+class ProductListing(models.Model):
+    """
+    Read model for the list endpoints: one row per published product holding
+    everything ProductListSerializer renders, so a page is a single indexed scan
+    of this table. Rows are rebuilt by refresh() on every product, property and
+    image change (see catalog.signals and ProductImage.save), category columns
+    are copied by refresh_categories(), and `manage.py rebuild_listings` rebuilds
+    the whole table.
+
+    Nested values are stored as arrays in a fixed order rather than objects, as
+    jsonb does not preserve key order.
+    """
+    id = models.BigIntegerField(primary_key=True, help_text="Product id")
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=200, unique=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    category_name = models.CharField(max_length=200)
+    category_slug = models.SlugField(max_length=200, db_index=False)
+    category_description = models.TextField(blank=True)
+    category_products_count = models.PositiveIntegerField(default=0)
+    category_created_at = models.DateTimeField()
+    # [id, url, [[format, srcset], ...], alt_text, is_primary] or null
+    primary_image = models.JSONField(null=True, blank=True)
+    # [[id, key, value, order], ...] in ProductProperty order
+    properties = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        # The same orderings as the partial indexes on Product, globally and per category
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='listing_created_idx'),
+            models.Index(fields=['price', 'id'], name='listing_price_idx'),
+            models.Index(fields=['name', 'id'], name='listing_name_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], name='listing_cat_created_idx'),
+            models.Index(fields=['category', 'price', 'id'], name='listing_cat_price_idx'),
+            models.Index(fields=['category', 'name', 'id'], name='listing_cat_name_idx'),
+            models.Index(fields=['category_slug', 'created_at', 'id'], name='listing_cat_slug_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def refresh(cls, *product_ids):
+        """Rebuild the rows of the given products; unpublished and deleted products lose theirs"""
+        from .fast_serializers import listing_values, product_list_rows, serialize_product_rows
+
+        product_ids = {pk for pk in product_ids if pk is not None}
+        if not product_ids:
+            return
+        rows = list(product_list_rows(Product.objects.published().filter(pk__in=product_ids)))
+        items = serialize_product_rows(rows)
+        with transaction.atomic():
+            cls.objects.filter(pk__in=product_ids).delete()
+            cls.objects.bulk_create([cls(**listing_values(row, item)) for row, item in zip(rows, items)])
+
+    @classmethod
+    def refresh_categories(cls, *category_ids):
+        """Copy the current category fields onto the listings of the given categories in one UPDATE"""
+        category_ids = {pk for pk in category_ids if pk is not None}
+        if not category_ids:
+            return
+        category = Category.objects.filter(pk=OuterRef('category_id'))
+        cls.objects.filter(category_id__in=category_ids).update(
+            category_name=Subquery(category.values('name')),
+            category_slug=Subquery(category.values('slug')),
+            category_description=Subquery(category.values('description')),
+            category_products_count=Subquery(category.values('published_products_count')),
+        )
+
+    @classmethod
+    def rebuild(cls, batch_size=1000):
+        """Rebuild the whole table; returns the number of listed products"""
+        with transaction.atomic():
+            cls.objects.all().delete()
+            product_ids = list(Product.objects.published().order_by('pk').values_list('pk', flat=True))
+            for start in range(0, len(product_ids), batch_size):
+                cls.refresh(*product_ids[start:start + batch_size])
+        return len(product_ids)
+
+
+class ProductSearch(models.Model):
+    """
+    Weighted tsvector of a product (name A, property values B, description C)
+    for full-text search on PostgreSQL, GIN-indexed by migration 0006 and kept
+    current by catalog.search. Other databases leave it empty and use their own
+    index.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    document = SearchVectorField()
+
+    def __str__(self):
+        return f"Search document of product {self.product_id}"
+
+
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='products/')
     alt_text = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
+    # Resized copies written by catalog.images, as {format: {width: storage name}}
+    variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -81,8 +331,72 @@ class ProductImage(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.alt_text or 'Image'}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image_name = instance.__dict__.get('image')
+        return instance
+
     def save(self, *args, **kwargs):
         # Ensure only one primary image per product
         if self.is_primary:
             ProductImage.objects.filter(product=self.product, is_primary=True).update(is_primary=False)
         super().save(*args, **kwargs)
+
+        # Keep the denormalized Product.primary_image pointer in sync
+        if self.is_primary:
+            Product.objects.filter(pk=self.product_id).update(primary_image=self)
+        else:
+            Product.objects.filter(primary_image=self).update(primary_image=None)
+        # After the pointer update, which post_save handlers would not see yet
+        ProductListing.refresh(self.product_id)
+
+        if (self.image.name or '') != (getattr(self, '_loaded_image_name', None) or ''):
+            # Resizing is slow; leave it to the task worker so admin saves return quickly
+            from .tasks import enqueue
+
+            enqueue('catalog.refresh_image_variants', unique_key=f'image-variants:{self.pk}', image_id=self.pk)
+        self._loaded_image_name = self.image.name
+
+    def refresh_variants(self):
+        """
+        Regenerate the resized copies of the current upload. Unreadable images
+        raise, so the task queue retries them and records the error.
+        """
+        from .images import generate_variants
+
+        self.variants = generate_variants(self.image.name) if self.image else {}
+        ProductImage.objects.filter(pk=self.pk).update(variants=self.variants)
+        ProductListing.refresh(self.product_id)
+
+
+class Task(models.Model):
+    """A unit of deferred work for the catalog.tasks queue"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    unique_key = models.CharField(max_length=200, blank=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'pk']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
@@ -0,0 +1,152 @@
+import base64
+import binascii
+import json
+from types import SimpleNamespace
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over the ordering fields exposed by ProductFilter.
+
+    Each page is fetched with a `WHERE (field, id) > (last_field, last_id)` style
+    predicate instead of an OFFSET, and no COUNT(*) is issued, so page N costs the
+    same as page 1. The primary key is used as a tiebreaker for non-unique fields.
+    """
+    page_size = api_settings.PAGE_SIZE
+    mode_query_param = 'pagination'
+    mode_query_value = 'cursor'
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    ordering_fields = ('created_at', 'price', 'name')
+    default_ordering = '-created_at'
+    tiebreaker = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return params.get(cls.mode_query_param) == cls.mode_query_value or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    def get_page_queryset(self, queryset, request):
+        """The sliced queryset for the requested page, one row longer to detect more pages"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.field_name, self.descending = self.get_ordering(request)
+        self.model_field = queryset.model._meta.get_field(self.field_name)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor['reverse'])
+
+        # Walking backwards flips the sort so the database can still use the index
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field_name}', f'{prefix}{self.tiebreaker}')
+        if self.cursor:
+            lookup = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field_name}__{lookup}': self.cursor['value']})
+                | Q(**{self.field_name: self.cursor['value'], f'{self.tiebreaker}__{lookup}': self.cursor['id']})
+            )
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        """Trim the rows fetched from get_page_queryset() to a page and work out the links"""
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.cursor and self.cursor['reverse']:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = results
+        return results
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_query_param, '')
+        ordering = ordering.split(',')[0].strip() or self.default_ordering
+        if ordering.lstrip('-') not in self.ordering_fields:
+            ordering = self.default_ordering
+        return ordering.lstrip('-'), ordering.startswith('-')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return {
+                'value': self.model_field.to_python(value),
+                'id': int(pk),
+                'reverse': bool(reverse),
+            }
+        except (TypeError, ValueError, UnicodeEncodeError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        if isinstance(obj, dict):
+            # A row from .values(); value_to_string() only reads the field's attribute
+            payload = [
+                self.model_field.value_to_string(SimpleNamespace(**{self.model_field.attname: obj[self.field_name]})),
+                obj[self.tiebreaker],
+                reverse,
+            ]
+        else:
+            payload = [self.model_field.value_to_string(obj), getattr(obj, self.tiebreaker), reverse]
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode('ascii')).decode('ascii')
+        url = replace_query_param(self.base_url, self.mode_query_param, self.mode_query_value)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetPaginationMixin:
+    """Switch the listed actions to KeysetPagination when the client opts in with ?pagination=cursor"""
+    keyset_pagination_class = KeysetPagination
+    keyset_actions = ('list',)
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.action in self.keyset_actions and self.keyset_pagination_class.is_requested(self.request):
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
@@ -0,0 +1,82 @@
+"""
+JSON renderer backed by orjson, with DRF's stdlib renderer as the fallback.
+
+FastJSONRenderer writes the same bytes as rest_framework.renderers.JSONRenderer
+with the default settings (compact separators, UTF-8, datetimes in ISO 8601
+with a trailing Z for UTC, U+2028/U+2029 escaped), but encodes in C. Types
+orjson does not know (Decimal, lazy translation strings, querysets, ...) are
+handed to DRF's JSONEncoder.default, so they come out as they always did.
+
+The stdlib renderer is used when orjson is not installed, for indented output
+(e.g. the browsable API), when UNICODE_JSON or COMPACT_JSON are off, and for
+payloads orjson rejects (integers wider than 64 bits, fixed-offset
+timezones on older orjson releases). Known differences are limited to floats, which the catalog API does
+not emit: orjson writes `1e16` where the stdlib writes `1e+16`, and NaN or
+Infinity become null instead of raising.
+
+Enable it with
+    REST_FRAMEWORK = {'DEFAULT_RENDERER_CLASSES': ['catalog.renderers.FastJSONRenderer', ...]}
+
+JSONGZipMiddleware compresses these JSON responses for clients that accept
+gzip and leaves everything else (media, range responses, HTML) untouched.
+"""
+from django.middleware.gzip import GZipMiddleware
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import timed
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def get_json_renderer():
+    """An instance of the first configured renderer that produces JSON"""
+    for renderer_class in api_settings.DEFAULT_RENDERER_CLASSES:
+        if renderer_class.media_type == 'application/json':
+            return renderer_class()
+    return JSONRenderer()
+
+
+class FastJSONRenderer(JSONRenderer):
+    def can_use_orjson(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None
+            and self.ensure_ascii is False
+            and self.compact
+            and self.get_indent(accepted_media_type or '', renderer_context or {}) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return self.encode(data, accepted_media_type, renderer_context)
+
+    def encode(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b''
+        if not self.can_use_orjson(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=orjson.OPT_UTC_Z)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, for JSON embedded in JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware limited to JSON responses. Compressing a 206 would leave its
+    Content-Range describing the uncompressed bytes, and the weakened ETag would
+    make If-Range fail, breaking resumed media downloads.
+    """
+
+    def process_response(self, request, response):
+        if not response.get('Content-Type', '').startswith('application/json'):
+            return response
+        return super().process_response(request, response)
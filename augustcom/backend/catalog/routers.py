@@ -0,0 +1,122 @@
+"""
+Read-replica routing for the catalog models.
+
+Reads of the models in CATALOG_REPLICA_MODELS go to one of the database
+aliases in CATALOG_READ_REPLICAS (settings_prod.py builds them from
+DATABASE_REPLICA_URLS); writes always go to `default`. With no replicas
+configured the router stays out of the way.
+
+Replicas lag behind the primary, so reads fall back to the primary whenever
+they have to see a recent write:
+
+* inside a transaction on the primary;
+* for the rest of a request once it has written a catalog row;
+* for whole tasks and writing management commands, which run in pinned_scope()
+  (writes outside any scope, e.g. in a shell, are not tracked);
+* for unsafe requests (POST, PUT, ...), e.g. admin forms validating before save;
+* for CATALOG_REPLICA_PIN_SECONDS after a request that wrote, using a cookie set
+  by ReplicaPinningMiddleware, so an editor sees their own admin changes.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+PIN_COOKIE = 'catalog_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+DEFAULT_REPLICA_MODELS = (
+    'catalog.category', 'catalog.product', 'catalog.productimage', 'catalog.productlisting', 'catalog.productproperty',
+)
+
+# {'pinned': bool, 'wrote': bool} for the current request (set by the middleware),
+# task or command; None outside any scope
+_routing_state = ContextVar('catalog_routing_state', default=None)
+
+
+def get_replicas():
+    return list(getattr(settings, 'CATALOG_READ_REPLICAS', ()))
+
+
+def get_replica_models():
+    return set(getattr(settings, 'CATALOG_REPLICA_MODELS', DEFAULT_REPLICA_MODELS))
+
+
+def get_pin_seconds():
+    return getattr(settings, 'CATALOG_REPLICA_PIN_SECONDS', 15)
+
+
+def start_scope(pinned=False):
+    """Begin a fresh routing scope (one per request) and return its state"""
+    state = {'pinned': pinned, 'wrote': False}
+    _routing_state.set(state)
+    return state
+
+
+@contextmanager
+def pinned_scope():
+    """Route every catalog read in the block to the primary, then restore the previous scope"""
+    token = _routing_state.set({'pinned': True, 'wrote': False})
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+
+
+def mark_write():
+    # Outside a scope there is nothing to pin; creating one here would pin a
+    # long-lived thread (e.g. a task worker) to the primary for good
+    state = _routing_state.get()
+    if state is not None:
+        state['pinned'] = state['wrote'] = True
+
+
+def is_pinned():
+    state = _routing_state.get()
+    return bool(state and state['pinned'])
+
+
+def replicas_may_lag(modified):
+    """True while a write at unix time `modified` may not have reached the replicas"""
+    return bool(get_replicas()) and time.time() - modified < get_pin_seconds()
+
+
+class CatalogReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in get_replica_models():
+            return None
+        replicas = get_replicas()
+        if not replicas:
+            return None
+        if is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label_lower not in get_replica_models() or not get_replicas():
+            return None
+        mark_write()
+        # Explicit, or Django would write back to the replica an instance was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """Scope replica routing to the request and pin a writer's next requests to the primary"""
+
+    def process_request(self, request):
+        start_scope(pinned=request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES)
+
+    def process_response(self, request, response):
+        state = _routing_state.get()
+        if state and state['wrote'] and get_replicas():
+            response.set_cookie(PIN_COOKIE, '1', max_age=get_pin_seconds(), httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,218 @@
+"""
+Full-text product search.
+
+Products are indexed by the handlers in catalog.signals: on PostgreSQL into
+ProductSearch, a model with a GIN-indexed SearchVectorField, and on SQLite into
+an FTS5 virtual table (migration 0006 creates both; FTS5 tables cannot be
+models). Other backends fall back to unindexed icontains matching.
+
+PostgreSQL and SQLite match the same way: every word of the query must be the
+prefix of a word in the product's name, property values or description
+(`smart wat` finds "Smart Watch"), or, for the `name` filter, of a word in
+the name only. Searches narrow a queryset
+with a subquery, so results are never capped, and rank name matches above
+property values and property values above descriptions.
+"""
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection as default_connection
+from django.db.models import F, FloatField, OuterRef, Q, Subquery
+from django.db.models.expressions import RawSQL
+
+from .models import Product, ProductProperty, ProductSearch
+
+SQLITE_TABLE = 'catalog_productsearch_fts'
+
+# Letters and digits; both engines split words on underscores and punctuation
+TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def get_search_config():
+    return getattr(settings, 'CATALOG_SEARCH_CONFIG', 'english')
+
+
+def build_documents(products, properties):
+    """Build (id, name, property values, description) rows from product and property querysets"""
+    values_by_product = defaultdict(list)
+    for row in properties.order_by('product_id', 'order', 'key').values('product_id', 'value'):
+        values_by_product[row['product_id']].append(row['value'])
+    return [
+        (row['id'], row['name'], ' '.join(values_by_product[row['id']]), row['description'])
+        for row in products.values('id', 'name', 'description')
+    ]
+
+
+class BaseSearchBackend:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def clear(self):
+        pass
+
+    def index(self, documents):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def filter(self, tokens, queryset, names_only=False):
+        """`queryset` narrowed to the products matching every token (in their name, with `names_only`)"""
+        raise NotImplementedError
+
+    def rank(self, tokens, queryset):
+        """filter(), most relevant first and then by id"""
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    def clear(self):
+        ProductSearch.objects.all().delete()
+
+    def index(self, documents):
+        if not documents:
+            return
+        config = get_search_config()
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {ProductSearch._meta.db_table} (product_id, document) VALUES (%s, '
+                'setweight(to_tsvector(%s::regconfig, %s), \'A\') || '
+                'setweight(to_tsvector(%s::regconfig, %s), \'B\') || '
+                'setweight(to_tsvector(%s::regconfig, %s), \'C\')) '
+                'ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document',
+                [
+                    (pk, config, name, config, properties, config, description)
+                    for pk, name, properties, description in documents
+                ]
+            )
+
+    def remove(self, product_ids):
+        ProductSearch.objects.filter(product_id__in=list(product_ids)).delete()
+
+    def get_query(self, tokens, names_only=False):
+        # `'smart':* & 'wat':*`, or `'smart':*A & ...` for names (weight A); tokens are
+        # letters and digits only, so they need no escaping
+        weight = 'A' if names_only else ''
+        raw = ' & '.join(f"'{token}':*{weight}" for token in tokens)
+        return SearchQuery(raw, config=get_search_config(), search_type='raw')
+
+    def filter(self, tokens, queryset, names_only=False):
+        matches = ProductSearch.objects.filter(document=self.get_query(tokens, names_only))
+        return queryset.filter(pk__in=matches.values('product_id'))
+
+    def rank(self, tokens, queryset):
+        query = self.get_query(tokens)
+        rank = ProductSearch.objects.filter(product_id=OuterRef('pk')).annotate(
+            rank=SearchRank(F('document'), query)
+        ).values('rank')
+        return self.filter(tokens, queryset).annotate(search_rank=Subquery(rank)).order_by('-search_rank', 'pk')
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    # bm25() column weights for (name, properties, description)
+    weights = (10.0, 5.0, 1.0)
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+
+    def index(self, documents):
+        if not documents:
+            return
+        self.remove([pk for pk, *_ in documents])
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, name, properties, description) VALUES (%s, %s, %s, %s)',
+                documents
+            )
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+
+    def get_match(self, tokens, names_only=False):
+        # Quote every token so user input can never be parsed as FTS5 query syntax
+        column = 'name : ' if names_only else ''
+        return ' '.join(f'{column}"{token}"*' for token in tokens)
+
+    def filter(self, tokens, queryset, names_only=False):
+        matches = RawSQL(
+            f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s', [self.get_match(tokens, names_only)]
+        )
+        return queryset.filter(pk__in=matches)
+
+    def rank(self, tokens, queryset):
+        qn = self.connection.ops.quote_name
+        weights = ', '.join(str(weight) for weight in self.weights)
+        # bm25() is lower for better matches; correlated on the outer query's primary key
+        rank = RawSQL(
+            f'SELECT bm25({SQLITE_TABLE}, {weights}) FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s '
+            f'AND rowid = {qn(queryset.model._meta.db_table)}.{qn(queryset.model._meta.pk.column)}',
+            [self.get_match(tokens)], output_field=FloatField()
+        )
+        return self.filter(tokens, queryset).annotate(search_rank=rank).order_by('search_rank', 'pk')
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """Unindexed fallback for backends without a native full-text engine; matches substrings"""
+
+    def filter(self, tokens, queryset, names_only=False):
+        matches = Product.objects.all()
+        for token in tokens:
+            condition = Q(name__icontains=token)
+            if not names_only:
+                condition |= Q(description__icontains=token) | Q(properties__value__icontains=token)
+            matches = matches.filter(condition)
+        return queryset.filter(pk__in=matches.values('pk'))
+
+    def rank(self, tokens, queryset):
+        return self.filter(tokens, queryset).order_by('pk')
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_search_backend(connection=None):
+    connection = connection or default_connection
+    return BACKENDS.get(connection.vendor, DatabaseSearchBackend)(connection)
+
+
+def reindex_products(product_ids):
+    """Refresh the search documents of the given products, dropping ones that no longer exist"""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    backend = get_search_backend()
+    documents = build_documents(
+        Product.objects.filter(pk__in=product_ids),
+        ProductProperty.objects.filter(product_id__in=product_ids)
+    )
+    backend.index(documents)
+    backend.remove(product_ids - {pk for pk, *_ in documents})
+
+
+def filter_products(queryset, term):
+    """`queryset` (of Product or ProductListing) narrowed to the products matching `term`"""
+    tokens = TOKEN_RE.findall(term)
+    return get_search_backend().filter(tokens, queryset) if tokens else queryset.none()
+
+
+def filter_product_names(queryset, term):
+    """filter_products() against product names only"""
+    tokens = TOKEN_RE.findall(term)
+    return get_search_backend().filter(tokens, queryset, names_only=True) if tokens else queryset.none()
+
+
+def search_products(queryset, term):
+    """filter_products(), ordered by relevance"""
+    tokens = TOKEN_RE.findall(term)
+    return get_search_backend().rank(tokens, queryset) if tokens else queryset.none()
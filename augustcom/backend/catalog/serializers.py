@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .images import build_srcsets
 from .models import Category, Product, ProductImage, ProductProperty
 
 
@@ -9,21 +10,25 @@ class ProductPropertySerializer(serializers.ModelSerializer):
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'alt_text', 'is_primary']
+        fields = ['id', 'image', 'variants', 'alt_text', 'is_primary']
+
+    def get_variants(self, obj):
+        """srcset strings per format, e.g. {"webp": "/media/a.320w.webp 320w, ..."}"""
+        request = self.context.get('request')
+        return build_srcsets(obj.variants, request.build_absolute_uri if request else None)
 
 
 class CategorySerializer(serializers.ModelSerializer):
-    products_count = serializers.SerializerMethodField()
+    products_count = serializers.IntegerField(source='published_products_count', read_only=True)
 
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description', 'products_count', 'created_at']
 
-    def get_products_count(self, obj):
-        return obj.products.filter(is_published=True).count()
-
 
 class ProductSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
@@ -40,9 +45,8 @@ class ProductSerializer(serializers.ModelSerializer):
         ]
 
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return ProductImageSerializer(primary_image).data
+        if obj.primary_image_id:
+            return ProductImageSerializer(obj.primary_image).data
         return None
 
 
@@ -59,7 +63,6 @@ class ProductListSerializer(serializers.ModelSerializer):
         ]
 
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
-            return ProductImageSerializer(primary_image).data
+        if obj.primary_image_id:
+            return ProductImageSerializer(obj.primary_image).data
         return None
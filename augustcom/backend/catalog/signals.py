@@ -0,0 +1,77 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .models import Category, Product, ProductFacet, ProductImage, ProductListing, ProductProperty
+from .search import get_search_backend, reindex_products
+from .tasks import enqueue
+
+
+@receiver(post_delete, sender=Product)
+def refresh_category_aggregates_on_delete(sender, instance, **kwargs):
+    """Keep Category.published_products_count and facets current, including for queryset deletes"""
+    Category.refresh_products_count(instance.category_id)
+    ProductFacet.schedule_refresh(instance.category_id)
+
+
+@receiver(post_save, sender=Product)
+def reindex_product_on_save(sender, instance, **kwargs):
+    reindex_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product_on_delete(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=ProductProperty)
+@receiver(post_delete, sender=ProductProperty)
+def reindex_product_on_property_change(sender, instance, **kwargs):
+    reindex_products([instance.product_id])
+
+
+@receiver(post_save, sender=ProductProperty)
+@receiver(post_delete, sender=ProductProperty)
+def refresh_facets_on_property_change(sender, instance, **kwargs):
+    # The product is already gone when its properties are cascade-deleted
+    category_id = Product.objects.filter(
+        pk=instance.product_id, is_published=True
+    ).values_list('category_id', flat=True).first()
+    ProductFacet.schedule_refresh(category_id)
+
+
+@receiver(post_save, sender=Product)
+def refresh_listing_on_save(sender, instance, **kwargs):
+    ProductListing.refresh(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def remove_listing_on_delete(sender, instance, **kwargs):
+    ProductListing.objects.filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=ProductProperty)
+@receiver(post_delete, sender=ProductProperty)
+@receiver(post_delete, sender=ProductImage)
+def refresh_listing_on_related_change(sender, instance, **kwargs):
+    # ProductImage.save refreshes the listing itself, once the primary image pointer is in sync
+    ProductListing.refresh(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+def refresh_listings_on_category_save(sender, instance, **kwargs):
+    ProductListing.refresh_categories(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductProperty)
+@receiver(post_delete, sender=ProductProperty)
+def invalidate_response_cache(sender, **kwargs):
+    """Any catalog write orphans every cached API response; re-warm it once writes settle"""
+    bump_catalog_version()
+    enqueue('catalog.warm_cache', unique_key='warm-cache', delay=5)
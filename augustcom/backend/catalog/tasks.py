@@ -0,0 +1,178 @@
+"""
+A small database-backed task queue, so slow work (image resizing, facet
+recomputation, cache warming) runs outside request and admin save handlers
+without an external broker.
+
+Functions are registered with @task and queued with enqueue(). Rows are
+claimed with a conditional UPDATE, so any number of `run_tasks` workers can
+share the table. Failed tasks are retried with exponential backoff up to
+Task.max_attempts. Set CATALOG_TASKS_EAGER to run tasks inline instead.
+"""
+import logging
+import traceback
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db.models import F
+from django.urls import resolve
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+def task(name):
+    def decorator(func):
+        REGISTRY[name] = func
+        func.task_name = name
+        return func
+    return decorator
+
+
+def is_eager():
+    return getattr(settings, 'CATALOG_TASKS_EAGER', False)
+
+
+def get_retry_delay():
+    return getattr(settings, 'CATALOG_TASKS_RETRY_DELAY', 10)
+
+
+def enqueue(name, unique_key='', delay=0, **kwargs):
+    """
+    Queue `name(**kwargs)`. A task with a `unique_key` is only queued if no
+    pending task has the same key, which coalesces bursts of identical work;
+    with a `delay` the pending task is pushed back on every call, so it runs
+    once the burst has been quiet for `delay` seconds.
+    """
+    from .models import Task
+
+    if name not in REGISTRY:
+        raise LookupError(f'Unknown task {name}')
+    if is_eager():
+        REGISTRY[name](**kwargs)
+        return None
+    if unique_key:
+        existing = Task.objects.filter(unique_key=unique_key, status=Task.PENDING).first()
+        if existing is not None:
+            if delay:
+                run_after = timezone.now() + timedelta(seconds=delay)
+                # Never pull a retry backoff forward
+                if Task.objects.filter(pk=existing.pk, status=Task.PENDING, run_after__lt=run_after).update(
+                    run_after=run_after
+                ):
+                    existing.run_after = run_after
+            return existing
+    return Task.objects.create(
+        name=name,
+        kwargs=kwargs,
+        unique_key=unique_key,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def claim_next():
+    """Atomically move the next due task from pending to running, or return None"""
+    from .models import Task
+
+    now = timezone.now()
+    due = Task.objects.filter(status=Task.PENDING, run_after__lte=now).values_list('pk', flat=True)[:10]
+    for pk in due:
+        claimed = Task.objects.filter(pk=pk, status=Task.PENDING).update(
+            status=Task.RUNNING, attempts=F('attempts') + 1, updated_at=now
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def execute(claimed):
+    """Run a claimed task; successful tasks are deleted, failures retried or marked failed"""
+    from .models import Task
+    from .routers import pinned_scope
+
+    try:
+        func = REGISTRY.get(claimed.name)
+        if func is None:
+            raise LookupError(f'Unknown task {claimed.name}')
+        # Tasks act on writes that replicas may not have received yet
+        with pinned_scope():
+            func(**claimed.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Task %s (%s) failed on attempt %s', claimed.pk, claimed.name, claimed.attempts)
+        if claimed.attempts < claimed.max_attempts:
+            backoff = timedelta(seconds=get_retry_delay() * 2 ** (claimed.attempts - 1))
+            Task.objects.filter(pk=claimed.pk).update(
+                status=Task.PENDING, run_after=timezone.now() + backoff, last_error=error
+            )
+        else:
+            Task.objects.filter(pk=claimed.pk).update(status=Task.FAILED, last_error=error)
+        return False
+    Task.objects.filter(pk=claimed.pk).delete()
+    return True
+
+
+def run_pending(limit=None):
+    """Run due tasks in the current thread until none are left; returns the number run"""
+    processed = 0
+    while limit is None or processed < limit:
+        claimed = claim_next()
+        if claimed is None:
+            break
+        execute(claimed)
+        processed += 1
+    return processed
+
+
+def requeue_stale(older_than):
+    """Return tasks stuck in running (e.g. after a worker crash) to the queue"""
+    from .models import Task
+
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return Task.objects.filter(status=Task.RUNNING, updated_at__lt=cutoff).update(status=Task.PENDING)
+
+
+@task('catalog.refresh_image_variants')
+def refresh_image_variants(image_id):
+    from .cache import bump_catalog_version
+    from .models import ProductImage
+
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is not None:
+        image.refresh_variants()
+        bump_catalog_version()
+
+
+@task('catalog.refresh_facets')
+def refresh_facets(category_id):
+    from .cache import bump_catalog_version
+    from .models import ProductFacet
+
+    ProductFacet.refresh(category_id)
+    bump_catalog_version()
+
+
+@task('catalog.warm_cache')
+def warm_cache():
+    """
+    Recompute catalog totals and render CATALOG_CACHE_WARM_URLS into the
+    response cache. Cache keys include the host and scheme, as pagination links
+    embed them, so URLs are only warmed when CATALOG_CACHE_WARM_HOST (and
+    CATALOG_CACHE_WARM_SECURE) match what clients request.
+    """
+    from django.test import RequestFactory
+
+    from .cache import get_catalog_modified, get_catalog_stats, is_enabled
+
+    get_catalog_stats()
+    get_catalog_modified()
+    host = getattr(settings, 'CATALOG_CACHE_WARM_HOST', '')
+    if not host or not is_enabled():
+        return
+    factory = RequestFactory(HTTP_HOST=host, HTTP_ACCEPT=getattr(settings, 'CATALOG_CACHE_WARM_ACCEPT', '*/*'))
+    secure = getattr(settings, 'CATALOG_CACHE_WARM_SECURE', False)
+    for url in getattr(settings, 'CATALOG_CACHE_WARM_URLS', ()):
+        match = resolve(urlsplit(url).path)
+        match.func(factory.get(url, secure=secure), *match.args, **match.kwargs)
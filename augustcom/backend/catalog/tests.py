@@ -1,9 +1,38 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import caches as django_caches
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, connections as db_connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
 from rest_framework.test import APITestCase
 from rest_framework import status
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
 from decimal import Decimal
-from .models import Category, Product, ProductImage, ProductProperty
+import gzip
+import json
+import os
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from PIL import Image
+from unittest import mock, skipUnless
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.utils.serializer_helpers import ReturnDict
+from . import benchmark, cache, fast_serializers, metrics, routers, search, tasks
+from .db import get_pool_stats
+from .models import Category, Product, ProductFacet, ProductImage, ProductListing, ProductProperty, Task
+from .pagination import KeysetPagination
+from .renderers import FastJSONRenderer
+from .serializers import ProductListSerializer
 
 
 class CategoryModelTest(TestCase):
@@ -66,6 +95,70 @@ class ProductModelTest(TestCase):
         self.assertEqual(str(self.product), "Test Product")
 
 
+class CategoryProductsCountTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Phones")
+        self.other_category = Category.objects.create(name="Tablets")
+
+    def create_product(self, name, is_published=True, category=None):
+        return Product.objects.create(
+            name=name,
+            description=f"{name} description",
+            price=Decimal("10.00"),
+            category=category or self.category,
+            is_published=is_published
+        )
+
+    def counts(self):
+        self.category.refresh_from_db()
+        self.other_category.refresh_from_db()
+        return self.category.published_products_count, self.other_category.published_products_count
+
+    def test_count_tracks_publishing(self):
+        """Test that only published products are counted"""
+        product = self.create_product("Draft", is_published=False)
+        self.create_product("Live")
+        self.assertEqual(self.counts(), (1, 0))
+
+        product.is_published = True
+        product.save()
+        self.assertEqual(self.counts(), (2, 0))
+
+    def test_count_tracks_category_moves(self):
+        """Test that moving a product refreshes both categories"""
+        product = self.create_product("Mover")
+        product = Product.objects.get(pk=product.pk)
+        product.category = self.other_category
+        product.save()
+        self.assertEqual(self.counts(), (0, 1))
+
+    def test_count_tracks_deletes(self):
+        """Test that instance and queryset deletes refresh the count"""
+        first = self.create_product("First")
+        self.create_product("Second")
+        first.delete()
+        self.assertEqual(self.counts(), (1, 0))
+
+        Product.objects.all().delete()
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_saving_stale_category_keeps_count(self):
+        """Test that saving an instance loaded before the recount does not write the old count back"""
+        self.create_product("First")
+        self.create_product("Second")
+        self.category.description = "Edited"
+        self.category.save()
+        self.assertEqual(self.counts(), (2, 0))
+        self.assertEqual(self.category.description, "Edited")
+        self.assertEqual(ProductListing.objects.filter(category_products_count=2).count(), 2)
+
+    def test_deleted_category_can_be_saved_again(self):
+        """Test that delete() followed by save() inserts the category again"""
+        self.category.delete()
+        self.category.save()
+        self.assertTrue(Category.objects.filter(slug=self.category.slug).exists())
+
+
 class ProductPropertyModelTest(TestCase):
     def setUp(self):
         self.category = Category.objects.create(
@@ -176,6 +269,46 @@ class ProductImageModelTest(TestCase):
         )
         self.assertEqual(str(image), "Test Product - Test image")
 
+    def test_primary_image_pointer_follows_primary_flag(self):
+        """Test that Product.primary_image tracks the current primary image"""
+        first = ProductImage.objects.create(product=self.product, is_primary=True)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image, first)
+
+        second = ProductImage.objects.create(product=self.product, is_primary=True)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image, second)
+
+        second.is_primary = False
+        second.save()
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.primary_image)
+
+    def test_saving_stale_product_keeps_pointer(self):
+        """Test that saving a product loaded before the primary image changed keeps the new pointer"""
+        ProductImage.objects.create(product=self.product, is_primary=True)
+        stale = Product.objects.get(pk=self.product.pk)
+        second = ProductImage.objects.create(product=self.product, is_primary=True)
+        stale.name = "Renamed Product"
+        stale.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image, second)
+        self.assertEqual(self.product.name, "Renamed Product")
+        self.assertEqual(ProductListing.objects.get(pk=self.product.pk).primary_image[0], second.pk)
+
+    def test_deleted_product_can_be_saved_again(self):
+        """Test that delete() followed by save() inserts the product again"""
+        self.product.delete()
+        self.product.save()
+        self.assertTrue(Product.objects.filter(slug=self.product.slug).exists())
+
+    def test_primary_image_pointer_cleared_on_delete(self):
+        """Test that deleting the primary image clears Product.primary_image"""
+        image = ProductImage.objects.create(product=self.product, is_primary=True)
+        image.delete()
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.primary_image)
+
 
 class CategoryAPITest(APITestCase):
     def setUp(self):
@@ -343,3 +476,1826 @@ class ProductAPITest(APITestCase):
         self.assertEqual(len(response.data['results']), 12)  # Default page size
         self.assertIn('next', response.data)
         self.assertIn('previous', response.data)
+
+    @override_settings(CATALOG_CACHE_ENABLED=False)
+    def test_queries_independent_of_page_size(self):
+        """Test that a page of 50 products runs as many queries as a page of 1 on every read path"""
+        url = reverse('catalog:product-list')
+        ProductImage.objects.create(product=self.product, alt_text="Main", is_primary=True)
+        for i in range(50):
+            product = Product.objects.create(
+                name=f"Imaged Product {i}",
+                description="Product with an image",
+                price=Decimal("19.99"),
+                category=self.category,
+                is_published=True
+            )
+            ProductImage.objects.create(product=product, alt_text=f"Image {i}", is_primary=True)
+            ProductProperty.objects.create(product=product, key="Color", value="Black")
+
+        def count_queries(page_size):
+            with mock.patch.object(PageNumberPagination, 'page_size', page_size):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url)
+            self.assertEqual(len(response.data['results']), page_size)
+            self.assertEqual(response.data['results'][0]['primary_image']['alt_text'], "Image 49")
+            return len(ctx.captured_queries)
+
+        for listing_reads, fast_serializers in ((True, True), (False, True), (False, False)):
+            with self.subTest(listing_reads=listing_reads, fast_serializers=fast_serializers):
+                with self.settings(CATALOG_LISTING_READS=listing_reads, CATALOG_FAST_SERIALIZERS=fast_serializers):
+                    self.assertEqual(count_queries(1), count_queries(50))
+
+    def test_nested_category_counts_cost_no_queries(self):
+        """Test that nested category payloads add no per-product COUNT queries"""
+        for i in range(11):
+            Product.objects.create(
+                name=f"Counted Product {i}",
+                description="Counted product",
+                price=Decimal("9.99"),
+                category=self.category,
+                is_published=True
+            )
+
+        url = reverse('catalog:product-list')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 12)
+        self.assertEqual(response.data['results'][0]['category']['products_count'], 12)
+        # Only the paginator's COUNT(*) remains
+        count_queries = [q for q in ctx.captured_queries if 'COUNT(' in q['sql']]
+        self.assertEqual(len(count_queries), 1)
+
+
+class ProductBatchTest(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Batch Category")
+        self.products = [
+            Product.objects.create(
+                name=f"Batch Product {i}", description="Batch", price=Decimal("10.00"),
+                category=self.category, is_published=True
+            )
+            for i in range(3)
+        ]
+        self.hidden = Product.objects.create(
+            name="Hidden Product", description="Draft", price=Decimal("10.00"), category=self.category
+        )
+        ProductImage.objects.create(product=self.products[0], alt_text="Front", is_primary=True)
+        self.url = reverse('catalog:product-batch')
+
+    def test_slugs_in_request_order(self):
+        slugs = [self.products[2].slug, 'missing', self.products[0].slug, self.hidden.slug, self.products[2].slug]
+        response = self.client.get(self.url, {'slugs': ','.join(slugs)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([item['slug'] for item in results], slugs)
+        self.assertEqual(results[1], {'slug': 'missing', 'error': 'not_found'})
+        self.assertEqual(results[3], {'slug': self.hidden.slug, 'error': 'not_found'})
+        # Same representation as the detail endpoint
+        detail = self.client.get(reverse('catalog:product-detail', kwargs={'slug': self.products[0].slug}))
+        self.assertEqual(results[2], detail.data)
+
+    def test_ids(self):
+        response = self.client.get(self.url, {'ids': [f'{self.products[1].pk},999999', str(self.products[0].pk)]})
+        self.assertEqual(
+            [item.get('name') or item for item in response.data['results']],
+            ["Batch Product 1", {'id': 999999, 'error': 'not_found'}, "Batch Product 0"]
+        )
+
+    def test_invalid_requests(self):
+        for params in ({}, {'slugs': 'a', 'ids': '1'}, {'ids': 'one'}, {'slugs': ','.join(['a'] * 201)}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductSearchTest(APITestCase):
+    def setUp(self):
+        self.phones = Category.objects.create(name="Phones")
+        self.books = Category.objects.create(name="Books")
+        self.phone = self.create_product("Smartphone X1", "Flagship handset", self.phones)
+        self.case = self.create_product("Leather Case", "Protective case for the smartphone", self.phones)
+        self.novel = self.create_product("Mystery Novel", "A gripping read", self.books)
+        ProductProperty.objects.create(product=self.novel, key="Cover", value="Black hardcover")
+
+    def create_product(self, name, description, category, is_published=True):
+        return Product.objects.create(
+            name=name,
+            description=description,
+            price=Decimal("10.00"),
+            category=category,
+            is_published=is_published
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('catalog:product-search'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['slug'] for item in response.data['results']]
+
+    def test_name_matches_rank_above_description_matches(self):
+        """Test that results are ranked with name matches first"""
+        self.assertEqual(self.search(q="smartphone"), [self.phone.slug, self.case.slug])
+
+    def test_matches_property_values(self):
+        """Test that property values are searchable and kept current"""
+        self.assertEqual(self.search(q="hardcover"), [self.novel.slug])
+
+        cover = self.novel.properties.get()
+        cover.value = "Paperback"
+        cover.save()
+        self.assertEqual(self.search(q="hardcover"), [])
+        self.assertEqual(self.search(q="paperback"), [self.novel.slug])
+
+        cover.delete()
+        self.assertEqual(self.search(q="paperback"), [])
+
+    def test_index_follows_product_changes(self):
+        """Test that renames, unpublishing and deletes update the results"""
+        self.novel.name = "Thriller Novel"
+        self.novel.save()
+        self.assertEqual(self.search(q="thriller"), [self.novel.slug])
+
+        self.novel.is_published = False
+        self.novel.save()
+        self.assertEqual(self.search(q="thriller"), [])
+
+        self.phone.delete()
+        self.assertEqual(self.search(q="smartphone"), [self.case.slug])
+
+    def test_respects_product_filters(self):
+        """Test that search combines with the regular product filters"""
+        self.assertEqual(self.search(q="smartphone", category=self.books.slug), [])
+        self.assertEqual(self.search(q="smartphone case", category=self.phones.slug), [self.case.slug])
+
+    def test_query_syntax_is_escaped(self):
+        """Test that search operators in user input are treated as plain text"""
+        self.assertEqual(self.search(q='"smart* ('), [self.phone.slug, self.case.slug])
+        self.assertEqual(self.search(q=""), [])
+
+    def test_words_match_as_prefixes(self):
+        """Test that every query word matches the start of a word, as on PostgreSQL"""
+        self.assertEqual(self.search(q="smartph"), [self.phone.slug, self.case.slug])
+        self.assertEqual(self.search(q="hard myst"), [self.novel.slug])
+        self.assertEqual(self.search(q="martphone"), [])
+
+    def test_results_are_not_capped(self):
+        """Test that counts stay exact for terms matching more than a thousand products"""
+        products = Product.objects.bulk_create([
+            Product(name=f"Widget {i}", slug=f"widget-{i}", description="Bulk", price=Decimal("1.00"),
+                    category=self.books, is_published=True)
+            for i in range(1005)
+        ])
+        product_ids = [product.pk for product in products]
+        search.reindex_products(product_ids)
+        ProductListing.refresh(*product_ids)
+        self.assertEqual(self.client.get(reverse('catalog:product-search'), {'q': 'widget'}).data['count'], 1005)
+        self.assertEqual(self.client.get(reverse('catalog:product-list'), {'q': 'widget'}).data['count'], 1005)
+
+    def test_rebuild_command(self):
+        """Test that the index can be rebuilt from scratch"""
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 3 products', out.getvalue())
+        self.assertEqual(self.search(q="novel"), [self.novel.slug])
+
+    def test_list_name_filter_uses_index(self):
+        """Test that the name filter matches name words by prefix through the search index"""
+        url = reverse('catalog:product-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'name': 'smart'})
+        self.assertEqual([item['slug'] for item in response.data['results']], [self.phone.slug])
+        self.assertFalse(any('LIKE' in query['sql'] for query in queries.captured_queries))
+
+    def test_search_validates_filters(self):
+        """Test that search rejects invalid filters like the product list does"""
+        response = self.client.get(reverse('catalog:product-search'), {'q': 'smartphone', 'min_price': 'cheap'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_price', response.data)
+
+    def test_list_q_filter(self):
+        """Test that the product list accepts an index-backed q filter"""
+        response = self.client.get(reverse('catalog:product-list'), {'q': 'novel'})
+        self.assertEqual([item['slug'] for item in response.data['results']], [self.novel.slug])
+
+
+class ProductFacetTest(APITestCase):
+    def setUp(self):
+        self.phones = Category.objects.create(name="Phones")
+        self.tablets = Category.objects.create(name="Tablets")
+        self.black_128 = self.create_product("Phone A", self.phones, "50.00", Color="Black", Storage="128GB")
+        self.black_256 = self.create_product("Phone B", self.phones, "90.00", Color="Black", Storage="256GB")
+        self.white_128 = self.create_product("Phone C", self.phones, "60.00", Color="White", Storage="128GB")
+        self.tablet = self.create_product("Tablet A", self.tablets, "200.00", Color="Black")
+        # Facet refreshes are deferred to the task queue
+        tasks.run_pending()
+
+    def create_product(self, name, category, price, **properties):
+        product = Product.objects.create(
+            name=name,
+            description=f"{name} description",
+            price=Decimal(price),
+            category=category,
+            is_published=True
+        )
+        for order, (key, value) in enumerate(properties.items()):
+            ProductProperty.objects.create(product=product, key=key, value=value, order=order)
+        return product
+
+    def facets(self, params):
+        response = self.client.get(reverse('catalog:product-facets'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['facets']
+
+    def list_slugs(self, params):
+        response = self.client.get(reverse('catalog:product-list'), params)
+        return sorted(item['slug'] for item in response.data['results'])
+
+    def test_property_filters(self):
+        """Test that values of one key are OR-ed and different keys AND-ed"""
+        self.assertEqual(
+            self.list_slugs({'prop': 'Color:Black'}),
+            sorted([self.black_128.slug, self.black_256.slug, self.tablet.slug])
+        )
+        self.assertEqual(self.list_slugs({'prop': ['Color:Black', 'Storage:128GB']}), [self.black_128.slug])
+        self.assertEqual(
+            self.list_slugs({'prop': ['Storage:128GB', 'Storage:256GB'], 'category': self.phones.slug}),
+            sorted([self.black_128.slug, self.black_256.slug, self.white_128.slug])
+        )
+
+    def test_precomputed_facets_for_category(self):
+        """Test that category-scoped facets come from the precomputed table"""
+        with self.assertNumQueries(1):
+            facets = self.facets({'category': self.phones.slug})
+        self.assertEqual(facets['Color'], [{'value': 'Black', 'count': 2}, {'value': 'White', 'count': 1}])
+        self.assertEqual(facets['Storage'], [{'value': '128GB', 'count': 2}, {'value': '256GB', 'count': 1}])
+        self.assertEqual(self.facets({})['Color'][0], {'value': 'Black', 'count': 3})
+
+    def test_facets_for_narrowed_result_set(self):
+        """Test that facets reflect price and property filters"""
+        facets = self.facets({'prop': 'Storage:128GB', 'max_price': '55'})
+        self.assertEqual(facets, {
+            'Color': [{'value': 'Black', 'count': 1}],
+            'Storage': [{'value': '128GB', 'count': 1}],
+        })
+
+    def test_narrowed_facets_do_not_group_properties(self):
+        """Test that narrowed facets are counted from the listing rows, not ProductProperty"""
+        with CaptureQueriesContext(connection) as queries:
+            self.facets({'max_price': '100'})
+        self.assertFalse(any('catalog_productproperty' in query['sql'] for query in queries.captured_queries))
+
+    @override_settings(CATALOG_FACETS_MAX_PRODUCTS=2)
+    def test_large_narrowed_result_sets_are_approximate(self):
+        """Test that result sets past the bound fall back to the precomputed counts"""
+        url = reverse('catalog:product-facets')
+        response = self.client.get(url, {'category': self.phones.slug, 'max_price': '100'})
+        self.assertTrue(response.data['approximate'])
+        self.assertEqual(
+            response.data['facets']['Color'], [{'value': 'Black', 'count': 2}, {'value': 'White', 'count': 1}]
+        )
+        response = self.client.get(url, {'category': self.phones.slug, 'max_price': '55'})
+        self.assertFalse(response.data['approximate'])
+
+    def test_facets_follow_catalog_changes(self):
+        """Test that precomputed facets stay in sync with products and properties"""
+        self.white_128.is_published = False
+        self.white_128.save()
+        tasks.run_pending()
+        self.assertEqual(self.facets({'category': self.phones.slug})['Color'], [{'value': 'Black', 'count': 2}])
+
+        color = self.black_256.properties.get(key="Color")
+        color.value = "Blue"
+        color.save()
+        tasks.run_pending()
+        self.assertEqual(
+            self.facets({'category': self.phones.slug})['Color'],
+            [{'value': 'Black', 'count': 1}, {'value': 'Blue', 'count': 1}]
+        )
+
+        self.black_128.category = self.tablets
+        self.black_128.save()
+        tasks.run_pending()
+        self.assertEqual(self.facets({'category': self.tablets.slug})['Color'], [{'value': 'Black', 'count': 2}])
+
+        self.tablet.delete()
+        tasks.run_pending()
+        self.assertEqual(self.facets({'category': self.tablets.slug})['Color'], [{'value': 'Black', 'count': 1}])
+
+        tablets_id = self.tablets.pk
+        self.tablets.delete()
+        self.assertFalse(ProductFacet.objects.filter(category_id=tablets_id).exists())
+
+
+# The test runner is one process, so the locmem cache counts as shared
+@override_settings(CATALOG_CACHE_SHARED=True)
+class ResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.reset_cache_stats()
+        self.category = Category.objects.create(name="Cached Category")
+        self.product = Product.objects.create(
+            name="Cached Product",
+            description="Cached product",
+            price=Decimal("10.00"),
+            category=self.category,
+            is_published=True
+        )
+        self.url = reverse('catalog:product-list')
+
+    def test_repeated_requests_are_served_from_cache(self):
+        """Test that a repeated request runs no queries and reports a hit"""
+        first = self.client.get(self.url, {'ordering': 'price', 'min_price': '1'})
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            # Parameter order does not matter
+            second = self.client.get(self.url, {'min_price': '1', 'ordering': 'price'})
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+
+        stats = self.client.get(reverse('catalog:cache-stats')).data
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+
+    def test_catalog_writes_invalidate_cache(self):
+        """Test that saving any catalog model bumps the version"""
+        self.client.get(self.url)
+        writes = [
+            lambda: self.product.save(),
+            lambda: self.category.save(),
+            lambda: ProductProperty.objects.create(product=self.product, key="Color", value="Red"),
+            lambda: ProductImage.objects.create(product=self.product, alt_text="Front"),
+            lambda: self.product.properties.all().delete(),
+        ]
+        for write in writes:
+            write()
+            self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+
+    def test_errors_and_health_are_not_cached(self):
+        """Test that 404s and the health probe always hit the view"""
+        missing = reverse('catalog:product-detail', kwargs={'slug': 'missing'})
+        self.client.get(missing)
+        with self.assertNumQueries(1):
+            self.client.get(missing)
+        self.assertNotIn('X-Cache', self.client.get(reverse('catalog:product-health')))
+
+    def test_cache_is_per_host_and_scheme(self):
+        """Test that cached pages, whose pagination links are absolute, are not shared across hosts"""
+        self.client.get(self.url, HTTP_HOST='localhost')
+        self.assertEqual(self.client.get(self.url, HTTP_HOST='localhost')['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(self.url, HTTP_HOST='127.0.0.1')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(self.url, HTTP_HOST='localhost', secure=True)['X-Cache'], 'MISS')
+
+    @override_settings(CATALOG_CACHE_SHARED=False)
+    def test_per_process_cache_is_not_used(self):
+        """Test that responses bypass a cache other workers cannot invalidate"""
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(cache.get_cache_stats()['misses'], 0)
+
+
+# The test runner is one process, so the locmem cache counts as shared
+@override_settings(CATALOG_CACHE_SHARED=True)
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Conditional Category")
+        self.product = Product.objects.create(
+            name="Conditional Product",
+            description="Conditional product",
+            price=Decimal("10.00"),
+            category=self.category,
+            is_published=True
+        )
+        self.urls = [
+            reverse('catalog:product-list'),
+            reverse('catalog:product-detail', kwargs={'slug': self.product.slug}),
+            reverse('catalog:category-list'),
+            reverse('catalog:category-detail', kwargs={'slug': self.category.slug}),
+            reverse('catalog:category-products', kwargs={'slug': self.category.slug}),
+        ]
+
+    def test_validators_on_list_and_detail(self):
+        """Test that list and detail responses carry ETag and Last-Modified"""
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response['ETag'].startswith('"'))
+            self.assertIn('Last-Modified', response)
+
+    def test_matching_etag_returns_304_without_queries(self):
+        """Test that a matching If-None-Match short-circuits the view"""
+        for url in self.urls:
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b'')
+
+    def test_etag_changes_with_query_and_catalog(self):
+        """Test that validators differ per query and change after writes"""
+        url = reverse('catalog:product-list')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'ordering': 'price'})['ETag'], etag)
+
+        self.product.price = Decimal("12.00")
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['price'], '12.00')
+
+    def test_if_modified_since(self):
+        """Test that If-Modified-Since is honoured"""
+        url = reverse('catalog:product-list')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_no_validators_without_shared_cache(self):
+        """Test that a process which may have missed a version bump never answers 304"""
+        etag = self.client.get(self.urls[0])['ETag']
+        with override_settings(CATALOG_CACHE_SHARED=False):
+            for url in self.urls + [reverse('catalog:async-product-list')]:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('ETag', response)
+                self.assertNotIn('Last-Modified', response)
+
+
+class CompressionTest(APITestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Compressed Category", description="Repeated " * 20)
+        for i in range(5):
+            Product.objects.create(
+                name=f"Compressed Product {i}", description="Compressed", price=Decimal("10.00"),
+                category=category, is_published=True
+            )
+        self.url = reverse('catalog:product-list')
+
+    def test_gzip_when_accepted(self):
+        plain = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', plain)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+
+    @override_settings(CATALOG_CACHE_SHARED=True)
+    def test_compressed_etag_still_validates(self):
+        """Test that the weakened ETag of a compressed response still yields a 304"""
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class SparseFieldsetsTest(APITestCase):
+    def setUp(self):
+        self.phones = Category.objects.create(name="Phones", description="Smartphones")
+        self.tablets = Category.objects.create(name="Tablets", description="Slates")
+        for name, category in (("Phone A", self.phones), ("Phone B", self.phones), ("Tablet A", self.tablets)):
+            Product.objects.create(
+                name=name, description=name, price=Decimal("10.00"), category=category, is_published=True
+            )
+
+    def test_without_fields_unchanged(self):
+        response = self.client.get(reverse('catalog:product-list'), {'expand': 'category'})
+        self.assertNotIn('categories', response.data)
+        self.assertEqual(response.data['results'][0]['category']['name'], "Tablets")
+
+    def test_fields_with_category_side_table(self):
+        response = self.client.get(reverse('catalog:product-list'), {'fields': 'name,category,id'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+        self.assertEqual(results[0], {'id': results[0]['id'], 'name': "Tablet A", 'category': self.tablets.pk})
+        self.assertEqual(set(response.json()['categories']), {str(self.phones.pk), str(self.tablets.pk)})
+        self.assertEqual(response.json()['categories'][str(self.phones.pk)]['description'], "Smartphones")
+        self.assertEqual(response.json()['count'], 3)
+
+    def test_fields_without_category(self):
+        response = self.client.get(reverse('catalog:product-search'), {'q': 'phone', 'fields': 'slug'})
+        self.assertCountEqual(response.data['results'], [{'slug': 'phone-a'}, {'slug': 'phone-b'}])
+        self.assertNotIn('categories', response.data)
+
+    def test_expand_category(self):
+        url = reverse('catalog:category-products', kwargs={'slug': self.phones.slug})
+        response = self.client.get(url, {'fields': 'id,category', 'expand': 'category', 'pagination': 'cursor'})
+        self.assertNotIn('categories', response.data)
+        self.assertEqual(response.data['results'][0]['category']['slug'], self.phones.slug)
+
+    def test_async_path_matches(self):
+        params = {'fields': 'id,price,category'}
+        response = self.client.get(reverse('catalog:async-product-list'), params, HTTP_ACCEPT='application/json')
+        expected = self.client.get(reverse('catalog:product-list'), params, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.content.replace(b'/api/async/', b'/api/'), expected.content)
+
+    def test_unknown_fields_rejected(self):
+        for params, param in (({'fields': 'id,secret'}, 'fields'), ({'fields': 'id', 'expand': 'properties'}, 'expand')):
+            with self.subTest(params=params):
+                with self.assertNumQueries(0):
+                    response = self.client.get(reverse('catalog:product-list'), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(param, response.data)
+
+
+class HealthAndStatsTest(APITestCase):
+    # The readiness probe pings every configured database
+    databases = '__all__'
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Health Category")
+        Product.objects.create(
+            name="Health Product",
+            description="Health product",
+            price=Decimal("10.00"),
+            category=self.category,
+            is_published=True
+        )
+
+    def test_liveness_skips_database(self):
+        """Test that the liveness probe runs no queries"""
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('catalog:health-live'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'alive')
+
+    def test_readiness_pings_database(self):
+        """Test that the readiness probe only runs SELECT 1"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('catalog:health-ready'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['databases']['default']['status'], 'ok')
+        self.assertEqual([q['sql'] for q in ctx.captured_queries], ['SELECT 1'])
+
+    def test_readiness_hides_database_errors(self):
+        """Test that a failing database is reported without the driver's error message"""
+        message = 'could not connect to server "db.internal" database "shopcore"'
+        with mock.patch.object(connection, 'cursor', side_effect=OperationalError(message)), \
+                self.assertLogs('catalog.views', 'ERROR') as logs:
+            response = self.client.get(reverse('catalog:health-ready'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data['databases']['default'], {'status': 'error'})
+        self.assertNotIn('db.internal', response.content.decode())
+        self.assertIn(message, logs.output[0])
+
+    def test_database_stats(self):
+        """Test that connection settings are reported without querying"""
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('catalog:db-stats'))
+        default = response.data['databases']['default']
+        self.assertEqual(default['vendor'], 'sqlite')
+        self.assertIn('conn_max_age', default)
+        self.assertIsNone(default['pool'])
+
+    @override_settings(CATALOG_METRICS_ALLOWED_IPS=[])
+    def test_database_stats_are_restricted(self):
+        """Test that connection settings are only shown to staff users and allowed addresses"""
+        url = reverse('catalog:db-stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_login(User.objects.create_user('ops', password='pw', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_pool_utilization(self):
+        """Test that psycopg pool statistics are turned into utilization figures"""
+        pool = mock.Mock(min_size=2, max_size=10)
+        pool.get_stats.return_value = {
+            'pool_min': 2, 'pool_max': 10, 'pool_size': 4, 'pool_available': 1,
+            'requests_waiting': 3, 'requests_num': 120, 'connections_num': 4,
+        }
+        stats = get_pool_stats(mock.Mock(pool=pool))
+        self.assertEqual(stats['in_use'], 3)
+        self.assertEqual(stats['utilization'], 0.3)
+        self.assertEqual(stats['waiting'], 3)
+        self.assertEqual(stats['requests'], 120)
+
+    def test_stats_are_cached_until_catalog_changes(self):
+        """Test that catalog totals are counted once per catalog version"""
+        url = reverse('catalog:catalog-stats')
+        self.assertEqual(self.client.get(url).data, {'total_products': 1, 'total_categories': 1})
+        with self.assertNumQueries(0):
+            self.client.get(url)
+            self.client.get(reverse('catalog:product-health'))
+
+        Category.objects.create(name="Second Category")
+        self.assertEqual(self.client.get(url).data['total_categories'], 2)
+
+
+class KeysetPaginationTest(APITestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Keyset Category")
+        # Repeated prices exercise the id tiebreaker
+        for i in range(30):
+            Product.objects.create(
+                name=f"Keyset Product {i:02d}",
+                description="Keyset product",
+                price=Decimal("10.00") + (i % 4),
+                category=self.category,
+                is_published=True
+            )
+
+    def walk(self, url, params):
+        slugs = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            slugs.extend(item['slug'] for item in response.data['results'])
+            if not response.data['next']:
+                return slugs, response
+            response = self.client.get(response.data['next'])
+
+    def test_walks_every_product_once_in_order(self):
+        """Test that following next links returns each product once, in ordering order"""
+        url = reverse('catalog:product-list')
+        for ordering in ['-created_at', 'price', '-price', 'name']:
+            slugs, _ = self.walk(url, {'pagination': 'cursor', 'ordering': ordering})
+            expected = list(
+                Product.objects.order_by(ordering, ordering.replace(ordering.lstrip('-'), 'id'))
+                .values_list('slug', flat=True)
+            )
+            self.assertEqual(slugs, expected)
+
+    def test_previous_link_returns_prior_page(self):
+        """Test that the previous link walks back to the same page"""
+        url = reverse('catalog:product-list')
+        first = self.client.get(url, {'pagination': 'cursor', 'ordering': 'price'})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(back.data['previous'])
+
+    def test_deep_pages_skip_count_and_offset(self):
+        """Test that cursor pages run neither COUNT(*) nor OFFSET"""
+        url = reverse('catalog:product-list')
+        first = self.client.get(url, {'pagination': 'cursor'})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(first.data['next'])
+        for query in ctx.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_category_products_cursor_mode(self):
+        """Test that category product listings support cursor mode"""
+        url = reverse('catalog:category-products', kwargs={'slug': self.category.slug})
+        slugs, _ = self.walk(url, {'pagination': 'cursor', 'min_price': '12'})
+        self.assertEqual(len(slugs), 14)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get(reverse('catalog:product-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_mode_is_default(self):
+        """Test that page number pagination stays the default"""
+        response = self.client.get(reverse('catalog:product-list'))
+        self.assertEqual(response.data['count'], 30)
+
+
+# The list read paths reachable through settings: ProductListing rows, .values() rows of the
+# Product ORM queryset, and DRF serializers over model instances
+READ_PATHS = {
+    'listing': {'CATALOG_LISTING_READS': True, 'CATALOG_FAST_SERIALIZERS': True},
+    'orm': {'CATALOG_LISTING_READS': False, 'CATALOG_FAST_SERIALIZERS': True},
+    'serializers': {'CATALOG_LISTING_READS': False, 'CATALOG_FAST_SERIALIZERS': False},
+}
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class QueryBudgetTest(APITestCase):
+    """
+    Every route in catalog/urls.py must run a fixed number of queries regardless
+    of page size, on every list read path
+    """
+    # The readiness probe pings every configured database
+    databases = '__all__'
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Budget Category")
+        self.products = []
+        for i in range(3):
+            self.add_product(i)
+
+    def add_product(self, index):
+        product = Product.objects.create(
+            name=f"Budget Product {index}",
+            description="Budget product",
+            price=Decimal("5.00") + index,
+            category=self.category,
+            is_published=True
+        )
+        ProductProperty.objects.create(product=product, key="Color", value="Black", order=1)
+        ProductProperty.objects.create(product=product, key="Size", value="M", order=2)
+        ProductImage.objects.create(product=product, alt_text="Front", is_primary=True)
+        ProductImage.objects.create(product=product, alt_text="Back")
+        self.products.append(product)
+        return product
+
+    def assertBudget(self, budget, url, params=None):
+        with self.assertNumQueries(budget):
+            response = self.client.get(url, params)
+            if response.streaming:
+                # Streamed bodies query while they are consumed
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def assertBudgetAtAnyPageSize(self, budgets, url, params=None):
+        """`budgets` is {read path: queries}, or one budget shared by every read path"""
+        if isinstance(budgets, int):
+            budgets = dict.fromkeys(READ_PATHS, budgets)
+        for grow in (False, True):
+            if grow:
+                for i in range(3, 15):
+                    self.add_product(i)
+            for name, budget in budgets.items():
+                with self.subTest(read_path=name, page='full' if grow else 'partial'):
+                    with self.settings(**READ_PATHS[name]):
+                        response = self.assertBudget(budget, url, params)
+                    if grow:
+                        # The async views return plain JSON responses
+                        data = response.data if hasattr(response, 'data') else json.loads(response.content)
+                        self.assertEqual(len(data['results']), 12)
+                        self.assertEqual(len(data['results'][0]['properties']), 2)
+
+    def test_api_root(self):
+        self.assertBudget(0, reverse('catalog:api-root'))
+
+    def test_category_list(self):
+        # COUNT + categories
+        self.assertBudget(2, reverse('catalog:category-list'))
+
+    def test_category_detail(self):
+        self.assertBudget(1, reverse('catalog:category-detail', kwargs={'slug': self.category.slug}))
+
+    def test_category_products(self):
+        # category + COUNT + listings, or products + properties
+        url = reverse('catalog:category-products', kwargs={'slug': self.category.slug})
+        self.assertBudgetAtAnyPageSize({'listing': 3, 'orm': 4, 'serializers': 4}, url)
+
+    def test_product_list(self):
+        # COUNT + listings, or products + properties
+        self.assertBudgetAtAnyPageSize({'listing': 2, 'orm': 3, 'serializers': 3}, reverse('catalog:product-list'))
+
+    def test_product_list_filtered_and_ordered(self):
+        params = {'category': self.category.slug, 'min_price': '1', 'ordering': 'price'}
+        self.assertBudgetAtAnyPageSize(
+            {'listing': 2, 'orm': 3, 'serializers': 3}, reverse('catalog:product-list'), params
+        )
+
+    def test_product_detail(self):
+        # product + properties + images
+        url = reverse('catalog:product-detail', kwargs={'slug': self.products[0].slug})
+        response = self.assertBudget(3, url)
+        self.assertEqual(len(response.data['images']), 2)
+        self.assertEqual(response.data['primary_image']['alt_text'], "Front")
+
+    def test_health(self):
+        self.assertBudget(2, reverse('catalog:product-health'))
+
+    def test_product_batch(self):
+        # products + properties + images, for any number of slugs
+        slugs = lambda: ','.join(product.slug for product in self.products)
+        self.assertBudget(3, reverse('catalog:product-batch'), {'slugs': slugs()})
+        for i in range(3, 15):
+            self.add_product(i)
+        response = self.assertBudget(3, reverse('catalog:product-batch'), {'slugs': slugs()})
+        self.assertEqual(len(response.data['results']), 15)
+
+    def test_product_search(self):
+        # search + filtered ids + listings, or products + properties
+        self.assertBudgetAtAnyPageSize(
+            {'listing': 3, 'orm': 4, 'serializers': 4}, reverse('catalog:product-search'), {'q': 'budget'}
+        )
+
+    def test_product_facets(self):
+        # precomputed facet rows; narrowed result sets read their listing rows instead
+        self.assertBudget(1, reverse('catalog:product-facets'), {'category': self.category.slug})
+        for i in range(3, 15):
+            self.add_product(i)
+        self.assertBudget(1, reverse('catalog:product-facets'), {'category': self.category.slug})
+        self.assertBudget(1, reverse('catalog:product-facets'), {'min_price': '1'})
+
+    def test_product_export(self):
+        # products + properties + images per chunk of rows; CSV first collects the property keys
+        self.assertBudget(3, reverse('catalog:product-export'))
+        self.assertBudget(4, reverse('catalog:product-export'), {'output': 'csv'})
+        for i in range(3, 15):
+            self.add_product(i)
+        self.assertBudget(3, reverse('catalog:product-export'))
+        self.assertBudget(4, reverse('catalog:product-export'), {'output': 'csv'})
+
+    # The async views always read the ORM path
+    def test_async_product_list(self):
+        # COUNT + products + properties
+        self.assertBudgetAtAnyPageSize(3, reverse('catalog:async-product-list'))
+
+    def test_async_product_detail(self):
+        self.assertBudget(3, reverse('catalog:async-product-detail', kwargs={'slug': self.products[0].slug}))
+
+    def test_async_category_products(self):
+        # category + COUNT + products + properties
+        url = reverse('catalog:async-category-products', kwargs={'slug': self.category.slug})
+        self.assertBudgetAtAnyPageSize(4, url)
+
+    def test_stats_routes(self):
+        self.assertBudget(0, reverse('catalog:cache-stats'))
+        self.assertBudget(2, reverse('catalog:catalog-stats'))
+        # Cached until the next catalog write
+        self.assertBudget(0, reverse('catalog:catalog-stats'))
+
+    def test_operational_routes(self):
+        # Staff-only routes answer the allowlisted test client without touching the database
+        self.assertBudget(0, reverse('catalog:health-live'))
+        self.assertBudget(1, reverse('catalog:health-ready'))
+        self.assertBudget(0, reverse('catalog:db-stats'))
+        self.assertBudget(0, reverse('catalog:metrics'))
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class AsyncReadPathTest(APITestCase):
+    """The async views must return byte-for-byte what the sync viewsets return"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Async Category")
+        self.other = Category.objects.create(name="Other Category")
+        self.products = []
+        for i in range(15):
+            product = Product.objects.create(
+                name=f"Async Product {i}",
+                description="Served without blocking",
+                price=Decimal("10.00") + i,
+                category=self.category if i % 3 else self.other,
+                is_published=True
+            )
+            ProductProperty.objects.create(product=product, key="Color", value="Black" if i % 2 else "White")
+            ProductImage.objects.create(product=product, alt_text="Front", is_primary=True)
+            self.products.append(product)
+
+    def assertSameResponse(self, sync_url, async_url, params=None):
+        expected = self.client.get(sync_url, params, HTTP_ACCEPT='application/json')
+        response = self.client.get(async_url, params, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response['Content-Type'], expected['Content-Type'])
+        # Pagination links point back at the async routes
+        self.assertEqual(response.content.replace(b'/api/async/', b'/api/'), expected.content)
+        return response
+
+    def test_product_list_parity(self):
+        """Test list pages, filters, ordering, cursor pagination and search"""
+        sync_url, async_url = reverse('catalog:product-list'), reverse('catalog:async-product-list')
+        for params in (
+            {},
+            {'page': 2},
+            {'category': self.category.slug, 'ordering': 'price'},
+            {'prop': 'Color:Black', 'min_price': '12'},
+            {'pagination': 'cursor', 'ordering': '-price'},
+            {'q': 'async'},
+            {'page': 9},
+            {'min_price': 'cheap'},
+        ):
+            with self.subTest(params=params):
+                self.assertSameResponse(sync_url, async_url, params)
+
+        next_page = self.client.get(async_url, {'pagination': 'cursor'}).json()['next']
+        self.assertIn(async_url, next_page)
+        self.assertSameResponse(next_page.replace('/api/async/', '/api/'), next_page)
+
+    def test_product_detail_parity(self):
+        """Test product detail and missing products"""
+        for slug in (self.products[0].slug, 'missing'):
+            with self.subTest(slug=slug):
+                self.assertSameResponse(
+                    reverse('catalog:product-detail', kwargs={'slug': slug}),
+                    reverse('catalog:async-product-detail', kwargs={'slug': slug}),
+                )
+
+    def test_category_products_parity(self):
+        """Test category products, with filters and for missing categories"""
+        for slug, params in ((self.category.slug, {}), (self.category.slug, {'ordering': '-price'}), ('missing', {})):
+            with self.subTest(slug=slug, params=params):
+                self.assertSameResponse(
+                    reverse('catalog:category-products', kwargs={'slug': slug}),
+                    reverse('catalog:async-category-products', kwargs={'slug': slug}),
+                    params,
+                )
+
+    def test_query_budget(self):
+        """Test that the async path runs the same queries as the sync one"""
+        with self.assertNumQueries(3):
+            self.client.get(reverse('catalog:async-product-list'))
+        with self.assertNumQueries(3):
+            self.client.get(reverse('catalog:async-product-detail', kwargs={'slug': self.products[0].slug}))
+        with self.assertNumQueries(4):
+            self.client.get(reverse('catalog:async-category-products', kwargs={'slug': self.category.slug}))
+
+    @override_settings(CATALOG_CACHE_ENABLED=True, CATALOG_CACHE_SHARED=True)
+    def test_response_cache_and_conditional_get(self):
+        """Test that the async views share the catalog cache and validators"""
+        url = reverse('catalog:async-product-list')
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class FastSerializerParityTest(APITestCase):
+    """The .values() serialization path must render exactly what ProductListSerializer renders"""
+
+    def setUp(self):
+        self.phones = Category.objects.create(name="Phones", description="Smart & \"dumb\" phones")
+        self.empty = Category.objects.create(name="Ünïcode ✓")
+        self.products = [
+            Product.objects.create(
+                name="Plain", description="No extras", price=Decimal("0.5"), category=self.phones, is_published=True
+            ),
+            Product.objects.create(
+                name="Fancy “quoted” ✓", description="Everything", price=Decimal("1234567.89"),
+                category=self.empty, is_published=True, stock_quantity=3
+            ),
+            Product.objects.create(
+                name="Imageless", description="Properties only", price=Decimal("10"), category=self.phones,
+                is_published=True
+            ),
+        ]
+        fancy = self.products[1]
+        ProductProperty.objects.create(product=fancy, key="Color", value="Black", order=2)
+        ProductProperty.objects.create(product=fancy, key="Brand", value="Ünï", order=1)
+        ProductProperty.objects.create(product=self.products[2], key="Size", value="M", order=1)
+        ProductImage.objects.create(product=fancy, image='products/fancy.jpg', alt_text="Front", is_primary=True)
+        ProductImage.objects.filter(product=fancy).update(
+            variants={'webp': {'320': 'products/fancy.320w.webp', '1024': 'products/fancy.1024w.webp'}}
+        )
+        ProductImage.objects.create(product=self.products[0], alt_text="No file", is_primary=True)
+        ProductListing.refresh(fancy.pk)
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_rows_render_identically(self):
+        """Test the fast path against the DRF serializer on the same products"""
+        queryset = Product.objects.published().for_api().order_by('pk')
+        expected = self.render(ProductListSerializer(queryset, many=True).data)
+        rows = fast_serializers.product_list_rows(queryset)
+        self.assertEqual(self.render(fast_serializers.serialize_product_rows(rows)), expected)
+
+    def test_empty_page(self):
+        self.assertEqual(fast_serializers.serialize_product_rows(Product.objects.none().values()), [])
+
+    def test_endpoints_render_identically(self):
+        """Test list, category products, search and cursor pages from serializers, rows and listings"""
+        requests = [
+            (reverse('catalog:product-list'), {}),
+            (reverse('catalog:product-list'), {'ordering': 'price', 'prop': 'Color:Black'}),
+            (reverse('catalog:product-list'), {'pagination': 'cursor', 'ordering': 'price'}),
+            (reverse('catalog:category-products', kwargs={'slug': self.phones.slug}), {}),
+            (reverse('catalog:category-products', kwargs={'slug': self.phones.slug}), {'pagination': 'cursor'}),
+            (reverse('catalog:product-search'), {'q': 'everything'}),
+        ]
+        for url, params in requests:
+            with self.subTest(url=url, params=params):
+                with self.settings(CATALOG_CACHE_ENABLED=False, CATALOG_LISTING_READS=False,
+                                   CATALOG_FAST_SERIALIZERS=False):
+                    expected = self.client.get(url, params, HTTP_ACCEPT='application/json')
+                for listing_reads in (False, True):
+                    with self.settings(CATALOG_CACHE_ENABLED=False, CATALOG_LISTING_READS=listing_reads,
+                                       CATALOG_FAST_SERIALIZERS=True):
+                        response = self.client.get(url, params, HTTP_ACCEPT='application/json')
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertEqual(response.content, expected.content)
+
+    @override_settings(CATALOG_CACHE_ENABLED=False)
+    def test_cursor_walk_from_rows(self):
+        """Test that cursors built from rows walk the same pages as cursors built from models"""
+        def walk():
+            pages = []
+            url, params = reverse('catalog:product-list'), {'pagination': 'cursor', 'ordering': '-price'}
+            while url:
+                response = self.client.get(url, params, HTTP_ACCEPT='application/json')
+                pages.append(response.content)
+                url, params = response.json()['next'], None
+            return pages
+
+        with mock.patch.object(KeysetPagination, 'page_size', 1):
+            with self.settings(CATALOG_LISTING_READS=False, CATALOG_FAST_SERIALIZERS=False):
+                expected = walk()
+            self.assertEqual(walk(), expected)
+        self.assertEqual(len(expected), 3)
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class ProductListingTest(APITestCase):
+    """The ProductListing read model must follow every write that changes a list response"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Laptops", description="Portable")
+        self.product = Product.objects.create(
+            name="Notebook", description="Thin", price=Decimal("999.00"), category=self.category, is_published=True
+        )
+        ProductProperty.objects.create(product=self.product, key="Color", value="Silver", order=1)
+
+    def assertListingMatches(self, product):
+        """The stored row renders exactly what ProductListSerializer renders for `product`"""
+        expected = ProductListSerializer(Product.objects.for_api().get(pk=product.pk)).data
+        rows = fast_serializers.listing_rows(ProductListing.objects.filter(pk=product.pk))
+        self.assertEqual(
+            JSONRenderer().render(fast_serializers.serialize_listing_rows(rows)), JSONRenderer().render([expected])
+        )
+
+    def test_product_and_property_changes(self):
+        self.assertListingMatches(self.product)
+        self.product.name = "Notebook Pro"
+        self.product.save()
+        self.assertListingMatches(self.product)
+        self.product.properties.get().delete()
+        self.assertListingMatches(self.product)
+
+    def test_image_changes(self):
+        front = ProductImage.objects.create(product=self.product, alt_text="Front", is_primary=True)
+        self.assertListingMatches(self.product)
+        self.assertEqual(ProductListing.objects.get(pk=self.product.pk).primary_image[3], "Front")
+        back = ProductImage.objects.create(product=self.product, alt_text="Back", is_primary=True)
+        self.assertEqual(ProductListing.objects.get(pk=self.product.pk).primary_image[0], back.pk)
+        back.delete()
+        self.assertIsNone(ProductListing.objects.get(pk=self.product.pk).primary_image)
+        front.delete()
+        self.assertListingMatches(self.product)
+
+    def test_category_changes(self):
+        self.category.name = "Notebooks"
+        self.category.save()
+        Product.objects.create(
+            name="Netbook", description="Small", price=Decimal("199.00"), category=self.category, is_published=True
+        )
+        self.assertListingMatches(self.product)
+        listing = ProductListing.objects.get(pk=self.product.pk)
+        self.assertEqual((listing.category_name, listing.category_products_count), ("Notebooks", 2))
+
+    def test_unpublish_and_delete(self):
+        self.product.is_published = False
+        self.product.save()
+        self.assertFalse(ProductListing.objects.filter(pk=self.product.pk).exists())
+        self.product.is_published = True
+        self.product.save()
+        self.assertTrue(ProductListing.objects.filter(pk=self.product.pk).exists())
+        self.product.delete()
+        self.assertFalse(ProductListing.objects.exists())
+
+    def test_filters_match_product_filter(self):
+        url = reverse('catalog:product-list')
+        for params in ({'category': 'laptops'}, {'category_id': self.category.pk}, {'name': 'note'},
+                       {'prop': 'Color:Silver'}, {'max_price': '10'}):
+            with self.subTest(params=params):
+                with self.settings(CATALOG_LISTING_READS=False):
+                    expected = self.client.get(url, params, HTTP_ACCEPT='application/json')
+                response = self.client.get(url, params, HTTP_ACCEPT='application/json')
+                self.assertEqual(response.content, expected.content)
+
+    def test_invalid_filter(self):
+        response = self.client.get(reverse('catalog:product-list'), {'min_price': 'cheap'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_price', response.data)
+
+    def test_rebuild_command(self):
+        ProductListing.objects.all().delete()
+        Product.objects.filter(pk=self.product.pk).update(name="Renamed")
+        out = StringIO()
+        call_command('rebuild_listings', '--batch-size', '1', stdout=out)
+        self.assertIn('Rebuilt listings for 1 products', out.getvalue())
+        self.assertEqual(ProductListing.objects.get().name, "Renamed")
+
+
+class FastJSONRendererTest(TestCase):
+    """FastJSONRenderer must write the same bytes as DRF's JSONRenderer"""
+
+    def setUp(self):
+        self.payloads = [
+            {'count': 2, 'next': None, 'results': [{'id': 1, 'price': '10.50', 'ok': True}]},
+            ['ünïcode ✓', 'quote " backslash \\ slash /', 'control \x1f', 'separators    '],
+            {'price': Decimal('19.99'), 'whole': Decimal('20')},
+            {
+                'utc': datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=dt_timezone.utc),
+                'offset': datetime(2024, 5, 6, 7, 8, 9, tzinfo=dt_timezone(timedelta(hours=-5))),
+                'naive': datetime(2024, 5, 6, 7, 8, 9),
+                'date': date(2024, 5, 6),
+                'time': time(7, 8, 9, 10),
+            },
+            {'uuid': uuid.UUID(int=1), 'lazy': gettext_lazy('Invalid page.'), 'duration': timedelta(minutes=1)},
+            {'big': 2 ** 70, 'negative': -1, 'float': 0.25, 'nested': [[], {}, [None]]},
+            ReturnDict({'a': 1}, serializer=None),
+        ]
+
+    def test_same_bytes_as_json_renderer(self):
+        for payload in self.payloads:
+            with self.subTest(payload=payload):
+                self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_indent_and_none(self):
+        """Test that indented output and empty bodies match too"""
+        context = {'indent': 4}
+        payload = self.payloads[0]
+        self.assertEqual(
+            FastJSONRenderer().render(payload, 'application/json', context),
+            JSONRenderer().render(payload, 'application/json', context)
+        )
+        self.assertEqual(
+            FastJSONRenderer().render(payload, 'application/json; indent=2'),
+            JSONRenderer().render(payload, 'application/json; indent=2')
+        )
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_stdlib_fallback(self):
+        """Test that the renderer still works when orjson is not installed"""
+        with mock.patch('catalog.renderers.orjson', None):
+            for payload in self.payloads:
+                self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_configured_for_api(self):
+        """Test that API responses go through the configured renderer"""
+        response = self.client.get(reverse('catalog:health-live'), HTTP_ACCEPT='application/json')
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.content, b'{"status":"alive"}')
+
+
+@skipUnless('replica' in settings.DATABASES, 'needs the replica database from shopcore.settings_test')
+@override_settings(CATALOG_READ_REPLICAS=['replica'], CATALOG_CACHE_ENABLED=False)
+class ReplicaRouterTest(TransactionTestCase):
+    """The `replica` SQLite database stands in for a read replica that has not caught up"""
+    # Not {'default', 'replica'}: the runner would look the alias up even though the class is skipped
+    databases = '__all__'
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Primary Name", slug="routed")
+        # The same row as it looked before the rename reached the replica
+        Category.objects.using('replica').create(pk=self.category.pk, name="Replica Name", slug="routed")
+        routers.start_scope()
+
+    def test_reads_use_replica_and_writes_use_primary(self):
+        category = Category.objects.get(pk=self.category.pk)
+        self.assertEqual(category.name, "Replica Name")
+        self.assertEqual(category._state.db, 'replica')
+
+        category.description = "Edited"
+        category.save()
+        self.assertEqual(Category.objects.using('default').get(pk=category.pk).description, "Edited")
+        self.assertEqual(Category.objects.using('replica').get(pk=category.pk).description, "")
+        # Read-your-writes for the rest of the scope
+        reread = Category.objects.get(pk=category.pk)
+        self.assertEqual((reread._state.db, reread.description), ('default', "Edited"))
+
+    def test_tasks_read_from_primary(self):
+        """Test that a worker thread runs tasks against the primary without staying pinned"""
+        product = Product.objects.create(
+            name="Routed Product", description="Routed", price=Decimal("1.00"), category=self.category,
+            is_published=True
+        )
+        ProductProperty.objects.create(product=product, key='Color', value='Black')
+        results = {}
+
+        def work():
+            try:
+                results['run'] = tasks.run_pending()
+                results['pinned'] = routers.is_pinned()
+            finally:
+                db_connections.close_all()
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        self.assertGreater(results['run'], 0)
+        self.assertFalse(results['pinned'])
+        self.assertEqual(ProductFacet.objects.get(category=self.category, key='Color').product_count, 1)
+
+    def test_writes_outside_a_scope_do_not_pin(self):
+        """Test that a thread writing outside any scope is not pinned to the primary for good"""
+        results = {}
+
+        def work():
+            try:
+                Category.objects.create(name="Unscoped", slug="unscoped")
+                results['pinned'] = routers.is_pinned()
+            finally:
+                db_connections.close_all()
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        self.assertFalse(results['pinned'])
+
+    def test_transactions_read_from_primary(self):
+        with transaction.atomic():
+            self.assertEqual(Category.objects.get(pk=self.category.pk).name, "Primary Name")
+
+    def test_other_models_are_not_routed(self):
+        self.assertIsNone(routers.CatalogReplicaRouter().db_for_read(Task))
+        with self.settings(CATALOG_READ_REPLICAS=[]):
+            self.assertIsNone(routers.CatalogReplicaRouter().db_for_read(Category))
+
+    def test_api_reads_from_replica(self):
+        response = self.client.get(reverse('catalog:category-detail', kwargs={'slug': 'routed'}))
+        self.assertEqual(response.data['name'], "Replica Name")
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    @override_settings(CATALOG_CACHE_ENABLED=True, CATALOG_CACHE_SHARED=True)
+    def test_responses_read_during_replication_lag_are_not_cached(self):
+        url = reverse('catalog:category-list')
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        later = cache.get_catalog_modified() + routers.get_pin_seconds() + 1
+        with mock.patch('catalog.routers.time.time', return_value=later):
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_admin_save_pins_editor_to_primary(self):
+        """Test that an editor sees their change right after saving it in the admin"""
+        User.objects.create_superuser('editor', 'editor@example.com', 'secret')
+        self.client.login(username='editor', password='secret')
+        url = reverse('catalog:category-detail', kwargs={'slug': 'routed'})
+        response = self.client.post(
+            reverse('admin:catalog_category_change', args=[self.category.pk]),
+            {'name': "Renamed", 'slug': 'routed', 'description': ''}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.client.get(url).data['name'], "Renamed")
+
+        # Once the pin expires reads go back to the (stale) replica
+        self.client.cookies.pop(routers.PIN_COOKIE)
+        self.assertEqual(self.client.get(url).data['name'], "Replica Name")
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class RequestMetricsTest(APITestCase):
+    def setUp(self):
+        metrics.reset_metrics()
+        self.addCleanup(metrics.reset_metrics)
+        category = Category.objects.create(name="Metrics Category")
+        self.product = Product.objects.create(
+            name="Metrics Product", description="Measured", price=Decimal("10.00"), category=category,
+            is_published=True
+        )
+
+    def server_timing(self, response):
+        return dict(
+            (part.split(';')[0], part.split(';', 1)[1]) for part in response['Server-Timing'].split(', ')
+        )
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('catalog:product-list'))
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'db', 'serialize', 'render', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+        self.assertRegex(timing['total'], r'^dur=\d+\.\d$')
+
+    def test_async_views_count_queries(self):
+        response = self.client.get(
+            reverse('catalog:async-product-detail', kwargs={'slug': self.product.slug})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('desc="3 queries"', self.server_timing(response)['db'])
+
+    def test_log_line(self):
+        with self.assertLogs('catalog.metrics', 'INFO') as logs:
+            self.client.get(reverse('catalog:product-detail', kwargs={'slug': self.product.slug}))
+        self.assertRegex(
+            logs.output[0], r'method=GET route=catalog:product-detail status=200 duration_ms=[\d.]+ queries=3 '
+        )
+        self.assertEqual(logs.records[0].metrics['queries'], 3)
+
+    def test_prometheus_histograms(self):
+        for _ in range(2):
+            self.client.get(reverse('catalog:product-detail', kwargs={'slug': self.product.slug}))
+        self.client.get('/api/no-such-route/')
+        response = self.client.get(reverse('catalog:metrics'))
+        self.assertEqual(response['Content-Type'], metrics.PROMETHEUS_CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn('# TYPE catalog_request_duration_seconds histogram', body)
+        labels = 'route="catalog:product-detail",method="GET",status="200"'
+        self.assertIn(f'catalog_request_duration_seconds_count{{{labels}}} 2', body)
+        self.assertIn(f'catalog_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', body)
+        self.assertIn('catalog_db_queries_bucket{route="catalog:product-detail",le="3"} 2', body)
+        self.assertIn('catalog_db_queries_bucket{route="catalog:product-detail",le="2"} 0', body)
+        self.assertIn('catalog_db_queries_sum{route="catalog:product-detail"} 6', body)
+        self.assertIn('route="unmatched",method="GET",status="404"', body)
+
+    def test_label_escaping(self):
+        histogram = metrics.Histogram('test_seconds', 'Test.', ('route',), (1,))
+        histogram.observe(('a"b\\c',), 0.5)
+        self.assertIn('test_seconds_bucket{route="a\\"b\\\\c",le="1"} 1', histogram.expose())
+
+    @override_settings(CATALOG_SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('catalog:product-list')))
+
+    @override_settings(CATALOG_METRICS_ALLOWED_IPS=['10.0.0.9'])
+    def test_metrics_are_restricted(self):
+        """Test that only staff users and allowed addresses can read the histograms"""
+        url = reverse('catalog:metrics')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.9').status_code, status.HTTP_200_OK)
+        self.client.force_login(User.objects.create_user('ops', password='pw', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+
+class BenchmarkSuiteTest(TestCase):
+    def setUp(self):
+        out = StringIO()
+        call_command('generate_catalog', '--products', '40', '--categories', '3', '--batch-size', '15', stdout=out)
+        self.assertIn('Generated 40 products in 3 categories', out.getvalue())
+
+    def test_generated_catalog(self):
+        published = Product.objects.published()
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(ProductListing.objects.count(), published.count())
+        self.assertEqual(
+            sum(Category.objects.values_list('published_products_count', flat=True)), published.count()
+        )
+        self.assertTrue(ProductFacet.objects.exists())
+        self.assertGreater(len(set(Product.objects.values_list('created_at', flat=True))), 1)
+        # Listings match what the serializer renders for the generated rows
+        product = published.exclude(primary_image=None).first()
+        listing = fast_serializers.serialize_listing_rows(
+            fast_serializers.listing_rows(ProductListing.objects.filter(pk=product.pk))
+        )
+        self.assertEqual(listing, [ProductListSerializer(Product.objects.for_api().get(pk=product.pk)).data])
+
+    def test_same_seed_same_catalog(self):
+        def snapshot(prefix):
+            return list(Product.objects.filter(slug__startswith=prefix).order_by('pk').values_list(
+                'name', 'price', 'is_published'
+            ))
+
+        call_command('generate_catalog', '--products', '40', '--categories', '3', '--prefix', 'again',
+                     stdout=StringIO())
+        self.assertEqual(snapshot('again-'), snapshot('synthetic-'))
+        with self.assertRaises(CommandError):
+            call_command('generate_catalog', '--products', '5', stdout=StringIO())
+        call_command('generate_catalog', '--products', '0', '--clear', '--prefix', 'again', stdout=StringIO())
+        self.assertFalse(Product.objects.filter(slug__startswith='again-').exists())
+
+    def test_benchmark_and_baseline(self):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        args = ['benchmark_api', '--requests', '2', '--warmup', '0']
+        out = StringIO()
+        call_command(*args, '--save-baseline', path, stdout=out)
+        with open(path) as f:
+            results = json.load(f)['results']
+        self.assertEqual(set(results), {name for name, _ in benchmark.SCENARIOS})
+        self.assertEqual(results['products']['queries'], 2)
+        self.assertEqual(sum(result['errors'] for result in results.values()), 0)
+        self.assertIn('p95 ms', out.getvalue())
+
+        out = StringIO()
+        call_command(*args, '--only', 'products', '--baseline', path, '--tolerance', '1000', stdout=out)
+        self.assertIn('No regressions against the baseline', out.getvalue())
+
+        results['products']['queries'] = 1
+        with open(path, 'w') as f:
+            json.dump({'results': results}, f)
+        with self.assertRaisesMessage(CommandError, 'products: 2 queries per request vs 1'):
+            call_command(*args, '--only', 'products', '--baseline', path, '--tolerance', '1000', stdout=StringIO())
+
+    def test_summarize(self):
+        samples = [(ms / 1000, 2, 200) for ms in range(1, 101)]
+        summary = benchmark.summarize(samples + [(0.5, 3, 500)])
+        self.assertEqual((summary['requests'], summary['queries'], summary['errors']), (101, 3, 1))
+        self.assertEqual(benchmark.summarize(samples)['p50_ms'], 50.5)
+        self.assertEqual(benchmark.summarize(samples[:1])['p99_ms'], 1.0)
+
+
+class ExplainCatalogCommandTest(TestCase):
+    def test_canonical_queries_use_indexes(self):
+        """Test that no canonical catalog query scans the product table sequentially"""
+        category = Category.objects.create(name="Explained")
+        Product.objects.create(
+            name="Explained Product",
+            description="Explained product",
+            price=Decimal("1.00"),
+            category=category,
+            is_published=True
+        )
+        out = StringIO()
+        call_command('explain_catalog', '--fail-on-seq-scan', stdout=out)
+        self.assertIn('No sequential scans', out.getvalue())
+        self.assertIn('[ok] listing product list ?category= cursor ordering=price', out.getvalue())
+        self.assertIn('[ok] listing category products ordering=-created_at', out.getvalue())
+
+
+class ImportCatalogCommandTest(TestCase):
+    def write_feed(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w', encoding='utf-8') as feed:
+            feed.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def run_import(self, path, *args):
+        out = StringIO()
+        call_command('import_catalog', path, *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_jsonl_import_and_upsert(self):
+        """Test that JSONL feeds create and then update rows in place"""
+        records = [
+            {'name': f'Feed Phone {i}', 'description': 'From the feed', 'price': '100.00',
+             'category': 'Phones', 'is_published': True, 'stock_quantity': 3,
+             'properties': {'Color': 'Black', 'Storage': '128GB'}}
+            for i in range(5)
+        ]
+        path = self.write_feed('.jsonl', '\n'.join(json.dumps(record) for record in records) + '\nnot json\n')
+        output = self.run_import(path, '--batch-size', '2')
+        self.assertIn('Imported 5 products', output)
+        self.assertIn('skipped 1 invalid rows', output)
+        self.assertEqual(Product.objects.count(), 5)
+        self.assertEqual(ProductProperty.objects.count(), 10)
+
+        records[0].update(price='80.00', category='Refurbished', properties={'Color': 'White'})
+        path = self.write_feed('.jsonl', json.dumps(records[0]))
+        self.run_import(path)
+        product = Product.objects.get(slug='feed-phone-0')
+        self.assertEqual(product.price, Decimal('80.00'))
+        self.assertEqual(product.properties.get(key='Color').value, 'White')
+
+        # Denormalized aggregates and the search index follow the import
+        phones = Category.objects.get(name='Phones')
+        self.assertEqual(phones.published_products_count, 4)
+        self.assertEqual(
+            ProductFacet.objects.get(category=phones, key='Color', value='Black').product_count, 4
+        )
+        self.assertEqual(Category.objects.get(name='Refurbished').published_products_count, 1)
+        response = self.client.get(reverse('catalog:product-search'), {'q': 'white'})
+        self.assertEqual([item['slug'] for item in response.data['results']], ['feed-phone-0'])
+
+    def test_reimport_removes_dropped_properties(self):
+        """Test that properties missing from a re-imported record leave facets, listings and search"""
+        record = {'name': 'Feed Laptop', 'price': '900.00', 'category': 'Laptops', 'is_published': True,
+                  'properties': {'Color': 'Silver', 'Storage': '512GB'}}
+        self.run_import(self.write_feed('.jsonl', json.dumps(record)))
+        record['properties'] = {'Color': 'Silver'}
+        self.run_import(self.write_feed('.jsonl', json.dumps(record)))
+
+        product = Product.objects.get(slug='feed-laptop')
+        self.assertEqual(list(product.properties.values_list('key', flat=True)), ['Color'])
+        self.assertEqual([key for _, key, _, _ in ProductListing.objects.get(pk=product.pk).properties], ['Color'])
+        self.assertFalse(ProductFacet.objects.filter(key='Storage').exists())
+        response = self.client.get(reverse('catalog:product-search'), {'q': '512GB'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_progress_with_no_elapsed_time(self):
+        """Test that a batch finishing within the clock resolution does not divide by zero"""
+        path = self.write_feed('.jsonl', json.dumps({'name': 'Feed Pen', 'price': '1.00', 'category': 'Office'}))
+        with mock.patch('catalog.management.commands.import_catalog.time.monotonic', return_value=100.0):
+            output = self.run_import(path)
+        self.assertIn('Imported 1 products (0 rows/s)', output)
+
+    def test_csv_import(self):
+        """Test that CSV feeds read property.<Key> columns"""
+        path = self.write_feed('.csv', (
+            'name,slug,description,price,category,is_published,stock_quantity,property.Color\n'
+            'Feed Shirt,feed-shirt,Cotton shirt,20.00,Clothing,true,5,Blue\n'
+            'Broken Row,,,not-a-price,Clothing,true,1,\n'
+        ))
+        output = self.run_import(path)
+        self.assertIn('skipped 1 invalid rows', output)
+        product = Product.objects.get(slug='feed-shirt')
+        self.assertTrue(product.is_published)
+        self.assertEqual(product.properties.get().value, 'Blue')
+
+    def test_category_names_with_clashing_slugs(self):
+        """Test that category names slugifying alike get distinct slugs instead of aborting the import"""
+        Category.objects.create(name='Phones Tablets', slug='phones-tablets')
+        records = [
+            {'name': 'Feed Tablet', 'price': '10.00', 'category': 'Phones & Tablets'},
+            {'name': 'Feed Phone', 'price': '10.00', 'category': 'Phones Tablets'},
+            {'name': 'Feed Pad', 'price': '10.00', 'category': 'Phones - Tablets'},
+        ]
+        path = self.write_feed('.jsonl', '\n'.join(json.dumps(record) for record in records))
+        output = self.run_import(path)
+        self.assertIn('Imported 3 products', output)
+        self.assertEqual(
+            dict(Category.objects.filter(name__startswith='Phones').values_list('name', 'slug')),
+            {'Phones Tablets': 'phones-tablets', 'Phones & Tablets': 'phones-tablets-2',
+             'Phones - Tablets': 'phones-tablets-3'}
+        )
+        self.assertEqual(Product.objects.get(slug='feed-tablet').category.name, 'Phones & Tablets')
+
+
+class CatalogExportTest(APITestCase):
+    def setUp(self):
+        # Export throttle history lives in the default cache
+        django_caches['default'].clear()
+        self.category = Category.objects.create(name="Export Category")
+        for i in range(5):
+            product = Product.objects.create(
+                name=f"Export Product {i}",
+                description="Exported",
+                price=Decimal("10.00") + i,
+                category=self.category,
+                is_published=True
+            )
+            ProductProperty.objects.create(product=product, key="Color", value="Black")
+            ProductImage.objects.create(product=product, image=f"products/export-{i}.jpg", is_primary=True)
+        Product.objects.create(
+            name="Hidden Product", description="Draft", price=Decimal("1.00"), category=self.category
+        )
+
+    def test_ndjson_endpoint_streams_published_products(self):
+        """Test that the NDJSON export streams every published product in a bounded number of queries"""
+        url = reverse('catalog:product-export')
+        # products + properties + images per chunk of 1000
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['name'] for record in records], [f"Export Product {i}" for i in range(5)])
+        self.assertEqual(records[0]['properties'], {'Color': 'Black'})
+        self.assertEqual(records[0]['image'], 'http://testserver/media/products/export-0.jpg')
+
+    def test_csv_endpoint_honours_filters(self):
+        """Test that the CSV export has property columns and applies product filters"""
+        response = self.client.get(reverse('catalog:product-export'), {'output': 'csv', 'min_price': '13'})
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(rows[0].endswith('property.Color'))
+        self.assertEqual(len(rows), 3)
+
+    def test_invalid_output(self):
+        response = self.client.get(reverse('catalog:product-export'), {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_endpoint_is_throttled(self):
+        """Test that each client gets a limited number of exports"""
+        url = reverse('catalog:product-export')
+        with mock.patch.dict(ScopedRateThrottle.THROTTLE_RATES, {'export': '2/hour'}):
+            for _ in range(2):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            # Other endpoints are not affected
+            self.assertEqual(self.client.get(reverse('catalog:product-list')).status_code, status.HTTP_200_OK)
+
+    def test_command_round_trips_through_import(self):
+        """Test that the exported file can be re-imported"""
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command('export_catalog', '--output', path, '--chunk-size', '2', stdout=StringIO())
+        with open(path, encoding='utf-8') as exported:
+            self.assertEqual(len(exported.readlines()), 5)
+
+        Product.objects.filter(is_published=True).update(price=Decimal("0.01"))
+        call_command('import_catalog', path, stdout=StringIO())
+        self.assertEqual(Product.objects.get(slug='export-product-4').price, Decimal("14.00"))
+
+
+class MediaServingTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media_root.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        os.makedirs(os.path.join(media_root.name, 'products'))
+        with open(os.path.join(media_root.name, 'products', 'photo.jpg'), 'wb') as f:
+            f.write(bytes(range(256)) * 4)
+        self.url = '/media/products/photo.jpg'
+
+    def test_full_file_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(256)) * 4)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        self.assertTrue(response['ETag'] and response['Last-Modified'])
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.url)
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MATCH='"stale"').status_code, 412)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-6')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(250, 256)))
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2048-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+        # Malformed and multi-range headers get the whole file
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6').status_code, 200)
+
+    def test_if_range(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"').status_code, 200)
+
+    def test_media_is_not_gzipped(self):
+        """Test that compression leaves range responses and their strong ETag intact"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-999', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 206)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content), (bytes(range(256)) * 4)[:1000])
+        resumed = self.client.get(
+            self.url, HTTP_RANGE='bytes=1000-', HTTP_IF_RANGE=response['ETag'], HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(resumed.status_code, 206)
+
+    def test_missing_and_outside_files(self):
+        self.assertEqual(self.client.get('/media/products/missing.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/products/').status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+
+class ImageVariantTest(APITestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media_root.name, CATALOG_IMAGE_WIDTHS=(320, 640))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.media_root = media_root.name
+
+        self.category = Category.objects.create(name="Image Category")
+        self.product = Product.objects.create(
+            name="Image Product",
+            description="Product with photos",
+            price=Decimal("10.00"),
+            category=self.category,
+            is_published=True
+        )
+
+    def create_image(self, **kwargs):
+        # Variants are generated by the task worker, not inside save()
+        image = ProductImage.objects.create(product=self.product, **kwargs)
+        self.assertEqual(image.variants, {})
+        tasks.run_pending()
+        image.refresh_from_db()
+        return image
+
+    def upload(self, name, size=(800, 600), mode='RGB'):
+        buffer = BytesIO()
+        Image.new(mode, size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_variants_generated_on_upload(self):
+        """Test that an upload gets WebP and JPEG variants written next to it"""
+        image = self.create_image(image=self.upload('photo.png', mode='RGBA'))
+        self.assertEqual(image.variants['webp'], {
+            '320': 'products/photo.320w.webp', '640': 'products/photo.640w.webp'
+        })
+        with Image.open(os.path.join(self.media_root, 'products', 'photo.320w.jpg')) as variant:
+            self.assertEqual((variant.format, variant.size), ('JPEG', (320, 240)))
+
+    def test_no_upscaling(self):
+        """Test that widths above the original are skipped"""
+        image = self.create_image(image=self.upload('small.png', size=(400, 300)))
+        self.assertEqual(list(image.variants['jpeg']), ['320'])
+
+    def test_serializers_expose_srcsets(self):
+        """Test that list and detail payloads include srcset strings"""
+        self.create_image(image=self.upload('shot.png'), is_primary=True)
+        detail = self.client.get(reverse('catalog:product-detail', kwargs={'slug': self.product.slug}))
+        self.assertEqual(
+            detail.data['images'][0]['variants']['webp'],
+            'http://testserver/media/products/shot.320w.webp 320w, http://testserver/media/products/shot.640w.webp 640w'
+        )
+        listing = self.client.get(reverse('catalog:product-list'))
+        self.assertIn('/media/products/shot.320w.jpg 320w', listing.data['results'][0]['primary_image']['variants']['jpeg'])
+
+    def test_backfill_command(self):
+        """Test that the backfill command processes images without variants in a process pool"""
+        images = [
+            ProductImage.objects.create(product=self.product, image=self.upload(f'old-{i}.png'))
+            for i in range(3)
+        ]
+        ProductImage.objects.update(variants={})
+        broken = ProductImage.objects.create(product=self.product, image='products/missing.png')
+
+        out = StringIO()
+        call_command('generate_image_variants', '--workers', '2', '--batch-size', '2', stdout=out, stderr=StringIO())
+        self.assertIn('Generated variants for 3 images', out.getvalue())
+        self.assertIn('1 failed', out.getvalue())
+        for image in images:
+            image.refresh_from_db()
+            self.assertEqual(set(image.variants), {'webp', 'jpeg'})
+        broken.refresh_from_db()
+        self.assertEqual(broken.variants, {})
+
+    @override_settings(CATALOG_CACHE_ENABLED=False)
+    def test_backfill_refreshes_listings(self):
+        """Test that list responses show the srcsets written by the backfill command"""
+        ProductImage.objects.create(product=self.product, image=self.upload('backfilled.png'), is_primary=True)
+        Task.objects.all().delete()
+        call_command('generate_image_variants', '--workers', '0', stdout=StringIO(), stderr=StringIO())
+        listing = self.client.get(reverse('catalog:product-list'))
+        self.assertIn(
+            '/media/products/backfilled.320w.webp 320w', listing.data['results'][0]['primary_image']['variants']['webp']
+        )
+
+    def test_unreadable_image_task_is_retried(self):
+        """Test that the variant task fails on a missing file instead of recording success"""
+        image = ProductImage.objects.create(product=self.product, image='products/missing.png')
+        tasks.run_pending()
+        queued = Task.objects.get(name='catalog.refresh_image_variants', kwargs={'image_id': image.pk})
+        self.assertEqual((queued.status, queued.attempts), (Task.PENDING, 1))
+        self.assertIn('FileNotFoundError', queued.last_error)
+
+
+@override_settings(CATALOG_TASKS_RETRY_DELAY=0)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        self.calls = []
+        tasks.task('tests.record')(lambda value, fail_times=0: self.record(value, fail_times))
+        self.addCleanup(tasks.REGISTRY.pop, 'tests.record')
+
+    def record(self, value, fail_times=0):
+        self.calls.append(value)
+        if self.calls.count(value) <= fail_times:
+            raise RuntimeError('boom')
+
+    def test_enqueue_and_run(self):
+        """Test that queued tasks run once and are removed"""
+        tasks.enqueue('tests.record', value='a')
+        tasks.enqueue('tests.record', value='b')
+        self.assertEqual(tasks.run_pending(), 2)
+        self.assertEqual(self.calls, ['a', 'b'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_unique_key_coalesces_pending_tasks(self):
+        """Test that pending tasks with the same key are queued once"""
+        for _ in range(3):
+            tasks.enqueue('tests.record', unique_key='same', value='a')
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_retries_then_fails(self):
+        """Test that failing tasks are retried up to max_attempts"""
+        tasks.enqueue('tests.record', value='flaky', fail_times=1)
+        tasks.enqueue('tests.record', value='broken', fail_times=5)
+        tasks.run_pending()
+        self.assertEqual(self.calls.count('flaky'), 2)
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts), (Task.FAILED, 3))
+        self.assertIn('RuntimeError: boom', failed.last_error)
+
+    def test_delayed_tasks_wait(self):
+        """Test that run_after is respected"""
+        tasks.enqueue('tests.record', delay=60, value='later')
+        self.assertEqual(tasks.run_pending(), 0)
+
+    def test_delayed_unique_task_is_pushed_back(self):
+        """Test that re-queueing a delayed unique task postpones it until the burst settles"""
+        first = tasks.enqueue('tests.record', unique_key='settle', delay=5, value='a')
+        Task.objects.filter(pk=first.pk).update(run_after=timezone.now())
+        again = tasks.enqueue('tests.record', unique_key='settle', delay=5, value='a')
+        self.assertEqual(again.pk, first.pk)
+        self.assertGreater(Task.objects.get(pk=first.pk).run_after, timezone.now() + timedelta(seconds=4))
+        self.assertEqual(tasks.run_pending(), 0)
+
+    def test_eager_mode(self):
+        """Test that eager mode runs tasks inline"""
+        with self.settings(CATALOG_TASKS_EAGER=True):
+            tasks.enqueue('tests.record', value='now')
+        self.assertEqual(self.calls, ['now'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_worker_command_and_stale_tasks(self):
+        """Test that the worker requeues stale tasks and drains the queue"""
+        stale = tasks.enqueue('tests.record', value='stale')
+        Task.objects.filter(pk=stale.pk).update(
+            status=Task.RUNNING, updated_at=timezone.now() - timedelta(hours=1)
+        )
+        tasks.enqueue('tests.record', value='fresh')
+        out = StringIO()
+        call_command('run_tasks', '--once', '--concurrency', '0', stdout=out)
+        self.assertIn('Requeued 1 stale tasks', out.getvalue())
+        self.assertEqual(sorted(self.calls), ['fresh', 'stale'])
+
+    def test_image_saves_defer_resizing(self):
+        """Test that attaching an image only queues the variant work"""
+        category = Category.objects.create(name="Queue Category")
+        product = Product.objects.create(
+            name="Queue Product", description="Queued", price=Decimal("1.00"), category=category
+        )
+        image = ProductImage.objects.create(product=product, image='products/queued.png')
+        self.assertTrue(
+            Task.objects.filter(name='catalog.refresh_image_variants', kwargs={'image_id': image.pk}).exists()
+        )
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, metrics, views
 
 app_name = 'catalog'
 
@@ -9,6 +9,19 @@ router.register(r'categories', views.CategoryViewSet)
 router.register(r'products', views.ProductViewSet)
 
 urlpatterns = [
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('stats/', views.CatalogStatsView.as_view(), name='catalog-stats'),
+    path('health/live/', views.LivenessView.as_view(), name='health-live'),
+    path('health/ready/', views.ReadinessView.as_view(), name='health-ready'),
+    path('db/stats/', views.DatabaseStatsView.as_view(), name='db-stats'),
+    path('metrics/', metrics.metrics_view, name='metrics'),
+    # Async (ASGI) versions of the hottest read endpoints, see catalog/async_views.py
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/<str:slug>/', async_views.product_detail, name='async-product-detail'),
+    path(
+        'async/categories/<str:slug>/products/', async_views.category_products,
+        name='async-category-products'
+    ),
     path('', include(router.urls)),
 ]
 
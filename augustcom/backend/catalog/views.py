@@ -1,65 +1,286 @@
+import logging
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.views import APIView
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from django_filters.utils import translate_validation
 from rest_framework.filters import OrderingFilter
-from .models import Category, Product
+from .models import Category, Product, ProductListing
 from .serializers import (
     CategorySerializer, ProductSerializer, ProductListSerializer
 )
-from .filters import ProductFilter
+from . import fast_serializers, metrics
+from .cache import CachedResponseMixin, ConditionalGetMixin, get_cache_stats, get_catalog_stats
+from .db import get_database_stats, get_pool_stats
+from .export import EXPORT_FORMATS, iter_export
+from .facets import get_facet_counts
+from .fieldsets import SparseFieldsetsMixin
+from .filters import ProductFilter, ProductListingFilter
+from .pagination import KeysetPaginationMixin
+from .search import search_products
+
+logger = logging.getLogger(__name__)
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, CachedResponseMixin, KeysetPaginationMixin, SparseFieldsetsMixin,
+                      viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     lookup_field = 'slug'
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['name']
+    keyset_actions = ('products',)
+    sparse_actions = ('products',)
 
     @action(detail=True, methods=['get'])
     def products(self, request, slug=None):
         """Get products for a specific category"""
         category = self.get_object()
-        products = Product.objects.filter(
-            category=category, 
-            is_published=True
-        ).select_related('category').prefetch_related('images')
-        
-        # Apply filters
-        filterset = ProductFilter(request.GET, queryset=products)
-        filtered_products = filterset.qs
-        
+        if fast_serializers.listing_reads_enabled():
+            filterset = ProductListingFilter(request.GET, queryset=ProductListing.objects.filter(category=category))
+            filtered_products = fast_serializers.listing_rows(filterset.qs)
+            serialize = fast_serializers.serialize_listing_rows
+        else:
+            products = Product.objects.published().for_api().filter(category=category)
+
+            # Apply filters
+            filterset = ProductFilter(request.GET, queryset=products)
+            filtered_products = filterset.qs
+            if fast_serializers.is_enabled():
+                filtered_products = fast_serializers.product_list_rows(filtered_products)
+                serialize = fast_serializers.serialize_product_rows
+            else:
+                serialize = lambda products: ProductListSerializer(products, many=True).data
+
         # Apply pagination
         page = self.paginate_queryset(filtered_products)
+        with metrics.timed('serialize'):
+            data = serialize(filtered_products if page is None else page)
         if page is not None:
-            serializer = ProductListSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = ProductListSerializer(filtered_products, many=True)
-        return Response(serializer.data)
+            return self.get_paginated_response(data)
+
+        return Response(data)
 
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Product.objects.filter(is_published=True).select_related('category').prefetch_related('images')
+class ProductViewSet(ConditionalGetMixin, CachedResponseMixin, KeysetPaginationMixin, SparseFieldsetsMixin,
+                     viewsets.ReadOnlyModelViewSet):
+    queryset = Product.objects.published()
     serializer_class = ProductSerializer
     lookup_field = 'slug'
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = ProductFilter
     ordering_fields = ['price', 'name', 'created_at']
     ordering = ['-created_at']
+    list_actions = ('list', 'search')
+    sparse_actions = list_actions
+    uncached_actions = ('health', 'export')
+    # Rate for the actions throttled with ScopedRateThrottle (see DEFAULT_THROTTLE_RATES)
+    throttle_scope = 'export'
+
+    def get_queryset(self):
+        # The list serializer only needs the primary image, not the full gallery
+        return super().get_queryset().for_api(with_images=self.action not in self.list_actions)
 
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in self.list_actions:
             return ProductListSerializer
         return ProductSerializer
 
+    def list(self, request, *args, **kwargs):
+        if fast_serializers.listing_reads_enabled():
+            rows = fast_serializers.listing_rows(self.filter_listings(ProductListing.objects.all()))
+            serialize = fast_serializers.serialize_listing_rows
+        elif fast_serializers.is_enabled():
+            rows = fast_serializers.product_list_rows(self.filter_queryset(self.get_queryset()))
+            serialize = fast_serializers.serialize_product_rows
+        else:
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(rows)
+        with metrics.timed('serialize'):
+            data = serialize(rows if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        with metrics.timed('serialize'):
+            data = self.get_serializer(instance).data
+        return Response(data)
+
+    def filter_listings(self, queryset):
+        """filter_queryset() for ProductListing rows, with the same parameters and errors"""
+        filterset = ProductListingFilter(self.request.query_params, queryset=queryset, request=self.request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        return OrderingFilter().filter_queryset(self.request, filterset.qs, self)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search across name, description and property values, most relevant first"""
+        term = request.query_params.get('q', '')
+
+        # Honour the regular product filters, but order by relevance
+        params = request.query_params.copy()
+        params.pop('q', None)
+        filterset = ProductFilter(params, queryset=Product.objects.published(), request=request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        ranked_ids = search_products(filterset.qs, term).values_list('pk', flat=True)
+
+        page_ids = self.paginate_queryset(ranked_ids)
+        if page_ids is not None:
+            return self.get_paginated_response(self.serialize_ids(list(page_ids)))
+        return Response(self.serialize_ids(list(ranked_ids)))
+
+    def serialize_ids(self, ids):
+        """Serialize the given products, preserving the order of `ids`"""
+        with metrics.timed('serialize'):
+            return self.serialize_ordered(ids)
+
+    def serialize_ordered(self, ids):
+        if fast_serializers.listing_reads_enabled():
+            rows = fast_serializers.listing_rows(ProductListing.objects.filter(pk__in=ids).order_by())
+            by_id = {row['id']: row for row in rows}
+            return fast_serializers.serialize_listing_rows([by_id[pk] for pk in ids])
+        elif fast_serializers.is_enabled():
+            rows = fast_serializers.product_list_rows(self.get_queryset().filter(pk__in=ids))
+            by_id = {row['id']: row for row in rows}
+            return fast_serializers.serialize_product_rows([by_id[pk] for pk in ids])
+        products = self.get_queryset().in_bulk(ids)
+        return self.get_serializer([products[pk] for pk in ids], many=True).data
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Look up several products at once by ?slugs= or ?ids= (comma-separated or
+        repeated). Results follow the request order; unknown or unpublished
+        products appear as {"slug": ..., "error": "not_found"}.
+        """
+        field, keys = self.get_batch_keys(request)
+        products = self.get_queryset().in_bulk(set(keys), field_name=field)
+        found = [products[key] for key in dict.fromkeys(keys) if key in products]
+        with metrics.timed('serialize'):
+            data = self.get_serializer(found, many=True).data
+        serialized = {getattr(product, field): item for product, item in zip(found, data)}
+        marker_field = 'id' if field == 'pk' else field
+        return Response({
+            'results': [serialized.get(key, {marker_field: key, 'error': 'not_found'}) for key in keys]
+        })
+
+    def get_batch_keys(self, request):
+        """(lookup field, keys in request order) from ?slugs= or ?ids="""
+        slugs, ids = (
+            [value.strip() for raw in request.query_params.getlist(param) for value in raw.split(',') if value.strip()]
+            for param in ('slugs', 'ids')
+        )
+        if bool(slugs) == bool(ids):
+            raise ValidationError('Pass either slugs or ids.')
+        limit = getattr(settings, 'CATALOG_BATCH_MAX_ITEMS', 200)
+        if len(slugs or ids) > limit:
+            raise ValidationError({'slugs' if slugs else 'ids': f'At most {limit} products per request.'})
+        if slugs:
+            return 'slug', slugs
+        try:
+            return 'pk', [int(value) for value in ids]
+        except ValueError:
+            raise ValidationError({'ids': 'Product ids must be integers.'})
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Property value counts for the products matching the current filters"""
+        filterset = ProductFilter(request.query_params, queryset=Product.objects.published(), request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        facets, approximate = get_facet_counts(filterset)
+        return Response({'facets': facets, 'approximate': approximate})
+
+    # Throttled per client: every call streams the whole filtered catalog
+    @action(detail=False, methods=['get'], throttle_classes=[ScopedRateThrottle])
+    def export(self, request):
+        """Stream every product matching the filters as NDJSON (default) or CSV (?output=csv)"""
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'output': f'Choose one of: {", ".join(EXPORT_FORMATS)}'})
+        # Filters only; export.iter_products adds its own prefetches and pk ordering
+        queryset = self.filter_queryset(Product.objects.published())
+        response = StreamingHttpResponse(
+            iter_export(export_format, queryset, build_url=request.build_absolute_uri),
+            content_type=EXPORT_FORMATS[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="catalog.{export_format}"'
+        return response
+
     @action(detail=False, methods=['get'])
     def health(self, request):
-        """Health check endpoint"""
+        """Health check endpoint with cached catalog totals; probes should use /api/health/live/"""
         return Response({
             'status': 'healthy',
-            'total_products': self.get_queryset().count(),
-            'total_categories': Category.objects.count()
+            **get_catalog_stats()
         }, status=status.HTTP_200_OK)
+
+
+class CacheStatsView(APIView):
+    """Hit ratio of the catalog response cache"""
+
+    def get(self, request):
+        return Response(get_cache_stats())
+
+
+class CatalogStatsView(APIView):
+    """Catalog totals, cached until the next catalog write"""
+
+    def get(self, request):
+        return Response(get_catalog_stats())
+
+
+class LivenessView(APIView):
+    """Liveness probe: the process is up and serving requests, no database access"""
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        return Response({'status': 'alive'})
+
+
+class ReadinessView(APIView):
+    """Readiness probe: every database answers SELECT 1 and has pool capacity"""
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        databases = {}
+        ready = True
+        for alias in connections:
+            try:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                databases[alias] = {'status': 'ok'}
+                pool = get_pool_stats(connections[alias])
+                if pool is not None:
+                    databases[alias]['pool'] = pool
+            except DatabaseError:
+                # The error names hosts and databases; log it instead of returning it to the prober
+                logger.exception('Readiness check failed for database %r', alias)
+                ready = False
+                databases[alias] = {'status': 'error'}
+        return Response(
+            {'status': 'ready' if ready else 'unavailable', 'databases': databases},
+            status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+
+class DatabaseStatsView(APIView):
+    """Connection settings and pool utilization per database, without running a query"""
+    permission_classes = [metrics.IsMetricsClient]
+
+    def get(self, request):
+        return Response({'databases': {alias: get_database_stats(alias) for alias in connections}})
@@ -15,6 +15,11 @@ python manage.py migrate
 echo "📁 Collecting static files..."
 python manage.py collectstatic --noinput
 
-# Start Gunicorn
-echo "🌐 Starting Gunicorn server..."
-gunicorn shopcore.wsgi:application --bind 0.0.0.0:$PORT --workers 3
+# Start Gunicorn (SERVER_MODE=asgi serves shopcore.asgi with uvicorn workers)
+if [ "$SERVER_MODE" = "asgi" ]; then
+    echo "🌐 Starting Gunicorn server with ASGI workers..."
+    gunicorn shopcore.asgi:application --bind 0.0.0.0:$PORT --workers 3 --worker-class uvicorn_worker.UvicornWorker
+else
+    echo "🌐 Starting Gunicorn server..."
+    gunicorn shopcore.wsgi:application --bind 0.0.0.0:$PORT --workers 3
+fi
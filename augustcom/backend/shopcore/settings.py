@@ -44,8 +44,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings cover the rest of the stack (see catalog/metrics.py)
+    'catalog.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Compresses API JSON for clients sending Accept-Encoding: gzip; keep it above
+    # anything that reads or rewrites the body
+    'catalog.renderers.JSONGZipMiddleware',
+    'catalog.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -85,6 +91,55 @@ DATABASES = {
     }
 }
 
+# Catalog reads can be served by read replicas (see catalog/routers.py);
+# settings_prod.py configures them from DATABASE_REPLICA_URLS
+DATABASE_ROUTERS = ['catalog.routers.CatalogReplicaRouter']
+CATALOG_READ_REPLICAS = []
+CATALOG_REPLICA_PIN_SECONDS = 15
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Versioned response cache for the catalog API (see catalog/cache.py)
+CATALOG_CACHE_ENABLED = True
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 300
+# Whether every process shares the cache above. locmem is per process, so version bumps
+# made by the `run_tasks` worker would never reach the web server: as in settings_prod,
+# only a cache shared between processes turns the response cache and validators on
+CATALOG_CACHE_SHARED = CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+
+# Serialize list pages from .values() rows instead of ProductListSerializer (see catalog/fast_serializers.py)
+CATALOG_FAST_SERIALIZERS = True
+
+# Serve the list endpoints from the ProductListing read model (see catalog.models.ProductListing);
+# rebuild it with `manage.py rebuild_listings`
+CATALOG_LISTING_READS = True
+
+# Maximum slugs or ids per /api/products/batch/ request
+CATALOG_BATCH_MAX_ITEMS = 200
+
+# Narrowed /api/products/facets/ result sets larger than this get the category's
+# precomputed counts, flagged approximate (see catalog/facets.py)
+CATALOG_FACETS_MAX_PRODUCTS = 10000
+
+# Send per-request DB, serialization and render timings in a Server-Timing header
+CATALOG_SERVER_TIMING = True
+# Besides staff users, addresses allowed to read /api/metrics/ and /api/db/stats/
+CATALOG_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Database-backed task queue (see catalog/tasks.py); run `manage.py run_tasks`
+# alongside the web process, or set CATALOG_TASKS_EAGER to run tasks inline
+CATALOG_TASKS_EAGER = False
+CATALOG_TASKS_RETRY_DELAY = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -123,6 +178,13 @@ USE_TZ = True
 STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Serve MEDIA_ROOT from Django (see catalog/media.py); Cache-Control max-age in seconds
+SERVE_MEDIA = True
+MEDIA_MAX_AGE = 24 * 60 * 60
+
+# Responsive variants generated for every product image (see catalog/images.py)
+CATALOG_IMAGE_WIDTHS = (320, 640, 1024)
+CATALOG_IMAGE_QUALITY = 80
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -143,6 +205,11 @@ CORS_ALLOW_CREDENTIALS = True
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 12,
+    # orjson-backed, byte-compatible with rest_framework.renderers.JSONRenderer (see catalog/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'catalog.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.OrderingFilter',
@@ -150,4 +217,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # Scoped rates for expensive actions (throttle_scope on the view)
+    'DEFAULT_THROTTLE_RATES': {
+        'export': '10/hour',
+    },
 }
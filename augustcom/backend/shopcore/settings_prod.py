@@ -21,20 +21,101 @@ ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(','
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 import dj_database_url
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds and checked before reuse.
+# Under ASGI (SERVER_MODE=asgi) each request runs in its own thread, so persistent
+# connections are not reused; enable DB_POOL there instead.
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '0' if SERVER_MODE == 'asgi' else '60'))
+DB_POOL = os.environ.get('DB_POOL', 'False').lower() == 'true'
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL', 'sqlite:///' + str(BASE_DIR / 'db.sqlite3'))
+        default=os.environ.get('DATABASE_URL', 'sqlite:///' + str(BASE_DIR / 'db.sqlite3')),
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=os.environ.get('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
     )
 }
 
+# Django 5.1+ connection pool (psycopg 3). Pooled connections replace persistent
+# ones, so CONN_MAX_AGE must be 0. Utilization is reported at /api/db/stats/.
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+    }
+
+# Read replicas for catalog reads (comma-separated URLs), with the same connection settings
+CATALOG_READ_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(
+        url.strip(),
+        conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+        conn_health_checks=DATABASES['default']['CONN_HEALTH_CHECKS'],
+    )
+    if 'pool' in DATABASES['default'].get('OPTIONS', {}):
+        DATABASES[alias].setdefault('OPTIONS', {})['pool'] = dict(DATABASES['default']['OPTIONS']['pool'])
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    CATALOG_READ_REPLICAS.append(alias)
+CATALOG_REPLICA_PIN_SECONDS = int(os.environ.get('CATALOG_REPLICA_PIN_SECONDS', '15'))
+
+# Cache
+# CACHE_BACKEND selects locmem (per process), file or redis, and defaults to redis
+# when REDIS_URL is set. The catalog response cache is invalidated by bumping a
+# version key, which only works if every gunicorn worker and the run_tasks worker
+# share the cache: it is turned off unless CATALOG_CACHE_SHARED, which defaults to
+# true for redis only (a file cache is shared when all processes use one CACHE_DIR).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis' if os.environ.get('REDIS_URL') else 'locmem')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+        }
+    }
+
+CATALOG_CACHE_SHARED = os.environ.get('CATALOG_CACHE_SHARED', str(CACHE_BACKEND == 'redis')).lower() == 'true'
+CATALOG_CACHE_ENABLED = os.environ.get('CATALOG_CACHE_ENABLED', 'True').lower() == 'true'
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', '300'))
+CATALOG_TASKS_EAGER = os.environ.get('CATALOG_TASKS_EAGER', 'False').lower() == 'true'
+# Per-request timings in a Server-Timing header; off by default, since every client can read it
+CATALOG_SERVER_TIMING = os.environ.get('CATALOG_SERVER_TIMING', 'False').lower() == 'true'
+# /api/metrics/ and /api/db/stats/ answer staff users and these addresses (e.g. the Prometheus scraper)
+CATALOG_METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('CATALOG_METRICS_ALLOWED_IPS', '').split(',') if ip]
+# Exports per client of /api/products/export/, which streams the whole filtered catalog
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['export'] = os.environ.get('CATALOG_EXPORT_RATE', '10/hour')
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
+# WhiteNoise serves the collectstatic output from the app. The manifest storage
+# gives every file a content-hashed name, which WhiteNoise sends with a one-year
+# immutable Cache-Control, and writes .gz and .br copies served on Accept-Encoding.
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+_security = MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1
+MIDDLEWARE = MIDDLEWARE[:_security] + ['whitenoise.middleware.WhiteNoiseMiddleware'] + MIDDLEWARE[_security:]
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+# Unhashed paths (e.g. favicon.ico at its original name)
+WHITENOISE_MAX_AGE = int(os.environ.get('WHITENOISE_MAX_AGE', '3600'))
 
 # Media files
+# Served by catalog/media.py unless SERVE_MEDIA=False (e.g. behind a CDN or nginx)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+SERVE_MEDIA = os.environ.get('SERVE_MEDIA', 'True').lower() == 'true'
+MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', str(24 * 60 * 60)))
 
 # CORS Settings for production
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:3000,http://127.0.0.1:3000').split(',')
@@ -51,16 +132,29 @@ X_FRAME_OPTIONS = 'DENY'
 # SECURE_HSTS_PRELOAD = True
 
 # Logging
+# catalog.metrics writes one logfmt line per request (route, status, duration,
+# queries, DB/serialize/render time); set METRICS_LOG_LEVEL=WARNING to silence it.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'timestamped': {
+            'format': 'time=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
+            'formatter': 'timestamped',
         },
     },
     'root': {
         'handlers': ['console'],
         'level': 'INFO',
     },
+    'loggers': {
+        'catalog.metrics': {
+            'level': os.environ.get('METRICS_LOG_LEVEL', 'INFO'),
+        },
+    },
 }
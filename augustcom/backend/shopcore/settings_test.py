@@ -0,0 +1,16 @@
+"""
+Test settings for shopcore project.
+
+Run the suite with `python manage.py test --settings=shopcore.settings_test`.
+"""
+
+from .settings import *
+
+# A second SQLite database standing in for a read replica (see catalog/routers.py)
+DATABASES = {
+    **DATABASES,
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+    },
+}